@@ -0,0 +1,3 @@
+"""
+Offline benchmarks: local mock Discord API and end-to-end runner
+"""
@@ -0,0 +1,291 @@
+"""
+Local mock of the Discord API (and a forward proxy) for offline benchmarks
+
+Run standalone:
+    python -m benchmarks.mock_discord --port 8765 --proxy-port 8766 --guilds 200 --latency 0.05
+
+Then point the script at it:
+    DISCORD_API=http://127.0.0.1:8765/api/v9
+    PROXY_TEST_URL=http://127.0.0.1:8765/ip
+    data/proxies.txt lines: 127.0.0.1:8766:user:pass
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict
+
+import aiohttp
+from aiohttp import web
+
+API_PREFIX = "/api/v9"
+
+# First synthetic guild ID (real Discord snowflakes have 18-19 digits)
+GUILD_ID_BASE = 10 ** 17
+
+# Tokens starting with this prefix get 401 Unauthorized
+INVALID_TOKEN_PREFIX = "invalid"
+
+# Headers a forward proxy must not pass on
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection",
+    "te", "trailer", "transfer-encoding", "upgrade", "content-length", "content-encoding", "host",
+}
+
+
+def guild_name(index: int) -> str:
+    """Name of the synthetic guild with the given index"""
+    return f"Bench Guild {index}"
+
+
+class _Bucket:
+    __slots__ = ("remaining", "reset_at")
+
+    def __init__(self, remaining: int, reset_at: float):
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+
+class MockDiscord:
+    """
+    In-memory Discord API with the three routes the script uses.
+
+    Every valid token is a member of all `guild_count` synthetic guilds
+    ("Bench Guild 0", ...) until it leaves them. Per token and route, at most
+    `bucket_limit` requests are allowed per `bucket_window` seconds; responses
+    carry the same X-RateLimit-* headers as Discord and requests over the
+    limit get 429 with Retry-After. A share of requests (`error_rate`) fails
+    with 500/502/503, and every response is delayed by `latency` +- `jitter`.
+
+    Routes:
+        GET    /api/v9/users/@me
+        GET    /api/v9/users/@me/guilds?limit=&after=
+        DELETE /api/v9/users/@me/guilds/{guild_id}
+        GET    /ip                       (proxy test service, plain text)
+    """
+
+    def __init__(self, guild_count: int = 100, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, bucket_limit: int = 0, bucket_window: float = 1.0):
+        """
+        Args:
+            guild_count: Number of guilds every account is a member of
+            latency: Mean response delay in seconds
+            jitter: Maximum random deviation from the mean delay
+            error_rate: Share of requests answered with a 5xx error (0-1)
+            bucket_limit: Requests per token and route per window (0 = no rate limits)
+            bucket_window: Rate limit window in seconds
+        """
+        self.guild_count = guild_count
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self._guild_ids = [GUILD_ID_BASE + i for i in range(guild_count)]
+        self._left: Dict[str, set] = {}  # token -> guild ids left
+        self._buckets: Dict[tuple, _Bucket] = {}
+        self.stats = Counter()  # (route, status) -> responses
+
+    def reset(self, guild_count: int = None):
+        """Forget all leaves, rate limit buckets and counters"""
+        if guild_count is not None:
+            self.guild_count = guild_count
+            self._guild_ids = [GUILD_ID_BASE + i for i in range(guild_count)]
+        self._left.clear()
+        self._buckets.clear()
+        self.stats.clear()
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.stats.values())
+
+    def count(self, status_class: int) -> int:
+        """Number of responses with a status from this class (4 = 4xx, 5 = 5xx)"""
+        return sum(n for (_, status), n in self.stats.items() if status // 100 == status_class)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(API_PREFIX + "/users/@me", self._me)
+        app.router.add_get(API_PREFIX + "/users/@me/guilds", self._guilds)
+        app.router.add_delete(API_PREFIX + "/users/@me/guilds/{guild_id}", self._leave)
+        app.router.add_get("/ip", self._ip)
+        return app
+
+    # --- Request pipeline ---
+
+    async def _respond(self, request: web.Request, route: str, handler) -> web.Response:
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        token = request.headers.get("Authorization", "")
+        if self.error_rate and random.random() < self.error_rate:
+            response = web.json_response({"message": "Mock server error", "code": 0},
+                                         status=random.choice((500, 502, 503)))
+        elif not token or token.startswith(INVALID_TOKEN_PREFIX):
+            response = web.json_response({"message": "401: Unauthorized", "code": 0}, status=401)
+        else:
+            limited, headers = self._rate_limit(token, route)
+            response = limited or handler(token)
+            response.headers.update(headers)
+
+        self.stats[(route, response.status)] += 1
+        return response
+
+    def _rate_limit(self, token: str, route: str):
+        """Apply the per-token bucket; returns (429 response or None, X-RateLimit-* headers)"""
+        if not self.bucket_limit:
+            return None, {}
+        now = time.monotonic()
+        key = (token, route)
+        bucket = self._buckets.get(key)
+        if bucket is None or now >= bucket.reset_at:
+            bucket = self._buckets[key] = _Bucket(self.bucket_limit, now + self.bucket_window)
+
+        reset_after = max(0.0, bucket.reset_at - now)
+        headers = {
+            "X-RateLimit-Limit": str(self.bucket_limit),
+            "X-RateLimit-Bucket": hashlib.sha1(route.encode()).hexdigest()[:16],
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if bucket.remaining <= 0:
+            headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Scope": "user",
+                            "Retry-After": f"{reset_after:.3f}"})
+            body = {"message": "You are being rate limited.", "retry_after": round(reset_after, 3), "global": False}
+            return web.json_response(body, status=429), headers
+
+        bucket.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(bucket.remaining)
+        return None, headers
+
+    # --- Routes ---
+
+    async def _me(self, request: web.Request) -> web.Response:
+        def handler(token):
+            user_id = str(int(hashlib.sha1(token.encode()).hexdigest()[:15], 16))
+            return web.json_response({"id": user_id, "username": f"bench_{user_id[-6:]}"})
+        return await self._respond(request, "GET /users/@me", handler)
+
+    async def _guilds(self, request: web.Request) -> web.Response:
+        def handler(token):
+            try:
+                limit = min(max(int(request.query.get("limit", 200)), 1), 200)
+                after = int(request.query.get("after", 0))
+            except ValueError:
+                return web.json_response({"message": "Invalid Form Body", "code": 50035}, status=400)
+            left = self._left.get(token, ())
+            page = []
+            for guild_id in self._guild_ids[bisect_right(self._guild_ids, after):]:
+                if guild_id in left:
+                    continue
+                page.append({"id": str(guild_id), "name": guild_name(guild_id - GUILD_ID_BASE)})
+                if len(page) == limit:
+                    break
+            return web.json_response(page)
+        return await self._respond(request, "GET /users/@me/guilds", handler)
+
+    async def _leave(self, request: web.Request) -> web.Response:
+        def handler(token):
+            try:
+                guild_id = int(request.match_info["guild_id"])
+            except ValueError:
+                guild_id = -1
+            left = self._left.setdefault(token, set())
+            if not GUILD_ID_BASE <= guild_id < GUILD_ID_BASE + self.guild_count or guild_id in left:
+                return web.json_response({"message": "Unknown Guild", "code": 10004}, status=404)
+            left.add(guild_id)
+            return web.Response(status=204)
+        return await self._respond(request, "DELETE /users/@me/guilds/{guild_id}", handler)
+
+    async def _ip(self, request: web.Request) -> web.Response:
+        self.stats[("GET /ip", 200)] += 1
+        return web.Response(text=request.remote or "127.0.0.1")
+
+
+class MockProxy:
+    """
+    Minimal HTTP forward proxy (plain http targets only, no CONNECT).
+
+    Stands in for the account proxies: requests go through one more hop and
+    proxy credentials are sent, like in a real run. Credentials are not checked.
+    """
+
+    def __init__(self):
+        self._session = None
+        self.stats = Counter()  # "requests", "errors"
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._forward)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _forward(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        if self._session is None:
+            self._session = aiohttp.ClientSession(auto_decompress=False)
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        body = await request.read()
+        try:
+            # Absolute-form request line, so request.url is the target URL
+            async with self._session.request(request.method, request.url, headers=headers, data=body or None,
+                                             allow_redirects=False) as resp:
+                payload = await resp.read()
+                resp_headers = {k: v for k, v in resp.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+                return web.Response(status=resp.status, body=payload, headers=resp_headers)
+        except aiohttp.ClientError as e:
+            self.stats["errors"] += 1
+            return web.Response(status=502, text=f"Mock proxy error: {e}")
+
+    async def _close(self, app):
+        if self._session is not None:
+            await self._session.close()
+
+
+async def start_site(app: web.Application, host: str, port: int) -> web.AppRunner:
+    """Serve an app in the running event loop; call runner.cleanup() to stop it"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the Discord API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="Mock Discord API port")
+    parser.add_argument("--proxy-port", type=int, default=8766, help="Mock forward proxy port (0 = no proxy)")
+    parser.add_argument("--guilds", type=int, default=100, help="Guilds every account is a member of")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random deviation from the mean delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 5xx responses (0-1)")
+    parser.add_argument("--bucket-limit", type=int, default=0, help="Requests per token and route per window")
+    parser.add_argument("--bucket-window", type=float, default=1.0, help="Rate limit window in seconds")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    mock = MockDiscord(args.guilds, args.latency, args.jitter, args.error_rate,
+                       args.bucket_limit, args.bucket_window)
+    runners = [await start_site(mock.make_app(), args.host, args.port)]
+    print(f"Mock Discord API: DISCORD_API=http://{args.host}:{args.port}{API_PREFIX}")
+    print(f"Proxy test service: PROXY_TEST_URL=http://{args.host}:{args.port}/ip")
+    if args.proxy_port:
+        runners.append(await start_site(MockProxy().make_app(), args.host, args.proxy_port))
+        print(f"Mock proxy: {args.host}:{args.proxy_port}:user:pass")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,253 @@
+"""
+End-to-end benchmark: runs main.py against the local mock Discord API
+
+Usage:
+    python -m benchmarks.run_benchmark --accounts 200 --guilds 100 --leave 10 --threads 10 --latency 0.05
+
+Every mode (validate, collect, leave) runs as a separate main.py process in one
+working directory with synthetic data files, so collect and leave see the
+results of the modes before them. Wall time and request counts per mode are
+printed as a table (and written as JSON with --json), together with the CPU
+time main.py used per 1000 requests. --fast compare runs everything twice,
+without and with FAST_MODE (uvloop + orjson), to show the CPU saved.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: CPU time of main.py is not reported
+    resource = None
+
+from benchmarks.mock_discord import (
+    API_PREFIX,
+    INVALID_TOKEN_PREFIX,
+    MockDiscord,
+    MockProxy,
+    guild_name,
+    start_site,
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(REPO_DIR, "main.py")
+
+# Menu choice of main.py for every mode
+MODE_CHOICES = {"validate": "1", "collect": "2", "leave": "3"}
+
+
+def write_data_files(workdir: str, args, proxy_port: int):
+    """Create data/ with synthetic accounts, tokens, user agents, proxies and leave list"""
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    invalid_every = round(1 / args.invalid_rate) if args.invalid_rate > 0 else 0
+
+    files = {
+        "account_indexes.txt": (str(i) for i in range(1, args.accounts + 1)),
+        "ds_tokens.txt": (
+            f"{INVALID_TOKEN_PREFIX}-{i}" if invalid_every and i % invalid_every == 0 else f"bench-token-{i}"
+            for i in range(1, args.accounts + 1)
+        ),
+        "user_agents.txt": (f"Mozilla/5.0 (Benchmark {i % 20})" for i in range(1, args.accounts + 1)),
+        # main.py needs a proxy for every account; all of them point at the mock proxy
+        "proxies.txt": (f"127.0.0.1:{proxy_port}:bench{i % args.proxies}:pass" for i in range(1, args.accounts + 1)),
+        "guilds_leave.txt": (guild_name(i) for i in range(args.leave)),
+    }
+
+    for name, lines in files.items():
+        with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+
+
+def _children_cpu_time() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def build_env(args, api_port: int, fast: bool) -> dict:
+    """Environment for main.py: mock endpoints, no pauses, benchmark settings"""
+    env = dict(os.environ)
+    env.update({
+        "DISCORD_API": f"http://127.0.0.1:{api_port}{API_PREFIX}",
+        "PROXY_TEST_URL": f"http://127.0.0.1:{api_port}/ip",
+        "THREAD_COUNT": str(args.threads),
+        "START_LINE": "1",
+        "END_LINE": "0",
+        "RANDOM_START": "False",
+        "ACCOUNT_DELAY_MIN": "0",
+        "ACCOUNT_DELAY_MAX": "0",
+        "DISCORD_REQUEST_DELAY_MIN": "0",
+        "DISCORD_REQUEST_DELAY_MAX": "0",
+        "ALLOW_PROFILE_NUMBERS": "",
+        "SKIP_PROFILE_NUMBERS": "",
+        "PROGRESS_REPORT_INTERVAL": "0",
+        "PYTHONIOENCODING": "utf-8",
+        "FAST_MODE": str(fast),
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key.strip()] = value
+    return env
+
+
+async def run_mode(mode: str, workdir: str, env: dict, mock: MockDiscord, proxy: MockProxy, workers: int) -> dict:
+    """Run main.py once in the given mode and measure it"""
+    mock.stats.clear()
+    proxy.stats.clear()
+    log_path = os.path.join(workdir, f"bench_{mode}.log")
+    with open(log_path, "wb") as log_file:
+        cpu_started = _children_cpu_time()
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, MAIN_SCRIPT, "--workers", str(workers),
+            cwd=workdir, env=env,
+            stdin=asyncio.subprocess.PIPE, stdout=log_file, stderr=asyncio.subprocess.STDOUT
+        )
+        await process.communicate((MODE_CHOICES[mode] + "\n").encode())
+        wall_time = time.perf_counter() - started
+        cpu_time = _children_cpu_time() - cpu_started
+
+    requests = mock.total_requests
+    return {
+        "mode": mode,
+        "exit_code": process.returncode,
+        "wall_time": round(wall_time, 3),
+        "requests": requests,
+        "requests_per_sec": round(requests / wall_time, 1) if wall_time else 0.0,
+        "cpu_time": round(cpu_time, 3) if resource else None,
+        "cpu_ms_per_1k_requests": round(cpu_time * 1e6 / requests, 1) if resource and requests else None,
+        "rate_limited": sum(n for (_, status), n in mock.stats.items() if status == 429),
+        "server_errors": mock.count(5),
+        "proxy_requests": proxy.stats["requests"],
+        "log": log_path,
+    }
+
+
+def print_results(results: list, args, title: str):
+    print("")
+    print(title)
+    print(f"Accounts: {args.accounts}, guilds per account: {args.guilds}, leave list: {args.leave}, "
+          f"threads: {args.threads}, workers: {args.workers}, proxies: {args.proxies}, "
+          f"latency: {args.latency}s +- {args.jitter}s, errors: {args.error_rate:.0%}, "
+          f"rate limit: {f'{args.bucket_limit}/{args.bucket_window}s' if args.bucket_limit else 'off'}")
+    header = (f"{'Mode':<10}{'Wall time':>12}{'Requests':>11}{'Req/s':>9}{'Acc/s':>9}"
+              f"{'CPU ms/1k':>11}{'429':>7}{'5xx':>7}{'Exit':>6}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        accounts_per_sec = args.accounts / r["wall_time"] if r["wall_time"] else 0.0
+        cpu = "n/a" if r["cpu_ms_per_1k_requests"] is None else f"{r['cpu_ms_per_1k_requests']:.0f}"
+        print(f"{r['mode']:<10}{r['wall_time']:>11.2f}s{r['requests']:>11}{r['requests_per_sec']:>9.1f}"
+              f"{accounts_per_sec:>9.1f}{cpu:>11}{r['rate_limited']:>7}{r['server_errors']:>7}{r['exit_code']:>6}")
+
+
+def print_comparison(normal: list, fast: list):
+    """CPU per 1000 requests without and with fast mode, per mode"""
+    print("")
+    print("CPU time per 1000 requests, FAST_MODE off -> on:")
+    for before, after in zip(normal, fast):
+        if not before["cpu_ms_per_1k_requests"] or after["cpu_ms_per_1k_requests"] is None:
+            print(f"  {before['mode']:<10}n/a")
+            continue
+        saved = before["cpu_ms_per_1k_requests"] - after["cpu_ms_per_1k_requests"]
+        print(f"  {before['mode']:<10}{before['cpu_ms_per_1k_requests']:.0f} ms -> "
+              f"{after['cpu_ms_per_1k_requests']:.0f} ms "
+              f"({saved:+.0f} ms saved, {saved / before['cpu_ms_per_1k_requests']:+.0%})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark validate / collect / leave against a local mock API")
+    parser.add_argument("--accounts", type=int, default=100, help="Number of synthetic accounts")
+    parser.add_argument("--guilds", type=int, default=100, help="Guilds every account is a member of")
+    parser.add_argument("--leave", type=int, default=10, help="Guilds in the leave list")
+    parser.add_argument("--modes", default="validate,collect,leave", help="Comma-separated modes to run, in order")
+    parser.add_argument("--threads", type=int, default=10, help="THREAD_COUNT for main.py")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for main.py (--workers)")
+    parser.add_argument("--proxies", type=int, default=1, help="Distinct proxy logins, all served by the mock proxy")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Share of invalid tokens (0-1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean mock response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random deviation from the mean delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 5xx responses (0-1)")
+    parser.add_argument("--bucket-limit", type=int, default=0, help="Requests per token and route per window")
+    parser.add_argument("--bucket-window", type=float, default=1.0, help="Rate limit window in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment variable for main.py (repeatable)")
+    parser.add_argument("--fast", choices=("off", "on", "compare"), default="off",
+                        help="FAST_MODE for main.py; compare runs all modes with it off and on")
+    parser.add_argument("--workdir", help="Working directory (default: new temp directory, removed afterwards)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    args.modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in args.modes if mode not in MODE_CHOICES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    if args.proxies < 1:
+        parser.error("--proxies must be at least 1")
+    return args
+
+
+async def run_suite(args, fast: bool, workdir: str) -> list:
+    """Run all selected modes in order against a fresh mock server"""
+    mock = MockDiscord(args.guilds, args.latency, args.jitter, args.error_rate,
+                       args.bucket_limit, args.bucket_window)
+    proxy = MockProxy()
+    api_runner = await start_site(mock.make_app(), "127.0.0.1", 0)
+    proxy_runner = await start_site(proxy.make_app(), "127.0.0.1", 0)
+    api_port = api_runner.addresses[0][1]
+    proxy_port = proxy_runner.addresses[0][1]
+
+    results = []
+    try:
+        write_data_files(workdir, args, proxy_port)
+        env = build_env(args, api_port, fast)
+        for mode in args.modes:
+            print(f"Running {mode} ({args.accounts} accounts, fast mode {'on' if fast else 'off'})...")
+            results.append(await run_mode(mode, workdir, env, mock, proxy, args.workers))
+    finally:
+        await proxy_runner.cleanup()
+        await api_runner.cleanup()
+    return results
+
+
+async def run(args) -> dict:
+    """Run the suite once per fast mode variant; returns {"normal"/"fast": results}"""
+    variants = {"off": ["normal"], "on": ["fast"], "compare": ["normal", "fast"]}[args.fast]
+    base_dir = args.workdir or tempfile.mkdtemp(prefix="dgm_bench_")
+    runs = {}
+    try:
+        for variant in variants:
+            workdir = os.path.join(base_dir, variant) if len(variants) > 1 else base_dir
+            runs[variant] = await run_suite(args, variant == "fast", workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+    return runs
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runs = asyncio.run(run(args))
+    for variant, results in runs.items():
+        print_results(results, args, f"FAST_MODE {'on' if variant == 'fast' else 'off'}:")
+    if len(runs) > 1:
+        print_comparison(runs["normal"], runs["fast"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json"}, "results": runs},
+                      f, indent=2)
+    if not args.workdir:
+        print("(logs removed with the temp directory - use --workdir to keep them)")
+    results = [r for variant_results in runs.values() for r in variant_results]
+    return 0 if all(r["exit_code"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,31 +9,194 @@ import aiohttp
 import csv
 import os
 import asyncio
-import ssl
-import certifi
 import random
+import re
+import time
 from dotenv import load_dotenv
 
-from utils.logger import setup_logger
+from utils.logger import setup_logger, get_account_logger
+from utils.http_pool import SessionPool, proxy_label
+from utils.proxy_cache import ProxyHealthCache
+from utils.rate_limiter import RateLimiter
+from utils.guild_aggregator import GuildAggregator
+from utils.guild_index import GuildNameIndex
+from utils.token_cache import TokenStatusCache
+from utils.run_journal import RunJournal
+from utils.state_store import StateStore
+from utils.profile import Profile
+from utils.output_writer import OutputWriter, write_csv_atomic
+from utils.metrics import MetricsRegistry, QUANTILES
+from utils.fast_path import get_json_loads
+from utils.retry import OK, RETRY, FATAL, RATE_LIMITED, CircuitBreaker, RetryBudget, RetryPolicy, classify_exception, \
+    classify_status
+
+# Load environment variables (before the logger reads its settings)
+load_dotenv()
 
 logger = setup_logger()
-
-# Load environment variables
-load_dotenv()
+# Per-account messages; ACCOUNT_LOG_LEVEL sets how much of them is logged
+account_logger = get_account_logger()
 
 # --- Constants ---
-DISCORD_API = "https://discord.com/api/v9"
+# Base URL of the Discord API (override only to test against a local mock, see benchmarks/)
+DISCORD_API = (os.getenv('DISCORD_API', '').strip() or "https://discord.com/api/v9").rstrip("/")
 GUILDS_ALL_OUTPUT = "output/guilds_all.csv"
 GUILDS_LEAVE_FILE = "data/guilds_leave.txt"
 # Output CSV files (with separate columns for Excel)
 INVALID_TOKENS_CSV = "output/invalid_tokens.csv"
 VALID_TOKENS_CSV = "output/valid_tokens.csv"
-
-# --- Delay between Discord requests (e.g., between IPs) ---
+PROXY_HEALTH_CACHE = "output/proxy_health.json"
+TOKEN_STATUS_CACHE = "output/token_status.json"
+RUN_JOURNAL_FILE = "output/run_journal.jsonl"
+STATE_DB_FILE = "output/state.db"
+MEMBERSHIPS_CSV = "output/memberships.csv"
+METRICS_JSON = "output/metrics.json"
+METRICS_PROM = "output/metrics.prom"
+
+# --- Optional extra pause before each leave request (on top of rate limit pacing) ---
 DISCORD_REQUEST_DELAY = (
-    int(os.getenv('DISCORD_REQUEST_DELAY_MIN', 5)),
-    int(os.getenv('DISCORD_REQUEST_DELAY_MAX', 10))
+    int(os.getenv('DISCORD_REQUEST_DELAY_MIN', 0)),
+    int(os.getenv('DISCORD_REQUEST_DELAY_MAX', 0))
+)
+
+# --- Fast mode: orjson decodes responses if installed (uvloop is installed by main.py) ---
+FAST_MODE = os.getenv('FAST_MODE', 'False').lower() == 'true'
+json_loads = get_json_loads(FAST_MODE)
+
+# --- Discord route templates (used as rate limit bucket keys) ---
+ROUTE_ME = "GET /users/@me"
+ROUTE_GUILDS = "GET /users/@me/guilds"
+ROUTE_LEAVE_GUILD = "DELETE /users/@me/guilds/{guild_id}"
+
+# Discord returns at most 200 guilds per /users/@me/guilds request
+GUILDS_PAGE_SIZE = 200
+
+# --- Run metrics (request latency, status codes, retries, rate limit waits, proxy health) ---
+# json, prometheus, both or off
+METRICS_FORMAT = os.getenv('METRICS_FORMAT', 'json').strip().lower()
+metrics = MetricsRegistry(export_interval=float(os.getenv('METRICS_EXPORT_INTERVAL', 0)))
+metrics.describe("http_request_duration_seconds", "histogram", "Time until response headers, by route")
+metrics.describe("http_responses_total", "counter", "Responses by route and status (error = network failure)")
+metrics.describe("discord_retries_total", "counter", "Discord requests repeated after a failed attempt")
+metrics.describe("rate_limit_waits_total", "counter", "Requests delayed by the rate limiter")
+metrics.describe("rate_limit_wait_seconds_total", "counter", "Time spent waiting for rate limits")
+metrics.describe("proxy_requests_total", "counter", "Requests by proxy and result (error = network failure)")
+metrics.describe("proxy_request_duration_seconds", "histogram", "Time until response headers, by proxy")
+metrics.describe("proxy_circuit_transitions_total", "counter", "Proxy circuit breaker state changes by proxy and state")
+
+# Rate limiter driven by X-RateLimit-* headers, shared by all profiles
+rate_limiter = RateLimiter(metrics=metrics)
+
+# --- Retries of Discord requests (shared by all routes) ---
+# Timeout of a single attempt and deadline of a request including all retries (seconds)
+DISCORD_REQUEST_TIMEOUT = 20
+DISCORD_REQUEST_DEADLINE = float(os.getenv('DISCORD_REQUEST_DEADLINE', 120))
+# Retries of the whole run are capped at RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * requests
+retry_budget = RetryBudget(
+    ratio=float(os.getenv('RETRY_BUDGET_RATIO', 0.2)),
+    min_retries=int(os.getenv('RETRY_BUDGET_MIN', 50)),
+    metrics=metrics
+)
+retry_policy = RetryPolicy(
+    base_delay=float(os.getenv('RETRY_BACKOFF_BASE', 1.0)),
+    max_delay=float(os.getenv('RETRY_BACKOFF_MAX', 30)),
+    deadline=DISCORD_REQUEST_DEADLINE,
+    budget=retry_budget
 )
+# A proxy with PROXY_BREAKER_THRESHOLD network failures in a row is paused for PROXY_BREAKER_RESET seconds
+circuit_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('PROXY_BREAKER_THRESHOLD', 5)),
+    reset_timeout=float(os.getenv('PROXY_BREAKER_RESET', 60)),
+    on_state_change=lambda proxy_url, state: on_circuit_state_change(proxy_url, state)
+)
+
+# --- Proxy check settings ---
+# sequential - ask test services one after another
+# race       - ask all test services at once, first answer wins
+# hedge      - start the next service only if the previous one is slow to answer
+PROXY_PROBE_MODE = os.getenv('PROXY_PROBE_MODE', 'hedge').strip().lower()
+PROXY_PROBE_HEDGE_DELAY = float(os.getenv('PROXY_PROBE_HEDGE_DELAY', 1.5))
+# Overall deadline for one proxy check (all services together)
+PROXY_PROBE_TIMEOUT = float(os.getenv('PROXY_PROBE_TIMEOUT', 15))
+# Timeout for a single test service request
+PROXY_PROBE_SERVICE_TIMEOUT = 10
+
+# TODO --- БЛОК ЗАПАСНЫХ СЕРВИСОВ ДЛЯ ПРОВЕРКИ ПРОКСИ ---
+# List of test services (with fallback): (url, response type, json key with IP)
+PROXY_TEST_SERVICES = [
+    ("https://httpbin.org/ip", "json", "origin"),
+    ("https://api.ipify.org?format=json", "json", "ip"),
+    ("https://ifconfig.me/ip", "text", None),
+    ("https://icanhazip.com", "text", None)
+]
+# Single test service answering with the exit IP as plain text; replaces the list above
+PROXY_TEST_URL = os.getenv('PROXY_TEST_URL', '').strip()
+if PROXY_TEST_URL:
+    PROXY_TEST_SERVICES = [(PROXY_TEST_URL, "text", None)]
+
+# --- Proxy health cache (skip re-checking proxies confirmed recently) ---
+PROXY_CACHE_ENABLED = os.getenv('PROXY_CACHE_ENABLED', 'True').lower() == 'true'
+proxy_cache = ProxyHealthCache(
+    PROXY_HEALTH_CACHE,
+    ttl=float(os.getenv('PROXY_CACHE_TTL', 600)),
+    dead_ttl=float(os.getenv('PROXY_CACHE_DEAD_TTL', 120)),
+    max_entries=int(os.getenv('PROXY_CACHE_MAX_ENTRIES', 5000))
+)
+
+# Probes currently running, so profiles sharing a proxy wait for one check
+_proxy_probes_in_flight = {}
+
+# --- Token status cache (skip /users/@me for tokens confirmed recently) ---
+TOKEN_CACHE_ENABLED = os.getenv('TOKEN_CACHE_ENABLED', 'True').lower() == 'true'
+token_cache = TokenStatusCache(
+    TOKEN_STATUS_CACHE,
+    ttl=float(os.getenv('TOKEN_CACHE_TTL', 3600))
+)
+
+# --- Run journal (finished profiles and leaves, used by --resume) ---
+run_journal = RunJournal(
+    RUN_JOURNAL_FILE,
+    fsync=os.getenv('RUN_JOURNAL_FSYNC', 'True').lower() == 'true'
+)
+# Guilds already left by unfinished profiles of a resumed run: {identifier: {guild_id, ...}}
+resumed_leaves = {}
+# Token verdicts of finished profiles of a resumed run: {identifier: is_valid}
+_resumed_verdicts = {}
+# Output of the current lease of a remote worker (--worker), sent to the coordinator; None otherwise
+_lease_capture = None
+
+# --- Output writer (file writes run on a background thread, off the event loop) ---
+output_writer = OutputWriter(
+    max_pending=int(os.getenv('OUTPUT_QUEUE_SIZE', 1000)),
+    logger=logger
+)
+
+# --- Shared HTTP sessions (keep-alive connections reused across requests) ---
+session_pool = SessionPool(
+    limit_per_host=int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 10)),
+    keepalive_timeout=float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 60)),
+    metrics=metrics
+)
+
+# --- Guild name matching for the leave list ---
+# Fuzzy matching also finds names with typos (used only if exact/normalized lookup fails)
+GUILD_FUZZY_MATCH = os.getenv('GUILD_FUZZY_MATCH', 'False').lower() == 'true'
+GUILD_FUZZY_THRESHOLD = float(os.getenv('GUILD_FUZZY_THRESHOLD', 0.6))
+
+# --- Leave only guilds the account is actually in (one guild list request per account) ---
+LEAVE_ONLY_MEMBER_GUILDS = os.getenv('LEAVE_ONLY_MEMBER_GUILDS', 'True').lower() == 'true'
+
+# Combined guild list: profiles add guilds in memory, the CSV is written
+# once at the end of the run and periodically as a checkpoint
+guilds_aggregator = GuildAggregator(
+    GUILDS_ALL_OUTPUT,
+    checkpoint_interval=float(os.getenv('GUILDS_CHECKPOINT_INTERVAL', 60))
+)
+
+# --- Optional SQLite state store (accounts, guilds, memberships, leave outcomes) ---
+# When enabled, guilds_all.csv is exported from the database and leave mode resolves names from it
+STATE_DB_ENABLED = os.getenv('STATE_DB_ENABLED', 'False').lower() == 'true'
+state_store = StateStore(STATE_DB_FILE)
 
 # Temporary storage for invalid/valid tokens
 invalid_tokens_buffer = []
@@ -46,14 +209,23 @@ stats = {
     "proxy_working": 0,
     "proxy_failed": 0,
     "proxy_empty": 0,
+    "proxy_cache_hits": 0,
     "tokens_checked": 0,
     "tokens_valid": 0,
     "tokens_invalid": 0,
+    "tokens_cached": 0,
+    "tokens_check_failed": 0,
     "accounts_skipped_proxy": 0,
     "accounts_processed": 0,
+    "accounts_resumed": 0,
     "guilds_collected": 0,
+    "leaves_skipped_not_member": 0,
 }
 
+# Last proxy check result per profile
+proxy_probe_results = {}
+# Format: {"1": {"service": "https://httpbin.org/ip", "ip": "1.2.3.4", "latency": 0.84}}
+
 # TODO --- БЛОК ХРАНЕНИЯ РЕЗУЛЬТАТОВ ВЫХОДА ИЗ ГИЛЬДИЙ ---
 # Global structure for tracking leave operations results across all profiles
 leave_results = {}
@@ -91,17 +263,173 @@ def format_proxy(proxy_string: str) -> str:
     return ""
 
 
+class MaskedProxy:
+    """
+    Proxy URL for log messages with the password hidden.
+
+    Masking happens in __str__, i.e. only when a log line is actually written:
+    http://user:pass@ip:port -> http:****@ip:port
+    """
+
+    __slots__ = ("url",)
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def __str__(self):
+        if "@" not in self.url:
+            return self.url
+        parts = self.url.split("@")
+        if ":" not in parts[0]:
+            return self.url
+        return parts[0].split(":")[0] + ":****@" + parts[1]
+
+
+async def _probe_service(service: tuple, proxy_url: str) -> str:
+    """
+    Request one IP test service through the proxy.
+
+    Args:
+        service: Tuple (url, response_type, ip_key) from PROXY_TEST_SERVICES
+        proxy_url: Formatted proxy URL
+
+    Returns:
+        Exit IP reported by the service
+
+    Raises:
+        aiohttp.ClientResponseError: If the service returned a non-200 status
+        asyncio.TimeoutError, aiohttp.ClientError: On network failures
+    """
+    service_url, response_type, ip_key = service
+    session = session_pool.get(proxy_url)
+    async with session.get(service_url, proxy=proxy_url, timeout=PROXY_PROBE_SERVICE_TIMEOUT) as resp:
+        if resp.status != 200:
+            raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status,
+                                              message=f"returned status {resp.status}")
+        if response_type == "json":
+            data = await resp.json(loads=json_loads, content_type=None)
+            return data.get(ip_key, "Unknown")
+        return (await resp.text()).strip()
+
+
+async def probe_proxy(proxy_url: str, identifier: str, mode: str = None) -> dict:
+    """
+    Check proxy against the IP test services.
+
+    In 'sequential' mode services are asked one after another. In 'race' mode
+    all of them are asked at once. In 'hedge' mode the next service is started
+    when the previous one failed or did not answer within PROXY_PROBE_HEDGE_DELAY.
+    The first successful answer wins and all other requests are cancelled.
+    The whole check never takes longer than PROXY_PROBE_TIMEOUT.
+
+    Args:
+        proxy_url: Formatted proxy URL
+        identifier: Profile identifier for logging
+        mode: Probe mode (defaults to PROXY_PROBE_MODE)
+
+    Returns:
+        Dict {"service", "ip", "latency"} on success, None if all services failed
+    """
+    mode = mode or PROXY_PROBE_MODE
+    if mode == "race":
+        hedge_delay = 0
+    elif mode == "hedge":
+        hedge_delay = PROXY_PROBE_HEDGE_DELAY
+    else:
+        hedge_delay = None  # sequential: next service only after a failure
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + PROXY_PROBE_TIMEOUT
+    pending_services = list(PROXY_TEST_SERVICES)
+    running = {}  # task -> service url
+
+    def launch_next():
+        service = pending_services.pop(0)
+        running[asyncio.ensure_future(_probe_service(service, proxy_url))] = service[0]
+
+    try:
+        launch_next()
+        while pending_services and hedge_delay == 0:
+            launch_next()
+
+        while running:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                account_logger.warning("%s: ⚠️ Proxy check deadline (%ss) reached", identifier, PROXY_PROBE_TIMEOUT)
+                break
+
+            wait_for = remaining
+            if pending_services and hedge_delay is not None:
+                wait_for = min(remaining, hedge_delay)
+
+            done, _ = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                service_url = running.pop(task)
+                try:
+                    proxy_ip = task.result()
+                except asyncio.TimeoutError:
+                    account_logger.warning("%s: ⚠️ Timeout for %s", identifier, service_url)
+                except aiohttp.ClientResponseError as e:
+                    account_logger.warning("%s: ⚠️ Service %s returned status %s", identifier, service_url, e.status)
+                except aiohttp.ClientProxyConnectionError as e:
+                    account_logger.warning("%s: ⚠️ Connection error for %s: %s", identifier, service_url, e)
+                except Exception as e:
+                    account_logger.warning("%s: ⚠️ Error with %s: %s", identifier, service_url, e)
+                else:
+                    return {"service": service_url, "ip": proxy_ip, "latency": loop.time() - started}
+
+            # Start the next service after a failure, or when the hedge delay expired
+            if pending_services and (done or hedge_delay is not None):
+                launch_next()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    return None
+
+
+async def _probe_and_cache(proxy_url: str, identifier: str) -> dict:
+    """Probe proxy and store the outcome in the proxy health cache"""
+    result = await probe_proxy(proxy_url, identifier)
+    if PROXY_CACHE_ENABLED:
+        proxy_cache.record(proxy_url, result)
+    return result
+
+
+def flush_proxy_cache():
+    """Save proxy health cache to disk"""
+    if not PROXY_CACHE_ENABLED:
+        return
+    try:
+        proxy_cache.save()
+    except Exception as e:
+        logger.error(f"Failed to save proxy health cache: {e}")
+
+
 async def validate_proxy(proxy: str, identifier: str) -> bool:
     """
     Validate if proxy is working by making a test request.
     CRITICAL: If proxy fails, account will be SKIPPED to avoid IP exposure!
 
-    Uses multiple fallback services for reliability:
+    Uses multiple fallback services for reliability (see PROXY_TEST_SERVICES):
     1. httpbin.org
     2. api.ipify.org
     3. ifconfig.me
     4. icanhazip.com
 
+    The services are queried according to PROXY_PROBE_MODE (see probe_proxy).
+    The answering service and probe latency are stored in proxy_probe_results.
+
+    Recent results are taken from the proxy health cache: a proxy confirmed
+    within PROXY_CACHE_TTL is not probed again, and a proxy that failed within
+    PROXY_CACHE_DEAD_TTL fails fast, as does a proxy whose circuit breaker is
+    open after repeated network failures during this run. Profiles sharing one
+    proxy wait for a single in-flight probe instead of starting their own.
+
     Args:
         proxy: Proxy string (ip:port:user:pass or ip:port)
         identifier: Profile identifier for logging
@@ -113,71 +441,65 @@ async def validate_proxy(proxy: str, identifier: str) -> bool:
 
     if not proxy:
         stats["proxy_empty"] += 1
-        logger.warning(f"{identifier}: ⚠️ NO PROXY configured - using DIRECT connection (IP EXPOSED!)")
-        logger.warning(f"{identifier}: 🚨 SECURITY RISK: Your real IP will be visible to Discord!")
+        account_logger.warning("%s: ⚠️ NO PROXY configured - using DIRECT connection (IP EXPOSED!)", identifier)
+        account_logger.warning("%s: 🚨 SECURITY RISK: Your real IP will be visible to Discord!", identifier)
         return True  # No proxy = direct connection (risky!)
 
     proxy_url = format_proxy(proxy)
     if not proxy_url:
         stats["proxy_failed"] += 1
-        logger.error(f"{identifier}: ❌ Invalid proxy format: {proxy}")
+        account_logger.error("%s: ❌ Invalid proxy format: %s", identifier, proxy)
         return False
 
     # Mask password in logs
-    proxy_display = proxy_url
-    if "@" in proxy_url:
-        parts = proxy_url.split("@")
-        if ":" in parts[0]:
-            user_part = parts[0].split(":")[0] + ":****"
-            proxy_display = user_part + "@" + parts[1]
-
-    logger.info(f"{identifier}: 🔍 Testing proxy: {proxy_display}")
-
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-    # TODO --- БЛОК ЗАПАСНЫХ СЕРВИСОВ ДЛЯ ПРОВЕРКИ ПРОКСИ ---
-    # List of test services (with fallback)
-    test_services = [
-        ("https://httpbin.org/ip", "json", "origin"),
-        ("https://api.ipify.org?format=json", "json", "ip"),
-        ("https://ifconfig.me/ip", "text", None),
-        ("https://icanhazip.com", "text", None)
-    ]
-
-    for service_url, response_type, ip_key in test_services:
-        try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(service_url, proxy=proxy_url, ssl=ssl_context, timeout=10) as resp:
-                    if resp.status == 200:
-                        if response_type == "json":
-                            data = await resp.json()
-                            proxy_ip = data.get(ip_key, "Unknown")
-                        else:
-                            proxy_ip = (await resp.text()).strip()
-
-                        stats["proxy_working"] += 1
-                        logger.info(f"{identifier}: ✅ Proxy working! IP: {proxy_ip} (via {service_url})")
-                        return True
-                    else:
-                        logger.warning(
-                            f"{identifier}: ⚠️ Service {service_url} returned status {resp.status}, trying next...")
-                        continue
-        except asyncio.TimeoutError:
-            logger.warning(f"{identifier}: ⚠️ Timeout for {service_url}, trying next service...")
-            continue
-        except aiohttp.ClientProxyConnectionError as e:
-            logger.warning(f"{identifier}: ⚠️ Connection error for {service_url}: {str(e)}, trying next...")
-            continue
-        except Exception as e:
-            logger.warning(f"{identifier}: ⚠️ Error with {service_url}: {e}, trying next...")
-            continue
+    proxy_display = MaskedProxy(proxy_url)
+
+    if circuit_breaker.is_open(proxy_url):
+        stats["proxy_failed"] += 1
+        account_logger.error("%s: ❌ Proxy keeps failing in this run (circuit open): %s", identifier, proxy_display)
+        account_logger.error("%s: 🚫 Account will be SKIPPED (security measure)", identifier)
+        return False
+
+    cached = proxy_cache.get(proxy_url) if PROXY_CACHE_ENABLED else None
+    if cached:
+        stats["proxy_cache_hits"] += 1
+        if cached["status"] == "ok":
+            proxy_probe_results[identifier] = {
+                "service": cached.get("service"), "ip": cached.get("ip"), "latency": cached.get("latency", 0)
+            }
+            stats["proxy_working"] += 1
+            account_logger.info("%s: ✅ Proxy working (cached)! IP: %s (%s)",
+                                identifier, cached.get('ip'), proxy_display)
+            return True
+
+        stats["proxy_failed"] += 1
+        account_logger.error("%s: ❌ Proxy failed recently (cached): %s", identifier, proxy_display)
+        account_logger.error("%s: 🚫 Account will be SKIPPED (security measure)", identifier)
+        return False
+
+    probe = _proxy_probes_in_flight.get(proxy_url)
+    if probe is None:
+        account_logger.info("%s: 🔍 Testing proxy: %s", identifier, proxy_display)
+        probe = asyncio.ensure_future(_probe_and_cache(proxy_url, identifier))
+        _proxy_probes_in_flight[proxy_url] = probe
+        probe.add_done_callback(lambda _: _proxy_probes_in_flight.pop(proxy_url, None))
+    else:
+        account_logger.info("%s: ⏳ Waiting for running check of proxy: %s", identifier, proxy_display)
+
+    # Shield so a cancelled profile does not cancel the probe other profiles await
+    result = await asyncio.shield(probe)
+    if result:
+        proxy_probe_results[identifier] = result
+        stats["proxy_working"] += 1
+        account_logger.info("%s: ✅ Proxy working! IP: %s (via %s in %.2fs)",
+                            identifier, result['ip'], result['service'], result['latency'])
+        return True
 
     # All services failed
     stats["proxy_failed"] += 1
-    logger.error(f"{identifier}: ❌ Proxy failed on ALL test services: {proxy_display}")
-    logger.error(f"{identifier}: 💡 Possible causes: Wrong credentials, proxy offline, or network issues")
-    logger.error(f"{identifier}: 🚫 Account will be SKIPPED (security measure)")
+    account_logger.error("%s: ❌ Proxy failed on ALL test services: %s", identifier, proxy_display)
+    account_logger.error("%s: 💡 Possible causes: Wrong credentials, proxy offline, or network issues", identifier)
+    account_logger.error("%s: 🚫 Account will be SKIPPED (security measure)", identifier)
     return False
 
 
@@ -194,48 +516,178 @@ async def validate_token_and_log_invalid(token: str, proxy: str, user_agent: str
     Returns:
         True if token is valid, False otherwise
     """
-    headers = {
-        "Authorization": token,
-        "User-Agent": user_agent or "Mozilla/5.0"
-    }
     proxy_url = format_proxy(proxy)
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
 
-    stats["tokens_checked"] += 1
+    # Token confirmed recently - no request needed
+    if TOKEN_CACHE_ENABLED and token_cache.get_fresh_valid(token):
+        stats["tokens_cached"] += 1
+        account_logger.info("%s: 💾 Token validated recently (cached)", identifier)
+        record_token_verdict(identifier, token, True, cached=True)
+        return True
 
     # Log proxy usage
     if proxy_url:
-        # Mask proxy password in logs for security
-        proxy_display = proxy_url
-        if "@" in proxy_url:
-            # Format: http://user:pass@ip:port -> http://user:****@ip:port
-            parts = proxy_url.split("@")
-            if ":" in parts[0]:
-                user_part = parts[0].split(":")[0] + ":****"
-                proxy_display = user_part + "@" + parts[1]
-        logger.info(f"{identifier}: 🌐 Using proxy: {proxy_display}")
+        # Proxy password is masked only if the line is actually logged
+        account_logger.info("%s: 🌐 Using proxy: %s", identifier, MaskedProxy(proxy_url))
     else:
-        logger.info(f"{identifier}: 🌐 Direct connection (no proxy)")
+        account_logger.info("%s: 🌐 Direct connection (no proxy)", identifier)
 
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(f"{DISCORD_API}/users/@me", proxy=proxy_url, ssl=ssl_context, timeout=20) as resp:
-                if resp.status == 200:
-                    stats["tokens_valid"] += 1
-                    logger.info(f"{identifier}: ✅ Token is VALID")
-                    valid_tokens_buffer.append((int(identifier) if identifier.isdigit() else 0, token))
-                    return True
-                elif resp.status == 401:
-                    logger.error(f"{identifier}: ❌ Token is INVALID (401 Unauthorized)")
-                else:
-                    logger.error(f"{identifier}: ⚠️ Token check error. Status: {resp.status}")
-    except Exception as e:
-        logger.error(f"{identifier}: ❌ Error checking token: {e}")
+        status, body = await discord_request("GET", "/users/@me", ROUTE_ME, token, proxy_url, user_agent,
+                                             identifier, "token check")
+        if status == 200:
+            try:
+                user_id = json_loads(body).get("id")
+            except ValueError:
+                user_id = None
+            record_token_verdict(identifier, token, True, user_id)
+            return True
+        elif status == 401:
+            invalidate_token(token)
+            account_logger.error("%s: ❌ Token is INVALID (401 Unauthorized)", identifier)
+            record_token_verdict(identifier, token, False)
+        else:
+            # 429 / 5xx after all retries, or another unexpected status - says nothing about the token
+            record_token_check_failure(identifier, f"HTTP {status}")
+    except DiscordRequestError as e:
+        record_token_check_failure(identifier, e)
+    return False
+
+
+def record_token_check_failure(identifier: str, reason):
+    """
+    Count a token check that got no answer about the token.
+
+    Server errors, rate limits, network errors and an open proxy circuit do not
+    prove a token invalid, so no verdict is recorded: the token is neither
+    written to invalid_tokens.csv nor to the caches, and is checked again next run.
+    """
+    stats["tokens_check_failed"] += 1
+    account_logger.error("%s: ⚠️ Token could not be checked (%s) - not marked invalid", identifier, reason)
+
+
+def record_token_verdict(identifier: str, token: str, is_valid: bool, user_id: str = None, cached: bool = False):
+    """
+    Count a token check and remember the token for the valid/invalid CSV.
 
+    Valid verdicts are also stored in the token status cache, and every
+    verdict in the state database if it is enabled.
+
+    Args:
+        identifier: Profile identifier
+        token: Discord token
+        is_valid: Result of the check
+        user_id: Discord user ID if known
+        cached: Verdict taken from the token status cache - not stored there
+            again, so the entry expires TOKEN_CACHE_TTL after the real check
+    """
+    stats["tokens_checked"] += 1
+    journal_event("token", profile=identifier, valid=is_valid)
     # Save as tuple with numeric id for sorting
-    stats["tokens_invalid"] += 1
-    invalid_tokens_buffer.append((int(identifier) if identifier.isdigit() else 0, token))
-    return False
+    entry = (int(identifier) if identifier.isdigit() else 0, token)
+    if is_valid:
+        stats["tokens_valid"] += 1
+        account_logger.info("%s: ✅ Token is VALID", identifier)
+        valid_tokens_buffer.append(entry)
+        if TOKEN_CACHE_ENABLED and not cached:
+            token_cache.record(token, True, user_id)
+    else:
+        stats["tokens_invalid"] += 1
+        invalid_tokens_buffer.append(entry)
+    update_state_store(state_store.record_account, identifier, token, is_valid, user_id)
+
+
+def update_state_store(method, *args):
+    """
+    Queue a StateStore update on the output writer thread if the state database is enabled.
+
+    Database errors are logged and never interrupt profile processing. A remote
+    worker keeps the update for the coordinator, which owns the database.
+    """
+    if _lease_capture is not None:
+        if _lease_capture["state"] is not None:
+            _lease_capture["state"].append([method.__name__, list(args)])
+        return
+    if STATE_DB_ENABLED:
+        output_writer.submit_nowait(_apply_state_update, method, *args)
+
+
+def _apply_state_update(method, *args):
+    # Runs on the output writer thread
+    try:
+        method(*args)
+    except Exception as e:
+        logger.error(f"State database update failed ({method.__name__}): {e}")
+
+
+def journal_event(event: str, **fields):
+    """Queue a run journal line on the output writer thread (remote workers keep it for the coordinator)"""
+    if _lease_capture is not None:
+        _lease_capture["journal"].append([event, fields])
+    elif run_journal.active:
+        output_writer.submit_nowait(run_journal.append, event, **fields)
+
+
+def capture_profile_file(path: str):
+    """Remember a per-profile CSV for the lease report of a remote worker (no-op in other runs)"""
+    if _lease_capture is not None:
+        _lease_capture["files"].append(path)
+
+
+def invalidate_token(token: str):
+    """Drop cached valid verdict after a 401 response"""
+    if TOKEN_CACHE_ENABLED:
+        token_cache.invalidate(token)
+
+
+def flush_token_cache():
+    """Save token status cache to disk"""
+    if not TOKEN_CACHE_ENABLED:
+        return
+    try:
+        token_cache.save()
+    except Exception as e:
+        logger.error(f"Failed to save token status cache: {e}")
+
+
+async def fetch_guilds_and_validate(token: str, proxy: str, user_agent: str, identifier: str):
+    """
+    Load all guilds of the account and use the response as token validation.
+
+    A successful guild list proves the token is valid and a 401 proves it
+    invalid; any other failure leaves the token unchecked, exactly like
+    validate_token_and_log_invalid does for /users/@me.
+    This saves one request per account.
+
+    Args:
+        token: Discord token
+        proxy: Proxy string (optional)
+        user_agent: User agent string
+        identifier: Profile identifier for logging
+
+    Returns:
+        List of guild dictionaries, or None if the token is invalid / the request failed
+    """
+    guilds = []
+    try:
+        async for page in iter_guild_pages(token, proxy, user_agent, identifier):
+            guilds.extend(page)
+    except GuildFetchError as e:
+        record_guild_list_token_failure(identifier, token, e)
+        return None
+
+    record_token_verdict(identifier, token, True)
+    account_logger.info("%s: ✅ Received %s guilds", identifier, len(guilds))
+    return guilds
+
+
+def record_guild_list_token_failure(identifier: str, token: str, error: "GuildFetchError"):
+    """Record the token check result of a guild list that failed before its first page"""
+    if error.status == 401:
+        account_logger.error("%s: ❌ Token check via guild list failed: %s", identifier, error)
+        record_token_verdict(identifier, token, False)
+    else:
+        record_token_check_failure(identifier, error)
 
 
 def flush_invalid_tokens():
@@ -280,9 +732,246 @@ def flush_valid_tokens():
         logger.error(f"Failed to save valid tokens to CSV: {e}")
 
 
+def checkpoint_guilds_all():
+    """Queue a checkpoint write of guilds_all.csv on the output writer thread"""
+    if STATE_DB_ENABLED:
+        # Exported from the database on the writer thread, after the queued updates
+        guilds_aggregator.mark_saved()
+        rows = None
+    else:
+        rows = guilds_aggregator.snapshot()
+    output_writer.submit_nowait(_write_guilds_all, rows)
+
+
+def _write_guilds_all(rows):
+    # Runs on the output writer thread
+    write_csv_atomic(GUILDS_ALL_OUTPUT, rows if rows is not None else state_store.guild_rows())
+    logger.info(f"💾 Checkpoint: saved guilds to {os.path.abspath(GUILDS_ALL_OUTPUT)}")
+
+
+def flush_guilds_all():
+    """
+    Write the combined guild list (guilds_all.csv) if it has unsaved guilds.
+
+    With the state database enabled the CSV is exported from the database,
+    together with the account/guild memberships (memberships.csv).
+    """
+    try:
+        rows = state_store.guild_rows() if STATE_DB_ENABLED else None
+        if guilds_aggregator.write(rows):
+            saved = state_store.guild_count() if STATE_DB_ENABLED else len(guilds_aggregator)
+            logger.info(f"💾 Saved {saved} guilds to {os.path.abspath(GUILDS_ALL_OUTPUT)}")
+    except Exception as e:
+        logger.error(f"Error writing combined file: {e}")
+
+    if STATE_DB_ENABLED:
+        try:
+            count = state_store.export_memberships_csv(MEMBERSHIPS_CSV)
+            logger.info(f"💾 Saved {count} account memberships to {os.path.abspath(MEMBERSHIPS_CSV)}")
+        except Exception as e:
+            logger.error(f"Error writing memberships file: {e}")
+
+
+# TODO --- БЛОК ЗАПРОСОВ К DISCORD С ПОВТОРАМИ ---
+class DiscordRequestError(Exception):
+    """Raised when a Discord request got no usable response (network errors, proxy circuit open)"""
+
+
+def on_circuit_state_change(proxy_url: str, state: str):
+    """Log and count transitions of a proxy's circuit breaker"""
+    metrics.inc("proxy_circuit_transitions_total", proxy=proxy_label(proxy_url), state=state)
+    if state == CircuitBreaker.OPEN:
+        logger.warning(f"⛔ Proxy {MaskedProxy(proxy_url)} keeps failing - "
+                       f"requests through it paused for {circuit_breaker.reset_timeout:.0f} sec")
+    elif state == CircuitBreaker.CLOSED:
+        logger.info(f"✅ Proxy {MaskedProxy(proxy_url)} works again - requests through it resumed")
+
+
+async def discord_request(method: str, path: str, route: str, token: str, proxy_url: str, user_agent: str,
+                          identifier: str, action: str, attempts: int = 3, params: dict = None) -> tuple:
+    """
+    Send a Discord API request with the shared retry policy.
+
+    429 responses are retried once the rate limiter's wait is over; 408/5xx
+    responses and network errors after an exponential backoff with jitter,
+    as long as the request deadline and the run's retry budget allow it.
+    Network errors count against the proxy's circuit breaker, and a request
+    through a proxy with an open circuit fails at once.
+
+    Args:
+        method: HTTP method
+        path: Path below DISCORD_API
+        route: Route template (rate limit bucket and metrics label)
+        token: Discord token
+        proxy_url: Formatted proxy URL (empty for direct connection)
+        user_agent: User agent string
+        identifier: Profile identifier for logging
+        action: What is requested, for log messages ("guild list")
+        attempts: Attempts including the first one
+        params: Query parameters (optional)
+
+    Returns:
+        Tuple (status, body bytes) of the final response - the last 429/5xx
+        response if the request gave up on those
+
+    Raises:
+        DiscordRequestError: If no response arrived
+    """
+    headers = {"Authorization": token}
+    started = time.monotonic()
+    retry_budget.record_request()
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if proxy_url and not circuit_breaker.allow(proxy_url):
+            account_logger.error("%s: ⛔ Proxy keeps failing, %s request not sent", identifier, action)
+            raise DiscordRequestError("Proxy circuit open - proxy keeps failing")
+        if attempt > 1:
+            metrics.inc("discord_retries_total", route=route)
+
+        try:
+            await rate_limiter.acquire(token, route)
+            session = session_pool.get(proxy_url, user_agent)
+            timeout = aiohttp.ClientTimeout(
+                total=max(1.0, min(DISCORD_REQUEST_TIMEOUT, retry_policy.remaining(started))))
+            async with session.request(method, f"{DISCORD_API}{path}", headers=headers, params=params,
+                                       proxy=proxy_url, timeout=timeout, trace_request_ctx={"route": route}) as resp:
+                status = resp.status
+                retry_after = rate_limiter.update(token, route, status, resp.headers)
+                body = await resp.read()
+        except Exception as e:
+            if classify_exception(e) == FATAL:
+                account_logger.error("%s: Unknown error (%s): %s", identifier, action, e)
+                raise DiscordRequestError(f"Unknown error: {e}")
+            if proxy_url:
+                circuit_breaker.record_failure(proxy_url)
+            error = f"Timeout: {e}" if isinstance(e, asyncio.TimeoutError) else f"Network connection error: {e}"
+            account_logger.error("%s: %s (%s). Attempt #%s", identifier, error, action, attempt)
+            delay, give_up = retry_policy.next_delay(attempt, started, RETRY, attempts)
+            if delay is None:
+                account_logger.error("%s: ❌ Giving up on %s: %s", identifier, action, give_up)
+                raise DiscordRequestError(error)
+            await asyncio.sleep(delay)
+            continue
+
+        # Any response proves the proxy forwards traffic
+        if proxy_url:
+            circuit_breaker.record_success(proxy_url)
+        outcome = classify_status(status)
+        if outcome == OK:
+            return status, body
+
+        if outcome == RATE_LIMITED:
+            # rate_limiter.acquire() waits out the limit before the next attempt
+            account_logger.warning("%s: ⚠️ Rate limited (429). Waiting %s sec before retry #%s",
+                                   identifier, retry_after, attempt)
+        else:
+            account_logger.warning("%s: ⚠️ Discord server error (%s) on %s. Attempt #%s",
+                                   identifier, status, action, attempt)
+        delay, give_up = retry_policy.next_delay(attempt, started, outcome, attempts)
+        if delay is None:
+            account_logger.error("%s: ❌ Giving up on %s: %s", identifier, action, give_up)
+            return status, body
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class GuildFetchError(Exception):
+    """Raised when a guild list page could not be loaded"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status  # HTTP status of the last response (None for network errors)
+
+
+async def _fetch_guild_page(token: str, proxy_url: str, user_agent: str, identifier: str, retries: int,
+                            after: str = None) -> list:
+    """
+    Load one page of the account's guild list (retried by discord_request).
+
+    Args:
+        token: Discord token
+        proxy_url: Formatted proxy URL (empty for direct connection)
+        user_agent: User agent string
+        identifier: Profile identifier for logging
+        retries: Number of retry attempts
+        after: Return guilds with ID greater than this one (None for the first page)
+
+    Returns:
+        List of guild dictionaries (at most GUILDS_PAGE_SIZE)
+
+    Raises:
+        GuildFetchError: If the page could not be loaded
+    """
+    params = {"limit": GUILDS_PAGE_SIZE}
+    if after:
+        params["after"] = after
+
+    account_logger.info("%s: Getting guilds...", identifier)
+    try:
+        status, body = await discord_request("GET", "/users/@me/guilds", ROUTE_GUILDS, token, proxy_url, user_agent,
+                                             identifier, "guild list", attempts=retries, params=params)
+    except DiscordRequestError as e:
+        raise GuildFetchError(str(e))
+
+    if status == 200:
+        try:
+            return json_loads(body)
+        except ValueError as e:
+            account_logger.error("%s: JSON parsing error: %s", identifier, e)
+            raise GuildFetchError(f"JSON parsing error: {e}", status)
+    elif status == 401:
+        invalidate_token(token)
+        account_logger.error("%s: ❌ Invalid token (401 Unauthorized)", identifier)
+        raise GuildFetchError("401 Unauthorized - Invalid token", status)
+    account_logger.error("%s: ❌ Failed to get guilds. Status: %s", identifier, status)
+    raise GuildFetchError(f"HTTP {status}", status)
+
+
+async def iter_guild_pages(token: str, proxy: str = None, user_agent: str = None, identifier: str = "",
+                           retries: int = 3):
+    """
+    Iterate over the account's guild list page by page.
+
+    Discord returns at most 200 guilds per request; the next page is requested
+    with `after` set to the highest guild ID seen so far, until a short page
+    arrives. Pages are yielded as soon as they are received.
+
+    Args:
+        token: Discord token
+        proxy: Proxy string (optional)
+        user_agent: User agent string
+        identifier: Profile identifier for logging
+        retries: Number of retry attempts per page
+
+    Yields:
+        Lists of guild dictionaries
+
+    Raises:
+        GuildFetchError: If a page could not be loaded
+    """
+    proxy_url = format_proxy(proxy)
+
+    # Log proxy usage once per guild list
+    if proxy_url:
+        account_logger.info("%s: 🌐 Using proxy: %s", identifier, MaskedProxy(proxy_url))
+    else:
+        account_logger.info("%s: 🌐 Direct connection (no proxy)", identifier)
+
+    after = None
+    while True:
+        page = await _fetch_guild_page(token, proxy_url, user_agent, identifier, retries, after)
+        if page:
+            yield page
+        if len(page) < GUILDS_PAGE_SIZE:
+            return
+        after = str(max(int(g["id"]) for g in page))
+
+
 async def get_guilds(token: str, proxy: str = None, user_agent: str = None, identifier: str = "", retries: int = 3):
     """
-    Get list of guilds for a Discord account.
+    Get list of guilds for a Discord account (all pages).
 
     Args:
         token: Discord token
@@ -294,77 +983,15 @@ async def get_guilds(token: str, proxy: str = None, user_agent: str = None, iden
     Returns:
         List of guild dictionaries or empty list on failure
     """
-    headers = {
-        "Authorization": token,
-        "User-Agent": user_agent or "Mozilla/5.0",
-    }
-    proxy_url = format_proxy(proxy)
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-    for attempt in range(1, retries + 1):
-        try:
-            # Log proxy usage on first attempt
-            if attempt == 1:
-                if proxy_url:
-                    proxy_display = proxy_url
-                    if "@" in proxy_url:
-                        parts = proxy_url.split("@")
-                        if ":" in parts[0]:
-                            user_part = parts[0].split(":")[0] + ":****"
-                            proxy_display = user_part + "@" + parts[1]
-                    logger.info(f"{identifier}: 🌐 Using proxy: {proxy_display}")
-                else:
-                    logger.info(f"{identifier}: 🌐 Direct connection (no proxy)")
-
-            logger.info(f"{identifier}: Getting guilds... (attempt #{attempt})")
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(f"{DISCORD_API}/users/@me/guilds", proxy=proxy_url, ssl=ssl_context,
-                                       timeout=20) as resp:
-                    if resp.status == 200:
-                        try:
-                            guilds = await resp.json()
-                            logger.info(f"{identifier}: ✅ Received {len(guilds)} guilds")
-                            return guilds
-                        except ValueError as e:
-                            logger.error(f"{identifier}: JSON parsing error: {e}")
-                            return []
-                    elif resp.status == 401:
-                        logger.error(f"{identifier}: ❌ Invalid token (401 Unauthorized)")
-                        return []
-                    elif resp.status == 429:
-                        retry_after = float(resp.headers.get("Retry-After", 5))
-                        logger.warning(
-                            f"{identifier}: ⚠️ Rate limited (429). Waiting {retry_after} sec before retry #{attempt}")
-                        await asyncio.sleep(retry_after)
-                        continue
-                    elif resp.status == 503:
-                        logger.warning(f"{identifier}: ⚠️ Discord server unavailable (503). Retry #{attempt}")
-                        await asyncio.sleep(random.uniform(5, 10))
-                        continue
-                    elif resp.status == 500:
-                        logger.warning(f"{identifier}: ⚠️ Internal server error (500). Retry #{attempt}")
-                        await asyncio.sleep(random.uniform(5, 10))
-                        continue
-                    else:
-                        logger.error(f"{identifier}: ❌ Failed to get guilds. Status: {resp.status}")
-                        return []
-
-        except aiohttp.ClientConnectionError as e:
-            logger.error(f"{identifier}: Network connection error: {e}. Attempt #{attempt}")
-            if attempt == retries:
-                return []
-            await asyncio.sleep(random.uniform(3, 6))
-        except asyncio.TimeoutError as e:
-            logger.error(f"{identifier}: Request timeout: {e}. Attempt #{attempt}")
-            if attempt == retries:
-                return []
-            await asyncio.sleep(random.uniform(3, 6))
-        except Exception as e:
-            logger.error(f"{identifier}: Unknown error getting guilds: {e}")
-            return []
+    guilds = []
+    try:
+        async for page in iter_guild_pages(token, proxy, user_agent, identifier, retries):
+            guilds.extend(page)
+    except GuildFetchError:
+        return []
 
-    logger.error(f"{identifier}: ❌ Failed to get guilds after {retries} attempts")
-    return []
+    account_logger.info("%s: ✅ Received %s guilds", identifier, len(guilds))
+    return guilds
 
 
 async def leave_guild(token: str, guild: dict, proxy: str = None, user_agent: str = None, identifier: str = "",
@@ -386,96 +1013,211 @@ async def leave_guild(token: str, guild: dict, proxy: str = None, user_agent: st
     guild_name = guild.get("name", "[no name]")
     guild_id = guild.get("id")
 
-    headers = {
-        "Authorization": token,
-        "User-Agent": user_agent or "Mozilla/5.0",
-    }
     proxy_url = format_proxy(proxy)
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
 
     # Log proxy usage on first leave attempt
     if proxy_url:
-        proxy_display = proxy_url
-        if "@" in proxy_url:
-            parts = proxy_url.split("@")
-            if ":" in parts[0]:
-                user_part = parts[0].split(":")[0] + ":****"
-                proxy_display = user_part + "@" + parts[1]
-        logger.info(f"{identifier}: 🌐 Using proxy: {proxy_display}")
+        account_logger.info("%s: 🌐 Using proxy: %s", identifier, MaskedProxy(proxy_url))
     else:
-        logger.info(f"{identifier}: 🌐 Direct connection (no proxy)")
+        account_logger.info("%s: 🌐 Direct connection (no proxy)", identifier)
 
-    for attempt in range(1, retries + 1):
+    if DISCORD_REQUEST_DELAY[1] > 0:
         await asyncio.sleep(random.uniform(*DISCORD_REQUEST_DELAY))
+    try:
+        status, _ = await discord_request("DELETE", f"/users/@me/guilds/{guild_id}", ROUTE_LEAVE_GUILD, token,
+                                          proxy_url, user_agent, identifier, "guild leave", attempts=retries)
+    except DiscordRequestError as e:
+        account_logger.error("%s: ❌ Failed to leave guild '%s': %s", identifier, guild_name, e)
+        return False, str(e)
+
+    if status == 204:
+        account_logger.info("✅ %s: Left guild '%s' (ID: %s)", identifier, guild_name, guild_id)
+        return True, None
+    elif status == 401:
+        invalidate_token(token)
+        account_logger.error("%s: ❌ Invalid token (401 Unauthorized)", identifier)
+        return False, "401 Unauthorized - Invalid token"
+    elif status == 403:
+        account_logger.error("%s: ❌ No permission to leave guild '%s' (403 Forbidden)", identifier, guild_name)
+        return False, "403 Forbidden - No permission"
+    elif status == 404:
+        account_logger.warning("%s: ⚠️ Guild '%s' not found (404). Already left?", identifier, guild_name)
+        return True, None
+    account_logger.error("%s: ❌ Failed to leave guild '%s'. Status: %s", identifier, guild_name, status)
+    return False, f"HTTP {status}"
+
+
+def read_leave_list(leave_list_path: str = GUILDS_LEAVE_FILE) -> list:
+    """
+    Read guild names/IDs to leave.
+
+    Args:
+        leave_list_path: Path to file with guilds to leave
+
+    Returns:
+        List of entries (comments and empty lines skipped)
+
+    Raises:
+        FileNotFoundError: If the leave list file does not exist
+    """
+    with open(leave_list_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def build_guild_index(guilds) -> GuildNameIndex:
+    """
+    Build a name index from (name, id) pairs.
+
+    Args:
+        guilds: Iterable of (guild_name, guild_id) pairs
+
+    Returns:
+        GuildNameIndex configured with GUILD_FUZZY_MATCH settings
+    """
+    return GuildNameIndex(guilds, fuzzy=GUILD_FUZZY_MATCH, fuzzy_threshold=GUILD_FUZZY_THRESHOLD)
+
+
+def load_guilds_database() -> GuildNameIndex:
+    """
+    Load guild database from the state database or the combined CSV (guilds_all.csv).
+
+    Returns:
+        GuildNameIndex of all guilds, empty if the file is missing or unreadable
+    """
+    if STATE_DB_ENABLED:
+        open_state_store()
         try:
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.delete(f"{DISCORD_API}/users/@me/guilds/{guild_id}", proxy=proxy_url,
-                                          ssl=ssl_context, timeout=20) as resp:
-                    if resp.status == 204:
-                        logger.info(f"✅ {identifier}: Left guild '{guild_name}' (ID: {guild_id})")
-                        return True, None
-                    elif resp.status == 401:
-                        logger.error(f"{identifier}: ❌ Invalid token (401 Unauthorized)")
-                        error_reason = "401 Unauthorized - Invalid token"
-                        return False, error_reason
-                    elif resp.status == 403:
-                        logger.error(f"{identifier}: ❌ No permission to leave guild '{guild_name}' (403 Forbidden)")
-                        error_reason = "403 Forbidden - No permission"
-                        return False, error_reason
-                    elif resp.status == 404:
-                        logger.warning(f"{identifier}: ⚠️ Guild '{guild_name}' not found (404). Already left?")
-                        return True, None
-                    elif resp.status == 429:
-                        retry_after = float(resp.headers.get("Retry-After", 5))
-                        logger.warning(
-                            f"{identifier}: ⚠️ Rate limited (429). Waiting {retry_after} sec before retry #{attempt}")
-                        await asyncio.sleep(retry_after)
-                        continue
-                    else:
-                        logger.error(f"{identifier}: ❌ Failed to leave guild. Status: {resp.status}")
-                        error_reason = f"HTTP {resp.status}"
-                        if attempt == retries:
-                            return False, error_reason
-                        await asyncio.sleep(random.uniform(3, 6))
-
-        except asyncio.TimeoutError as e:
-            logger.error(f"{identifier}: Request timeout: {e}. Attempt #{attempt}")
-            error_reason = f"Timeout: {e}"
-            if attempt == retries:
-                return False, error_reason
-            await asyncio.sleep(random.uniform(3, 6))
-        except aiohttp.ClientResponseError as e:
-            logger.error(f"{identifier}: Server response error: {e}. Attempt #{attempt}")
-            error_reason = f"Response error: {e}"
-            if attempt == retries:
-                return False, error_reason
-            await asyncio.sleep(random.uniform(3, 6))
+            logger.info(f"📂 Loading guild database from {STATE_DB_FILE}")
+            guild_index = build_guild_index(state_store.guild_pairs())
+            logger.info(f"✅ Loaded {len(guild_index)} guilds from state database")
+            return guild_index
         except Exception as e:
-            logger.error(f"{identifier}: Unknown error leaving guild: {e}")
-            error_reason = f"Unknown error: {e}"
-            return False, error_reason
+            logger.error(f"❌ Failed to load state database, falling back to CSV: {e}")
+
+    guild_pairs = []
+    if not os.path.exists(GUILDS_ALL_OUTPUT):
+        return build_guild_index(guild_pairs)
+
+    logger.info(f"📂 Loading guild database from {GUILDS_ALL_OUTPUT}")
+    try:
+        with open(GUILDS_ALL_OUTPUT, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=';')
+            for row in reader:
+                guild_name = row.get("Server Name", "").strip()
+                guild_id = row.get("Server ID", "").strip().strip("'")  # Remove apostrophe if present
+                if guild_name and guild_id:
+                    guild_pairs.append((guild_name, guild_id))
+        logger.info(f"✅ Loaded {len(guild_pairs)} guilds from CSV database")
+    except Exception as e:
+        logger.error(f"❌ Failed to load CSV database: {e}")
+        guild_pairs = []
+    return build_guild_index(guild_pairs)
+
+
+def resolve_leave_list(leave_list: list, guild_index: GuildNameIndex, identifier: str = "") -> tuple:
+    """
+    Convert leave list entries (names or IDs) to guilds with IDs.
+
+    Names are looked up exactly, then case-insensitively, then ignoring
+    diacritics/emoji/punctuation and, if enabled, by fuzzy match. A name that
+    matches several guild IDs is reported and skipped - use the ID instead.
+
+    Args:
+        leave_list: Entries from the leave list file
+        guild_index: Index of known guilds
+        identifier: Prefix for log messages (profile identifier or empty for run level)
+
+    Returns:
+        Tuple of guild dictionaries {"name", "id"}
+    """
+    prefix = f"{identifier}: " if identifier else ""
+    log = account_logger if identifier else logger
+    to_leave_guilds = []
+
+    for item in leave_list:
+        # Check if item is already an ID (long numeric string)
+        if len(item) > 15 and item.isdigit():
+            log.info("%s🆔 Using direct ID: %s", prefix, item)
+            to_leave_guilds.append({"name": "Unknown", "id": item})
+            continue
+
+        match_level, matches = guild_index.lookup(item)
+        if not matches:
+            log.warning("%s⚠️ Guild '%s' not found in database - skipping", prefix, item)
+        elif len(matches) > 1:
+            candidates = ", ".join(f"'{name}' ({guild_id})" for name, guild_id in matches)
+            log.warning("%s⚠️ Guild '%s' is ambiguous (%s match): %s - skipping, put the ID in the leave list instead",
+                        prefix, item, match_level, candidates)
+        else:
+            guild_name, guild_id = matches[0]
+            if match_level == "exact":
+                log.info("%s✅ Found '%s' in database (ID: %s)", prefix, guild_name, guild_id)
+            else:
+                log.info("%s✅ Found '%s' (%s) in database (ID: %s)", prefix, guild_name, match_level, guild_id)
+            to_leave_guilds.append({"name": guild_name, "id": guild_id})
 
-    logger.error(f"{identifier}: ❌ Failed to leave guild '{guild_name}' after {retries} attempts")
-    error_reason = f"Failed after {retries} attempts"
-    return False, error_reason
+    return tuple(to_leave_guilds)
 
 
-async def handle_guilds(profile: dict, mode: str, leave_list_path: str = GUILDS_LEAVE_FILE):
+def load_leave_plan(leave_list_path: str = GUILDS_LEAVE_FILE):
+    """
+    Read the leave list and resolve it to guild IDs once for the whole run.
+
+    The plan is shared read-only by all profiles, so every profile only has to
+    send the DELETE requests. If the guild database (guilds_all.csv) is not
+    available, "guilds" is None and each profile resolves the entries against
+    its own guild list from the API.
+
+    Args:
+        leave_list_path: Path to file with guilds to leave
+
+    Returns:
+        Dict {"entries": tuple, "guilds": tuple or None}, or None if there is nothing to do
+    """
+    # TODO --- ШАГ 1: ЧТЕНИЕ СПИСКА НА ВЫХОД ---
+    try:
+        leave_list = read_leave_list(leave_list_path)
+    except FileNotFoundError:
+        logger.error(f"❌ Leave list file not found: {leave_list_path}")
+        logger.error(f"Please create the file or run MODE 2 (Collect guilds) first")
+        return None
+
+    if not leave_list:
+        logger.warning(f"⚠️ Leave list is empty, nothing to do")
+        return None
+
+    logger.info(f"📋 Processing {len(leave_list)} entries from leave list")
+
+    # TODO --- ШАГ 2: ЗАГРУЗКА БАЗЫ ДАННЫХ ГИЛЬДИЙ (CSV или API) ---
+    guild_index = load_guilds_database()
+    if not len(guild_index):
+        logger.warning(f"⚠️ Guild database (guilds_all.csv) not found or empty")
+        logger.warning(f"⚠️ Each account will resolve the leave list from its own guilds via API")
+        return {"entries": tuple(leave_list), "guilds": None}
+
+    # TODO --- ШАГ 3: ПРЕОБРАЗОВАНИЕ В ID ---
+    to_leave_guilds = resolve_leave_list(leave_list, guild_index)
+    logger.info(f"🎯 Leave plan: {len(to_leave_guilds)} guilds resolved from {len(leave_list)} entries")
+    return {"entries": tuple(leave_list), "guilds": to_leave_guilds}
+
+
+async def handle_guilds(profile: Profile, mode: str, leave_list_path: str = GUILDS_LEAVE_FILE, leave_plan: dict = None):
     """
     Main function for handling guild operations.
 
     Args:
-        profile: Profile dictionary with token, proxy, user_agent
+        profile: Profile with token, proxy and user agent
         mode: Operation mode - 'collect' or 'leave'
         leave_list_path: Path to file with guilds to leave
+        leave_plan: Resolved leave plan from load_leave_plan (loaded from leave_list_path if None)
     """
-    identifier = profile["identifier"]
-    token = profile.get("ds_tokens")
-    proxy = profile.get("proxies")
-    user_agent = profile.get("user_agent")
+    identifier = profile.identifier
+    token = profile.token
+    proxy = profile.proxy
+    user_agent = profile.user_agent
 
     if not token:
-        logger.error(f"{identifier}: Discord token missing in profile")
+        account_logger.error("%s: Discord token missing in profile", identifier)
         return
 
     stats["accounts_processed"] += 1
@@ -484,14 +1226,10 @@ async def handle_guilds(profile: dict, mode: str, leave_list_path: str = GUILDS_
     proxy_valid = await validate_proxy(proxy, identifier)
     if not proxy_valid:
         stats["accounts_skipped_proxy"] += 1
-        logger.error(f"{identifier}: ❌ SKIPPING account due to invalid proxy (security measure)")
+        account_logger.error("%s: ❌ SKIPPING account due to invalid proxy (security measure)", identifier)
         return
 
-    # Re-validate token
-    is_valid = await validate_token_and_log_invalid(token, proxy, user_agent, identifier)
-    if not is_valid:
-        logger.warning(f"{identifier}: ⚠️ Skipping profile due to invalid token")
-        return
+    # Token is validated by the first guild list request (or /users/@me if no list is needed)
 
     # Create guilds_leave.txt only in collect mode and only if it doesn't exist
     if mode == "collect" and not os.path.exists(leave_list_path):
@@ -506,161 +1244,137 @@ async def handle_guilds(profile: dict, mode: str, leave_list_path: str = GUILDS_
 
     # TODO --- БЛОК ПОЛУЧЕНИЯ СПИСКА ГИЛЬДИЙ ---
     if mode == "collect":
-        # In collect mode, always fetch guilds from API
-        guilds = await get_guilds(token, proxy, user_agent, identifier)
-        if not guilds:
-            logger.warning(f"{identifier}: Guild list is empty or failed to load")
-            return
-
-        stats["guilds_collected"] += len(guilds)
-
-        # Save individual profile guilds
+        # In collect mode, always fetch guilds from API.
+        # Pages are written to the profile CSV and the combined list as they arrive.
         filename = f"output/guilds_{identifier}.csv"
-        with open(filename, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.writer(f, delimiter=';')
-            writer.writerow(["#", "Server Name", "Server ID"])
-            for i, g in enumerate(guilds, 1):
-                # Добавляем апостроф перед ID чтобы Excel не конвертировал в научную нотацию
-                writer.writerow([i, g["name"], f"'{g['id']}"])
-        logger.info(f"{identifier}: Guild list saved to {os.path.abspath(filename)}")
-
-        # Add to combined file using pure Python + CSV
-        new_guilds = [{"Server Name": g["name"], "Server ID": g["id"]} for g in guilds]
-
-        # Load existing guilds from combined file
-        existing_guilds = {}
-        if os.path.exists(GUILDS_ALL_OUTPUT):
-            try:
-                with open(GUILDS_ALL_OUTPUT, "r", newline="", encoding="utf-8-sig") as f:
-                    reader = csv.DictReader(f, delimiter=';')
-                    for row in reader:
-                        if "Server ID" in row and row["Server ID"]:
-                            # Remove apostrophe if present
-                            server_id = str(row["Server ID"]).strip().lstrip("'")
-                            server_name = str(row.get("Server Name", "")).strip()
-                            existing_guilds[server_id] = server_name
-            except Exception as e:
-                logger.error(f"{identifier}: Error reading combined file: {e}")
-
-        # Add new guilds (deduplicate by Server ID)
-        for guild in new_guilds:
-            server_id = str(guild["Server ID"]).strip()
-            server_name = str(guild["Server Name"]).strip()
-            if server_id:
-                existing_guilds[server_id] = server_name
-
-        # Sort by name and write back
-        sorted_guilds = sorted(existing_guilds.items(), key=lambda x: x[1].lower())
-
+        file_opened = False
+        guilds_count = 0
+        token_checked = False
+        list_complete = False
+        collect_started = time.time()
         try:
-            with open(GUILDS_ALL_OUTPUT, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow(["#", "Server Name", "Server ID"])
-                for i, (server_id, server_name) in enumerate(sorted_guilds, 1):
+            async for page in iter_guild_pages(token, proxy, user_agent, identifier):
+                # First page proves the token is valid
+                if not token_checked:
+                    record_token_verdict(identifier, token, True)
+                    token_checked = True
+
+                # Save individual profile guilds (written by the output writer thread)
+                rows = []
+                for g in page:
+                    guilds_count += 1
                     # Добавляем апостроф перед ID чтобы Excel не конвертировал в научную нотацию
-                    writer.writerow([i, server_name, f"'{server_id}"])
-            logger.info(f"{identifier}: List added to {os.path.abspath(GUILDS_ALL_OUTPUT)}")
-        except Exception as e:
-            logger.error(f"{identifier}: Error writing combined file: {e}")
+                    rows.append([guilds_count, g["name"], f"'{g['id']}"])
+                await output_writer.write_rows(filename, rows, header=["#", "Server Name", "Server ID"],
+                                               new_file=not file_opened)
+                file_opened = True
+                stats["guilds_collected"] += len(page)
+
+                # Add to combined list (deduplicated by Server ID, written by flush_guilds_all)
+                try:
+                    guilds_aggregator.add(page)
+                except Exception as e:
+                    account_logger.error("%s: Error reading combined file: %s", identifier, e)
+                update_state_store(state_store.record_guilds, identifier, page)
+            list_complete = True
+        except GuildFetchError as e:
+            if not token_checked:
+                record_guild_list_token_failure(identifier, token, e)
+                account_logger.warning("%s: ⚠️ Skipping profile (token invalid or not checked)", identifier)
+                return
+            account_logger.warning("%s: ⚠️ Guild list incomplete after %s guilds: %s", identifier, guilds_count, e)
+        finally:
+            if file_opened:
+                await output_writer.close_file(filename)
+                capture_profile_file(filename)
+
+        if not token_checked:
+            # Account without guilds - the empty response still proves the token
+            record_token_verdict(identifier, token, True)
+
+        if list_complete:
+            # Guilds missing from a complete list were left since the last run
+            update_state_store(state_store.prune_memberships, identifier, collect_started)
+
+        if not guilds_count:
+            account_logger.warning("%s: Guild list is empty or failed to load", identifier)
+            return
+
+        account_logger.info("%s: ✅ Received %s guilds", identifier, guilds_count)
+        account_logger.info("%s: Guild list saved to %s", identifier, os.path.abspath(filename))
+        account_logger.info("%s: List added to combined guilds (%s unique so far)", identifier, len(guilds_aggregator))
+
+        if guilds_aggregator.checkpoint_due():
+            checkpoint_guilds_all()
 
     elif mode == "leave":
         # TODO --- БЛОК РЕЖИМА ВЫХОДА ИЗ ГИЛЬДИЙ ---
 
-        # TODO --- ШАГ 1: ЧТЕНИЕ СПИСКА НА ВЫХОД ---
-        leave_list = []
-        try:
-            with open(leave_list_path, "r", encoding="utf-8") as f:
-                leave_list = [line.strip() for line in f if line.strip() and not line.startswith("#")]
-        except FileNotFoundError:
-            logger.error(f"{identifier}: ❌ Leave list file not found: {leave_list_path}")
-            logger.error(f"{identifier}: Please create the file or run MODE 2 (Collect guilds) first")
-            return
-
-        if not leave_list:
-            logger.warning(f"{identifier}: ⚠️ Leave list is empty, nothing to do")
+        # Leave plan is normally built once per run in main(); build it here for direct calls
+        if leave_plan is None:
+            leave_plan = load_leave_plan(leave_list_path)
+        if not leave_plan:
             return
 
-        logger.info(f"{identifier}: 📋 Processing {len(leave_list)} entries from leave list")
+        to_leave_guilds = leave_plan["guilds"]
+        account_guilds = None
 
-        # TODO --- ШАГ 2: ЗАГРУЗКА БАЗЫ ДАННЫХ ГИЛЬДИЙ (CSV или API) ---
-        guilds_database = {}  # {name: id, name2: id2, ...}
+        if to_leave_guilds is None or LEAVE_ONLY_MEMBER_GUILDS:
+            # The account's guild list is needed anyway - let it double as token validation
+            account_logger.info("%s: 🔄 Fetching guilds from Discord API...", identifier)
+            account_guilds = await fetch_guilds_and_validate(token, proxy, user_agent, identifier)
+            if account_guilds is None:
+                account_logger.warning("%s: ⚠️ Skipping profile (token invalid or not checked)", identifier)
+                return
+        else:
+            is_valid = await validate_token_and_log_invalid(token, proxy, user_agent, identifier)
+            if not is_valid:
+                account_logger.warning("%s: ⚠️ Skipping profile (token invalid or not checked)", identifier)
+                return
 
-        if os.path.exists(GUILDS_ALL_OUTPUT):
-            # Try to load from CSV first (faster, no API calls)
-            logger.info(f"{identifier}: 📂 Loading guild database from {GUILDS_ALL_OUTPUT}")
-            try:
-                with open(GUILDS_ALL_OUTPUT, "r", newline="", encoding="utf-8-sig") as f:
-                    reader = csv.DictReader(f, delimiter=';')
-                    for row in reader:
-                        guild_name = row.get("Server Name", "").strip()
-                        guild_id = row.get("Server ID", "").strip().strip("'")  # Remove apostrophe if present
-                        if guild_name and guild_id:
-                            guilds_database[guild_name] = guild_id
-                logger.info(f"{identifier}: ✅ Loaded {len(guilds_database)} guilds from CSV database")
-            except Exception as e:
-                logger.error(f"{identifier}: ❌ Failed to load CSV database: {e}")
-                logger.warning(f"{identifier}: ⚠️ Falling back to API request...")
-                guilds_database = {}
-
-        # Fallback: if CSV doesn't exist or failed to load, fetch guilds from API
-        if not guilds_database:
-            logger.warning(f"{identifier}: ⚠️ Guild database (guilds_all.csv) not found or empty")
-            logger.info(f"{identifier}: 🔄 Fetching guilds from Discord API...")
-
-            guilds = await get_guilds(token, proxy, user_agent, identifier)
-            if not guilds:
-                logger.error(f"{identifier}: ❌ Failed to fetch guilds from API")
+        # Fallback: guild database (guilds_all.csv) was not available, resolve against this account's guilds
+        if to_leave_guilds is None:
+            if not account_guilds:
+                account_logger.error("%s: ❌ No guilds received from API", identifier)
                 return
 
             # Convert API response to database format
-            for guild in guilds:
-                guilds_database[guild["name"]] = guild["id"]
-
-            logger.info(f"{identifier}: ✅ Loaded {len(guilds_database)} guilds from API")
-
-        # TODO --- ШАГ 3: ПРЕОБРАЗОВАНИЕ В ID ---
-        to_leave_guilds = []
-
-        for item in leave_list:
-            guild_name = None
-            guild_id = None
-
-            # Check if item is already an ID (long numeric string)
-            if len(item) > 15 and item.isdigit():
-                guild_id = item
-                guild_name = "Unknown"
-                logger.info(f"{identifier}: 🆔 Using direct ID: {guild_id}")
-            else:
-                # Try to find by name in database (exact match first)
-                if item in guilds_database:
-                    guild_id = guilds_database[item]
-                    guild_name = item
-                    logger.info(f"{identifier}: ✅ Found '{guild_name}' in database (ID: {guild_id})")
-                else:
-                    # Try case-insensitive search
-                    found = False
-                    for db_name, db_id in guilds_database.items():
-                        if db_name.lower() == item.lower():
-                            guild_id = db_id
-                            guild_name = db_name
-                            logger.info(f"{identifier}: ✅ Found '{guild_name}' (case-insensitive) in database (ID: {guild_id})")
-                            found = True
-                            break
-
-                    if not found:
-                        logger.warning(f"{identifier}: ⚠️ Guild '{item}' not found in database - skipping")
-
-            if guild_id:
-                to_leave_guilds.append({"name": guild_name, "id": guild_id})
+            guild_index = build_guild_index((guild["name"], guild["id"]) for guild in account_guilds)
+            account_logger.info("%s: ✅ Loaded %s guilds from API", identifier, len(guild_index))
+            to_leave_guilds = resolve_leave_list(leave_plan["entries"], guild_index, identifier)
 
         if not to_leave_guilds:
-            logger.warning(f"{identifier}: ❌ No matching guilds found to leave")
+            account_logger.warning("%s: ❌ No matching guilds found to leave", identifier)
             return
 
-        logger.info(f"{identifier}: 🎯 Found {len(to_leave_guilds)} guilds to leave")
+        # Guilds left before the previous run was interrupted (--resume)
+        already_left = resumed_leaves.get(identifier, set())
+
+        # Per-account plan: only leave guilds this account is a member of
+        skipped_guilds = []
+        if LEAVE_ONLY_MEMBER_GUILDS:
+            member_names = {str(g["id"]): g.get("name") for g in account_guilds}
+            planned = []
+            for guild in to_leave_guilds:
+                if guild["id"] in already_left:
+                    # No longer in the guild list because it was left - reported from the run journal
+                    planned.append(guild)
+                elif guild["id"] not in member_names:
+                    skipped_guilds.append(guild)
+                elif guild["name"] == "Unknown" and member_names[guild["id"]]:
+                    # Direct ID from the leave list - use the real name from the account's guilds
+                    planned.append({"name": member_names[guild["id"]], "id": guild["id"]})
+                else:
+                    planned.append(guild)
+            to_leave_guilds = planned
+            stats["leaves_skipped_not_member"] += len(skipped_guilds)
+            account_logger.info("%s: 🧭 Member of %s of %s listed guilds, skipping %s",
+                                identifier, len(planned), len(planned) + len(skipped_guilds), len(skipped_guilds))
+
+        account_logger.info("%s: 🎯 Found %s guilds to leave", identifier, len(to_leave_guilds))
 
         # TODO --- ШАГ 4: ВЫХОД ИЗ ГИЛЬДИЙ С ОТСЛЕЖИВАНИЕМ РЕЗУЛЬТАТОВ ---
-        logger.info(f"{identifier}: 🚀 Starting leave operations...")
+        account_logger.info("%s: 🚀 Starting leave operations...", identifier)
         successful_leaves = 0
         failed_leaves = 0
 
@@ -676,75 +1390,460 @@ async def handle_guilds(profile: dict, mode: str, leave_list_path: str = GUILDS_
                     "failed_profiles": {}
                 }
 
-            logger.info(f"{identifier}: 🔄 Leaving '{guild_name}' ({idx}/{len(to_leave_guilds)})...")
+            account_logger.info("%s: 🔄 Leaving '%s' (%s/%s)...", identifier, guild_name, idx, len(to_leave_guilds))
 
-            success, error_reason = await leave_guild(token, guild, proxy, user_agent, identifier)
+            if guild_id in already_left:
+                # Left before the previous run was interrupted
+                account_logger.info("%s: ⏭️ Already left '%s' (run journal)", identifier, guild_name)
+                success, error_reason = True, None
+            else:
+                success, error_reason = await leave_guild(token, guild, proxy, user_agent, identifier)
+                journal_event("leave", profile=identifier, guild_id=guild_id, guild_name=guild_name,
+                                   ok=success, error=error_reason)
+                update_state_store(state_store.record_leave, identifier, guild_id, success, error_reason)
 
             if success:
                 successful_leaves += 1
                 # Add to global success list
                 profile_num = int(identifier) if identifier.isdigit() else 0
                 leave_results[guild_name]["success_profiles"].append(profile_num)
-                logger.info(f"{identifier}: ✅ Left '{guild_name}' ({idx}/{len(to_leave_guilds)})")
+                account_logger.info("%s: ✅ Left '%s' (%s/%s)", identifier, guild_name, idx, len(to_leave_guilds))
             else:
                 failed_leaves += 1
                 # Add to global failed list with reason
                 profile_num = int(identifier) if identifier.isdigit() else 0
                 leave_results[guild_name]["failed_profiles"][profile_num] = error_reason
-                logger.error(f"{identifier}: ❌ Failed to leave '{guild_name}': {error_reason} ({idx}/{len(to_leave_guilds)})")
+                account_logger.error("%s: ❌ Failed to leave '%s': %s (%s/%s)",
+                                     identifier, guild_name, error_reason, idx, len(to_leave_guilds))
 
         # Summary for this profile
-        logger.info(f"{identifier}: ===== LEAVE SUMMARY =====")
-        logger.info(f"{identifier}: Total to leave: {len(to_leave_guilds)}")
-        logger.info(f"{identifier}: Successful: {successful_leaves}")
-        logger.info(f"{identifier}: Failed: {failed_leaves}")
+        account_logger.info("%s: ===== LEAVE SUMMARY =====", identifier)
+        account_logger.info("%s: Total to leave: %s", identifier, len(to_leave_guilds))
+        account_logger.info("%s: Successful: %s", identifier, successful_leaves)
+        account_logger.info("%s: Failed: %s", identifier, failed_leaves)
+        if skipped_guilds:
+            account_logger.info("%s: Skipped (not a member): %s", identifier, len(skipped_guilds))
 
         # TODO --- СОХРАНЕНИЕ ИНДИВИДУАЛЬНОЙ СТАТИСТИКИ В CSV ---
         # Save individual profile statistics to CSV file
         try:
             stats_file = f"output/leave_stats_{identifier}.csv"
 
-            with open(stats_file, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.writer(f, delimiter=';')
-
-                # Header
-                writer.writerow(["#", "Guild Name", "Guild ID", "Status", "Error Reason"])
-
-                # Write data for each guild
-                for idx, guild in enumerate(to_leave_guilds, 1):
-                    guild_name = guild["name"]
-                    guild_id = guild["id"]
-
-                    # Determine status for this guild
-                    profile_num = int(identifier) if identifier.isdigit() else 0
-
-                    if guild_name in leave_results:
-                        if profile_num in leave_results[guild_name]["success_profiles"]:
-                            status = "✅ Success"
-                            error = "-"
-                        elif profile_num in leave_results[guild_name]["failed_profiles"]:
-                            status = "❌ Failed"
-                            error = leave_results[guild_name]["failed_profiles"][profile_num]
-                        else:
-                            status = "⚠️ Unknown"
-                            error = "No data"
+            # Header
+            header = ["#", "Guild Name", "Guild ID", "Status", "Error Reason"]
+            rows = []
+
+            # Rows for each guild (written by the output writer thread)
+            for idx, guild in enumerate(to_leave_guilds, 1):
+                guild_name = guild["name"]
+                guild_id = guild["id"]
+
+                # Determine status for this guild
+                profile_num = int(identifier) if identifier.isdigit() else 0
+
+                if guild_name in leave_results:
+                    if profile_num in leave_results[guild_name]["success_profiles"]:
+                        status = "✅ Success"
+                        error = "-"
+                    elif profile_num in leave_results[guild_name]["failed_profiles"]:
+                        status = "❌ Failed"
+                        error = leave_results[guild_name]["failed_profiles"][profile_num]
                     else:
                         status = "⚠️ Unknown"
                         error = "No data"
+                else:
+                    status = "⚠️ Unknown"
+                    error = "No data"
+
+                rows.append([
+                    idx,
+                    guild_name,
+                    f"'{guild_id}",  # Add apostrophe for Excel
+                    status,
+                    error
+                ])
+
+            # Guilds from the leave list this account is not in (no request sent)
+            for idx, guild in enumerate(skipped_guilds, len(to_leave_guilds) + 1):
+                rows.append([idx, guild["name"], f"'{guild['id']}", "⏭️ Skipped", "Not a member"])
 
-                    writer.writerow([
-                        idx,
-                        guild_name,
-                        f"'{guild_id}",  # Add apostrophe for Excel
-                        status,
-                        error
-                    ])
+            await output_writer.write_rows(stats_file, rows, header=header, new_file=True)
+            await output_writer.close_file(stats_file)
+            capture_profile_file(stats_file)
 
             abs_path = os.path.abspath(stats_file)
-            logger.info(f"{identifier}: 💾 Individual stats saved to {abs_path}")
+            account_logger.info("%s: 💾 Individual stats queued for %s", identifier, abs_path)
 
         except Exception as e:
-            logger.error(f"{identifier}: ❌ Failed to save individual stats: {e}")
+            account_logger.error("%s: ❌ Failed to save individual stats: %s", identifier, e)
+
+
+def start_run_journal(mode: str, resume: bool = False) -> set:
+    """
+    Open the run journal and, when resuming, restore the results of finished work.
+
+    Leave results and collected guilds of finished profiles are put back
+    into the buffers, so the final CSVs cover the whole run. Token verdicts
+    are restored by restore_finished_profile() when the profile is read
+    from the data files again.
+
+    Args:
+        mode: 'validate', 'collect' or 'leave'
+        resume: Continue the journal of an interrupted run
+
+    Returns:
+        Identifiers of profiles that are already finished
+    """
+    resumed = run_journal.open(mode, resume=resume)
+    if resume and not resumed:
+        logger.warning(f"⚠️ No journal of an interrupted '{mode}' run found, starting from scratch")
+    if not resumed:
+        return set()
+
+    done = run_journal.completed_profiles()
+    guilds_restored = 0
+    for event in run_journal.events:
+        identifier = event.get("profile")
+        if not identifier:
+            continue
+        kind = event.get("event")
+        if kind == "leave" and event.get("ok") and identifier not in done:
+            resumed_leaves.setdefault(identifier, set()).add(event.get("guild_id"))
+        if identifier not in done:
+            continue
+
+        profile_num = int(identifier) if identifier.isdigit() else 0
+        if kind == "token":
+            _resumed_verdicts[identifier] = bool(event.get("valid"))
+        elif kind == "leave":
+            results = leave_results.setdefault(event.get("guild_name"), {
+                "id": event.get("guild_id"),
+                "success_profiles": [],
+                "failed_profiles": {}
+            })
+            if event.get("ok"):
+                results["success_profiles"].append(profile_num)
+            else:
+                results["failed_profiles"][profile_num] = event.get("error")
+        elif kind == "profile" and mode == "collect":
+            guilds_file = f"output/guilds_{identifier}.csv"
+            if os.path.exists(guilds_file):
+                try:
+                    count = guilds_aggregator.add_file(guilds_file)
+                    stats["guilds_collected"] += count
+                    guilds_restored += count
+                except Exception as e:
+                    account_logger.error("%s: Failed to restore guilds from %s: %s", identifier, guilds_file, e)
+
+    logger.info(f"♻️ Resuming interrupted '{mode}' run: {len(done)} profiles already finished")
+    if guilds_restored:
+        logger.info(f"♻️ Restored {guilds_restored} guilds from finished profiles")
+    return done
+
+
+def restore_finished_profile(profile: Profile):
+    """
+    Count a profile finished before a resume and restore its token verdict.
+
+    Args:
+        profile: Profile read from the data files (the journal holds no tokens)
+    """
+    identifier = profile.identifier
+    stats["accounts_resumed"] += 1
+    is_valid = _resumed_verdicts.pop(identifier, None)
+    if is_valid is None:
+        return
+    stats["tokens_checked"] += 1
+    entry = (int(identifier) if identifier.isdigit() else 0, profile.token)
+    if is_valid:
+        stats["tokens_valid"] += 1
+        valid_tokens_buffer.append(entry)
+    else:
+        stats["tokens_invalid"] += 1
+        invalid_tokens_buffer.append(entry)
+
+
+def mark_profile_done(identifier: str):
+    """Record in the run journal that a profile is finished (and refresh the metrics files when due)"""
+    journal_event("profile", profile=identifier)
+    if metrics.export_due():
+        checkpoint_metrics()
+
+
+def _metrics_exports() -> list:
+    """(path, format) pairs selected by METRICS_FORMAT"""
+    exports = []
+    if METRICS_FORMAT in ("json", "both"):
+        exports.append((METRICS_JSON, "json"))
+    if METRICS_FORMAT in ("prometheus", "both"):
+        exports.append((METRICS_PROM, "prometheus"))
+    return exports
+
+
+def checkpoint_metrics():
+    """Queue a refresh of the metrics files on the output writer thread"""
+    metrics.mark_exported()
+    for path, fmt in _metrics_exports():
+        # Rendered here, so the writer thread never reads metrics the event loop is updating
+        output_writer.submit_nowait(MetricsRegistry.write_file, path, metrics.render(fmt))
+
+
+def export_metrics():
+    """Write the metrics files (call once at the end of the run, after the sessions are closed)"""
+    for path, fmt in _metrics_exports():
+        try:
+            MetricsRegistry.write_file(path, metrics.render(fmt))
+            logger.info(f"📈 Metrics saved to {os.path.abspath(path)}")
+        except Exception as e:
+            logger.error(f"Failed to save metrics to {path}: {e}")
+
+
+async def close_output_writer():
+    """Write all queued output (CSV rows, journal lines, database updates) and stop the writer thread"""
+    await output_writer.drain()
+    output_writer.close()
+    writer_stats = output_writer.stats
+    if writer_stats["jobs"]:
+        logger.info(f"💾 Output writer: {writer_stats['jobs']} writes in {writer_stats['batches']} batches "
+                    f"({writer_stats['backpressure_waits']} waits for a full queue, {writer_stats['errors']} errors)")
+
+
+def close_run_journal():
+    run_journal.close()
+
+
+def open_state_store():
+    """
+    Prepare the state database for the run (any mode).
+
+    An empty database is seeded from an existing guilds_all.csv first, since
+    guilds_all.csv is exported from the database and would otherwise lose
+    the guilds of runs made without it. Does nothing if STATE_DB_ENABLED is off.
+    """
+    if not STATE_DB_ENABLED:
+        return
+    try:
+        if not state_store.guild_count() and os.path.exists(GUILDS_ALL_OUTPUT):
+            imported = state_store.import_guilds_csv(GUILDS_ALL_OUTPUT)
+            logger.info(f"📥 Imported {imported} guilds from {GUILDS_ALL_OUTPUT} into {STATE_DB_FILE}")
+    except Exception as e:
+        logger.error(f"❌ Failed to import {GUILDS_ALL_OUTPUT} into the state database: {e}")
+
+
+def close_state_store():
+    """Close the state database connection"""
+    state_store.close()
+
+
+def observe_requests(callback):
+    """Call callback(status, elapsed) after every Discord API request (adaptive concurrency)"""
+    session_pool.observer = callback
+
+
+async def close_sessions():
+    """Close all pooled HTTP sessions (call once at the end of the run)"""
+    await session_pool.close()
+    logger.info(f"🔌 HTTP sessions closed "
+                f"(connections: {session_pool.stats['connections_created']} opened, "
+                f"{session_pool.stats['connections_reused']} reused)")
+
+
+# TODO --- БЛОК РАБОЧИХ ПРОЦЕССОВ (--workers) ---
+def start_worker(mode: str, leaves_done: dict):
+    """
+    Prepare a worker process of a run split with --workers.
+
+    The worker appends to the run journal opened by the parent and never writes
+    guilds_all.csv, the token/proxy caches or the metrics files - the parent
+    merges the results of all workers (see finish_worker) and writes them once.
+
+    Args:
+        mode: Journal mode of the run
+        leaves_done: Guilds already left by this worker's profiles in a resumed run
+    """
+    run_journal.attach(mode)
+    resumed_leaves.update(leaves_done)
+    guilds_aggregator.checkpoint_interval = 0
+    metrics.export_interval = 0
+
+
+async def finish_worker() -> dict:
+    """
+    Write the worker's queued output, close its connections and collect its results.
+
+    Returns:
+        Dict for merge_worker_results() in the parent process
+    """
+    await close_output_writer()
+    close_run_journal()
+    await close_sessions()
+    close_state_store()
+    return {
+        "stats": stats,
+        "leave_results": leave_results,
+        "invalid_tokens": invalid_tokens_buffer,
+        "valid_tokens": valid_tokens_buffer,
+        "proxy_probe_results": proxy_probe_results,
+        "guilds": guilds_aggregator.items(),
+        "rate_limiter": rate_limiter.stats,
+        "session_pool": session_pool.stats,
+        "metrics": metrics.dump(),
+        "token_cache": token_cache.entries if TOKEN_CACHE_ENABLED else {},
+        "proxy_cache": proxy_cache.entries if PROXY_CACHE_ENABLED else {},
+    }
+
+
+def merge_worker_results(results: dict):
+    """
+    Add the results of one worker process to this (parent) process.
+
+    Also accepts the results after a JSON round trip (remote workers):
+    profile numbers arrive as string keys and token entries as lists.
+    """
+    for counters, worker_counters in ((stats, results["stats"]),
+                                      (rate_limiter.stats, results["rate_limiter"]),
+                                      (session_pool.stats, results["session_pool"])):
+        for key, value in worker_counters.items():
+            counters[key] = counters.get(key, 0) + value
+
+    for guild_name, result in results["leave_results"].items():
+        entry = leave_results.setdefault(guild_name, {
+            "id": result["id"],
+            "success_profiles": [],
+            "failed_profiles": {}
+        })
+        entry["success_profiles"].extend(result["success_profiles"])
+        entry["failed_profiles"].update(
+            (int(profile_num), error) for profile_num, error in result["failed_profiles"].items()
+        )
+
+    invalid_tokens_buffer.extend(tuple(entry) for entry in results["invalid_tokens"])
+    valid_tokens_buffer.extend(tuple(entry) for entry in results["valid_tokens"])
+    proxy_probe_results.update(results["proxy_probe_results"])
+    guilds_aggregator.add({"id": server_id, "name": name} for server_id, name in results["guilds"].items())
+    metrics.merge(MetricsRegistry.load(results["metrics"]))
+    token_cache.merge(results["token_cache"])
+    proxy_cache.merge(results["proxy_cache"])
+
+
+# TODO --- БЛОК УДАЛЁННЫХ РАБОЧИХ (--coordinator / --worker) ---
+# Per-profile CSVs a remote worker may send (written to output/ by the coordinator);
+# the identifier must belong to the worker's lease, so guilds_all.csv is never accepted
+PROFILE_FILE_PATTERN = re.compile(r"(guilds|leave_stats)_([\w-]+)\.csv")
+
+# StateStore methods a remote worker may ask the coordinator to run
+REMOTE_STATE_UPDATES = {"record_account", "record_guilds", "prune_memberships", "record_leave"}
+
+
+def start_remote_worker(state_db: bool):
+    """
+    Prepare this process to work leases of a coordinator (--worker).
+
+    Journal lines and state database updates are kept for the lease report
+    instead of going to this machine's files, and the per-profile CSVs are
+    sent along; the coordinator writes all of it into the central output.
+
+    Args:
+        state_db: The coordinator keeps a state database (STATE_DB_ENABLED there)
+    """
+    global _lease_capture
+    _lease_capture = {"journal": [], "files": [], "state": [] if state_db else None, "started": time.time()}
+    # Only guilds of this run's leases are reported, not a local guilds_all.csv
+    guilds_aggregator.clear()
+    guilds_aggregator.checkpoint_interval = 0
+    metrics.export_interval = 0
+
+
+async def take_lease_results() -> dict:
+    """
+    Collect the results of the profiles run since the last call and reset them (--worker).
+
+    Returns:
+        JSON-serializable dict for apply_lease_results() on the coordinator
+    """
+    await output_writer.drain()  # per-profile CSVs are on disk
+    files = {}
+    for path in _lease_capture["files"]:
+        try:
+            with open(path, "r", newline="", encoding="utf-8-sig") as f:
+                files[os.path.basename(path)] = f.read()
+        except OSError as e:
+            logger.error(f"Failed to read {path} for the coordinator: {e}")
+
+    started = _lease_capture["started"]
+    results = {
+        "stats": dict(stats),
+        "leave_results": dict(leave_results),
+        "invalid_tokens": list(invalid_tokens_buffer),
+        "valid_tokens": list(valid_tokens_buffer),
+        "proxy_probe_results": dict(proxy_probe_results),
+        "guilds": guilds_aggregator.items(),
+        "rate_limiter": dict(rate_limiter.stats),
+        "session_pool": dict(session_pool.stats),
+        "metrics": metrics.dump(),
+        "token_cache": token_cache.entries_since(started) if TOKEN_CACHE_ENABLED else {},
+        "proxy_cache": proxy_cache.entries_since(started) if PROXY_CACHE_ENABLED else {},
+        "journal": _lease_capture["journal"],
+        "files": files,
+        "state": _lease_capture["state"],
+    }
+
+    # Next lease starts from zero; the coordinator adds up the reports
+    for counters in (stats, rate_limiter.stats, session_pool.stats):
+        for key in counters:
+            counters[key] = 0
+    for collection in (leave_results, invalid_tokens_buffer, valid_tokens_buffer, proxy_probe_results):
+        collection.clear()
+    guilds_aggregator.clear()
+    metrics.clear()
+    start_remote_worker(_lease_capture["state"] is not None)
+    return results
+
+
+def apply_lease_results(results: dict, identifiers: set):
+    """
+    Add the results of one lease of a remote worker to the central output (coordinator).
+
+    Counters, leave results, tokens, guilds, caches and metrics are merged
+    like those of a worker process; journal lines, per-profile CSVs and
+    state database updates are written here as if the profiles ran locally.
+
+    Args:
+        results: Lease report from take_lease_results()
+        identifiers: Profiles of the lease (only their per-profile CSVs are written)
+    """
+    merge_worker_results(results)
+
+    for event, fields in results.get("journal") or []:
+        journal_event(event, **fields)
+
+    for name, content in (results.get("files") or {}).items():
+        match = PROFILE_FILE_PATTERN.fullmatch(name)
+        if not match or match.group(2) not in identifiers:
+            logger.warning(f"⚠️ Ignored unexpected file from a worker: {name}")
+            continue
+        output_writer.submit_nowait(_write_profile_file, f"output/{name}", content)
+
+    replay_started = time.time()
+    for name, args in results.get("state") or []:
+        if name not in REMOTE_STATE_UPDATES:
+            logger.warning(f"⚠️ Ignored unexpected state database update from a worker: {name}")
+            continue
+        if name == "prune_memberships":
+            # Memberships replayed just now carry this machine's time; the worker's clock may be ahead
+            args = [args[0], min(args[1], replay_started)]
+        update_state_store(getattr(state_store, name), *args)
+
+    if guilds_aggregator.checkpoint_due():
+        checkpoint_guilds_all()
+    if metrics.export_due():
+        checkpoint_metrics()
+
+
+def _write_profile_file(path: str, content: str):
+    # Runs on the output writer thread
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        f.write(content)
 
 
 def print_final_report():
@@ -756,6 +1855,8 @@ def print_final_report():
     # Accounts summary
     logger.info(f"👥 ACCOUNTS:")
     logger.info(f"   • Total processed: {stats['accounts_processed']}")
+    if stats['accounts_resumed'] > 0:
+        logger.info(f"   • Finished before resume: {stats['accounts_resumed']}")
     logger.info(f"   • Skipped (proxy failed): {stats['accounts_skipped_proxy']}")
     logger.info(f"   • Successfully processed: {stats['accounts_processed'] - stats['accounts_skipped_proxy']}")
 
@@ -766,6 +1867,8 @@ def print_final_report():
     logger.info(f"   • Working proxies: {stats['proxy_working']} ✅")
     logger.info(f"   • Failed proxies: {stats['proxy_failed']} ❌")
     logger.info(f"   • No proxy (direct): {stats['proxy_empty']} ⚠️")
+    if stats['proxy_cache_hits'] > 0:
+        logger.info(f"   • Answered from cache: {stats['proxy_cache_hits']}")
 
     if stats['proxy_checked'] > 0:
         success_rate = (stats['proxy_working'] / stats['proxy_checked']) * 100
@@ -777,11 +1880,58 @@ def print_final_report():
     logger.info(f"   • Total checked: {stats['tokens_checked']}")
     logger.info(f"   • Valid tokens: {stats['tokens_valid']} ✅")
     logger.info(f"   • Invalid tokens: {stats['tokens_invalid']} ❌")
+    if stats['tokens_cached'] > 0:
+        logger.info(f"   • Answered from cache: {stats['tokens_cached']}")
+    if stats['tokens_check_failed'] > 0:
+        logger.info(f"   • Could not be checked (not marked invalid): {stats['tokens_check_failed']} ⚠️")
 
     if stats['tokens_checked'] > 0:
         valid_rate = (stats['tokens_valid'] / stats['tokens_checked']) * 100
         logger.info(f"   • Valid rate: {valid_rate:.1f}%")
 
+    # Connection pool summary
+    pool_stats = session_pool.stats
+    if pool_stats["connections_created"] or pool_stats["connections_reused"]:
+        logger.info(f"")
+        logger.info(f"🔌 CONNECTIONS:")
+        logger.info(f"   • Sessions: {pool_stats['sessions_created']}")
+        logger.info(f"   • New connections: {pool_stats['connections_created']}")
+        logger.info(f"   • Reused connections: {pool_stats['connections_reused']}")
+        logger.info(f"   • Reuse rate: {session_pool.reuse_rate():.1f}%")
+
+    # Rate limit summary
+    limiter_stats = rate_limiter.stats
+    if limiter_stats["waits"] or limiter_stats["rate_limited"]:
+        logger.info(f"")
+        logger.info(f"⏱️ RATE LIMITS:")
+        logger.info(f"   • Waits before requests: {limiter_stats['waits']} "
+                    f"({limiter_stats['wait_time']:.1f} sec total)")
+        logger.info(f"   • 429 responses: {limiter_stats['rate_limited']} "
+                    f"(global: {limiter_stats['global_limited']})")
+
+    # Request latency summary
+    latencies = list(metrics.series("http_request_duration_seconds"))
+    if latencies:
+        logger.info(f"")
+        logger.info(f"⏱️ LATENCY (until response headers):")
+        for labels, histogram in latencies:
+            percentiles = ", ".join(f"p{int(q * 100)} {histogram.quantile(q):.2f}s" for q in QUANTILES)
+            logger.info(f"   • {labels['route']}: {histogram.count} requests, {percentiles}")
+
+    # Retry summary
+    retries = sum(value for _, value in metrics.series("discord_retries_total"))
+    budget_refused = sum(value for _, value in metrics.series("retry_budget_exhausted_total"))
+    circuits_opened = sum(value for labels, value in metrics.series("proxy_circuit_transitions_total")
+                          if labels["state"] == CircuitBreaker.OPEN)
+    if retries or budget_refused or circuits_opened:
+        logger.info(f"")
+        logger.info(f"🔁 RETRIES:")
+        logger.info(f"   • Retried Discord requests: {retries}")
+        if budget_refused:
+            logger.info(f"   • Retries refused (retry budget used up): {budget_refused}")
+        if circuits_opened:
+            logger.info(f"   • Proxies paused after repeated failures: {circuits_opened}")
+
     # Guilds summary (only show in collect mode, not in leave mode)
     if stats['guilds_collected'] > 0:
         logger.info(f"")
@@ -791,6 +1941,11 @@ def print_final_report():
             avg_guilds = stats['guilds_collected'] / stats['tokens_valid']
             logger.info(f"   • Average per account: {avg_guilds:.1f}")
 
+    if stats['leaves_skipped_not_member'] > 0:
+        logger.info(f"")
+        logger.info(f"🧭 LEAVE PLANNING:")
+        logger.info(f"   • Requests skipped (account not a member): {stats['leaves_skipped_not_member']}")
+
     # Leave operations summary (show if we performed any leave operations)
     if leave_results:
         print_leave_report()
@@ -6,17 +6,57 @@ All data files should be placed in the 'data' folder
 import os
 import sys
 import asyncio
+import argparse
+import multiprocessing
 import random
+from itertools import chain
 from dotenv import load_dotenv
-from utils.logger import setup_logger
-from utils.browser import load_data
+from utils.logger import setup_logger, get_account_logger, stop_logging
+from utils.browser import iter_lines, iter_records
+from utils.dispatcher import ProfileDispatcher
+from utils.concurrency import AIMDController
+from utils.profile import Profile, ProfileSelector, shard_by_proxy
+from utils.fast_path import install_event_loop, fast_path_status
+from utils.coordinator import (
+    CoordinatorClient,
+    CoordinatorError,
+    CoordinatorServer,
+    LeaseQueue,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    is_loopback,
+    parse_address,
+)
 from discord_api_handler import (
     handle_guilds,
+    load_leave_plan,
     validate_token_and_log_invalid,
     flush_invalid_tokens,
     flush_valid_tokens,
     print_final_report,
-    stats
+    close_sessions,
+    flush_proxy_cache,
+    flush_guilds_all,
+    flush_token_cache,
+    start_run_journal,
+    restore_finished_profile,
+    mark_profile_done,
+    close_run_journal,
+    close_output_writer,
+    open_state_store,
+    close_state_store,
+    export_metrics,
+    start_worker,
+    finish_worker,
+    merge_worker_results,
+    start_remote_worker,
+    take_lease_results,
+    apply_lease_results,
+    observe_requests,
+    metrics,
+    resumed_leaves,
+    stats,
+    STATE_DB_ENABLED
 )
 
 # Load environment variables
@@ -24,6 +64,7 @@ load_dotenv()
 
 # --- Logging setup ---
 logger = setup_logger()
+account_logger = get_account_logger()
 
 # --- Prevent system sleep (macOS only) ---
 if sys.platform == "darwin":  # macOS
@@ -35,38 +76,42 @@ else:
 
 # --- Configuration from .env ---
 START_LINE = int(os.getenv('START_LINE', 1))
-END_LINE = int(os.getenv('END_LINE', 9999))
+# Last line to process, 0 = up to the end of the files
+END_LINE = int(os.getenv('END_LINE', 0)) or None
 RANDOM_START = os.getenv('RANDOM_START', 'False').lower() == 'true'
 THREAD_COUNT = int(os.getenv('THREAD_COUNT', 3))
 ACCOUNT_DELAY = (
     int(os.getenv('ACCOUNT_DELAY_MIN', 1)),
     int(os.getenv('ACCOUNT_DELAY_MAX', 5))
 )
-
-# Parse profile filters
-allow_profiles = os.getenv('ALLOW_PROFILE_NUMBERS', '').strip()
-ALLOW_PROFILE_NUMBERS = []
-if allow_profiles:
-    for x in allow_profiles.split(','):
-        x = x.strip()
-        # Skip empty strings and comments
-        if x and not x.startswith('#'):
-            try:
-                ALLOW_PROFILE_NUMBERS.append(int(x))
-            except ValueError:
-                logger.warning(f"Invalid profile number in ALLOW_PROFILE_NUMBERS: {x}")
-
-skip_profiles = os.getenv('SKIP_PROFILE_NUMBERS', '').strip()
-SKIP_PROFILE_NUMBERS = []
-if skip_profiles:
-    for x in skip_profiles.split(','):
-        x = x.strip()
-        # Skip empty strings and comments
-        if x and not x.startswith('#'):
-            try:
-                SKIP_PROFILE_NUMBERS.append(int(x))
-            except ValueError:
-                logger.warning(f"Invalid profile number in SKIP_PROFILE_NUMBERS: {x}")
+# Optional cap on account starts per second across all threads (0 = no cap)
+ACCOUNT_START_RATE = float(os.getenv('ACCOUNT_START_RATE', 0))
+ACCOUNT_START_BURST = int(os.getenv('ACCOUNT_START_BURST', 1))
+# Adaptive concurrency: start with THREAD_COUNT profiles at once and adjust between
+# CONCURRENCY_MIN and CONCURRENCY_MAX from latency, 429 and error rates (AIMD)
+ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', 'False').lower() == 'true'
+CONCURRENCY_MIN = int(os.getenv('CONCURRENCY_MIN', 1))
+CONCURRENCY_MAX = int(os.getenv('CONCURRENCY_MAX', 20))
+CONCURRENCY_INTERVAL = float(os.getenv('CONCURRENCY_INTERVAL', 10))
+CONCURRENCY_LATENCY_TARGET = float(os.getenv('CONCURRENCY_LATENCY_TARGET', 2.0))
+CONCURRENCY_MAX_429_RATE = float(os.getenv('CONCURRENCY_MAX_429_RATE', 0.02))
+CONCURRENCY_MAX_ERROR_RATE = float(os.getenv('CONCURRENCY_MAX_ERROR_RATE', 0.05))
+# Seconds between queue progress lines in the log (0 = off)
+PROGRESS_REPORT_INTERVAL = float(os.getenv('PROGRESS_REPORT_INTERVAL', 30))
+# uvloop event loop and orjson decoding, if installed
+FAST_MODE = os.getenv('FAST_MODE', 'False').lower() == 'true'
+# Runs over several machines (--coordinator / --worker): profiles per lease, seconds a lease
+# lives without a heartbeat, shared secret the workers must send
+COORDINATOR_LEASE_SIZE = int(os.getenv('COORDINATOR_LEASE_SIZE', 20))
+COORDINATOR_LEASE_TTL = float(os.getenv('COORDINATOR_LEASE_TTL', 120))
+COORDINATOR_SECRET = os.getenv('COORDINATOR_SECRET', '').strip()
+
+# Parse profile filters: numbers and ranges ("1-500"), "!" excludes ("!17", "!200-210")
+PROFILE_SELECTOR = ProfileSelector.parse(
+    os.getenv('ALLOW_PROFILE_NUMBERS', ''),
+    os.getenv('SKIP_PROFILE_NUMBERS', ''),
+    on_error=lambda entry: logger.warning(f"Invalid profile number or range in profile filters: {entry}")
+)
 
 # --- File paths (all in data folder) ---
 DATA_DIR = "data"
@@ -86,61 +131,107 @@ DATA_FILE_PATHS = {
 
 REQUIRED_DATA_FILES = ["account_indexes", "ds_tokens", "user_agents", "proxies"]
 
+# Line offsets of the data files, so START_LINE is reached without reading the lines before it
+LINE_INDEX_CACHE = os.path.join(OUTPUT_DIR, "line_index.json")
+
+# Worker processes (--workers) import this module again; they only log their own work
+IS_WORKER_PROCESS = multiprocessing.current_process().name != "MainProcess"
+
 # --- Global variables ---
 RUN_VALIDATE_TOKENS = False
 RUN_SERVER_HANDLER = False
 MODE = "collect"
-
-profiles = {}
-profile_semaphore = asyncio.Semaphore(THREAD_COUNT)
-
-logger.info(f"Configuration loaded:")
-logger.info(f"  - Processing lines: {START_LINE} to {END_LINE}")
-logger.info(f"  - Thread count: {THREAD_COUNT}")
-logger.info(f"  - Random start: {RANDOM_START}")
-logger.info(f"  - Account delay: {ACCOUNT_DELAY[0]}-{ACCOUNT_DELAY[1]} seconds")
+LEAVE_PLAN = None  # resolved once per run, shared read-only by all profiles
+CONCURRENCY_CONTROLLER = None  # created by the first dispatcher when ADAPTIVE_CONCURRENCY is on
+
+if not IS_WORKER_PROCESS:
+    logger.info(f"Configuration loaded:")
+    logger.info(f"  - Processing lines: {START_LINE} to {END_LINE or 'end of file'}")
+    logger.info(f"  - Thread count: {THREAD_COUNT}")
+    if ADAPTIVE_CONCURRENCY:
+        logger.info(f"  - Adaptive concurrency: {CONCURRENCY_MIN}-{CONCURRENCY_MAX} profiles at once "
+                    f"(p95 target {CONCURRENCY_LATENCY_TARGET}s, max 429 rate {CONCURRENCY_MAX_429_RATE:.0%}, "
+                    f"max error rate {CONCURRENCY_MAX_ERROR_RATE:.0%})")
+    logger.info(f"  - Random start: {RANDOM_START}")
+    logger.info(f"  - Account delay: {ACCOUNT_DELAY[0]}-{ACCOUNT_DELAY[1]} seconds (per thread)")
+    logger.info(f"  - Fast mode: {', '.join(fast_path_status(FAST_MODE))}")
 
 
 # --- Process guilds for single profile ---
 async def run_profile(profile):
     """Process guild operations for a single profile"""
-    async with profile_semaphore:
-        identifier = profile["identifier"]
-        logger.info(f"Profile {identifier}: Starting guild processing")
-        try:
-            await handle_guilds(profile, mode=MODE, leave_list_path=DATA_FILE_PATHS["leave_list"])
-        except Exception as e:
-            logger.error(f"Profile {identifier}: Error during execution: {e}")
+    identifier = profile.identifier
+    account_logger.info("Profile %s: Starting guild processing", identifier)
+    try:
+        await handle_guilds(profile, mode=MODE, leave_list_path=DATA_FILE_PATHS["leave_list"],
+                            leave_plan=LEAVE_PLAN)
+        mark_profile_done(identifier)
+    except Exception as e:
+        account_logger.error("Profile %s: Error during execution: %s", identifier, e)
 
 
 # --- Validate token ---
 async def run_validate_token(profile):
     """Validate Discord token for a single profile"""
-    async with profile_semaphore:
-        identifier = profile["identifier"]
-        logger.info(f"Profile {identifier}: Starting token validation")
-        try:
-            # Import validation function
-            from discord_api_handler import validate_proxy
-
-            # Increment processed counter
-            stats["accounts_processed"] += 1
-
-            # Validate proxy first
-            proxy_valid = await validate_proxy(profile["proxies"], identifier)
-            if not proxy_valid:
-                logger.error(f"Profile {identifier}: ❌ Proxy validation failed, skipping token check")
-                return
+    identifier = profile.identifier
+    account_logger.info("Profile %s: Starting token validation", identifier)
+    try:
+        # Import validation function
+        from discord_api_handler import validate_proxy
+
+        # Increment processed counter
+        stats["accounts_processed"] += 1
+
+        # Validate proxy first
+        proxy_valid = await validate_proxy(profile.proxy, identifier)
+        if not proxy_valid:
+            account_logger.error("Profile %s: ❌ Proxy validation failed, skipping token check", identifier)
+            mark_profile_done(identifier)
+            return
 
-            # Validate token
-            await validate_token_and_log_invalid(
-                token=profile["ds_tokens"],
-                proxy=profile["proxies"],
-                user_agent=profile["user_agent"],
-                identifier=identifier
-            )
-        except Exception as e:
-            logger.error(f"Profile {identifier}: Token validation error: {e}")
+        # Validate token
+        await validate_token_and_log_invalid(
+            token=profile.token,
+            proxy=profile.proxy,
+            user_agent=profile.user_agent,
+            identifier=identifier
+        )
+        mark_profile_done(identifier)
+    except Exception as e:
+        account_logger.error("Profile %s: Token validation error: %s", identifier, e)
+
+
+# --- Stream profiles from data files ---
+def iter_profiles():
+    """
+    Read profiles line by line from the data files, applying the profile filters.
+
+    Profiles are produced lazily, so memory use does not grow with the number of lines.
+    """
+    records = iter_records(
+        {key: DATA_FILE_PATHS[key] for key in REQUIRED_DATA_FILES},
+        primary="account_indexes",
+        start_line=START_LINE,
+        end_line=END_LINE,
+        index_cache=LINE_INDEX_CACHE
+    )
+    last_number = PROFILE_SELECTOR.max_number
+    for pid, record in records:
+        number = int(pid)
+        if last_number is not None and number > last_number:
+            break  # nothing selected beyond this line
+        if number not in PROFILE_SELECTOR:
+            continue
+        yield Profile(pid, record["ds_tokens"], record["user_agents"], record["proxies"])
+
+
+def skip_finished(profiles, finished: set):
+    """Yield profiles not finished before a resume, restoring results of the finished ones"""
+    for profile in profiles:
+        if profile.identifier in finished:
+            restore_finished_profile(profile)
+        else:
+            yield profile
 
 
 # --- Check if all required files exist ---
@@ -201,9 +292,284 @@ def check_required_files():
     return True
 
 
+# --- Command line arguments ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Discord Guild Manager")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run, skipping profiles already finished")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="split the profiles over N processes (profiles sharing a proxy stay together)")
+    parser.add_argument("--coordinator", nargs="?", const=f"{DEFAULT_HOST}:{DEFAULT_PORT}", metavar="HOST:PORT",
+                        help="hand the profiles out to --worker instances over HTTP "
+                             f"(default address {DEFAULT_HOST}:{DEFAULT_PORT})")
+    parser.add_argument("--worker", metavar="URL",
+                        help="run profiles leased from the coordinator at URL (no data files needed)")
+    parser.add_argument("--insecure-coordinator", action="store_true",
+                        help="allow --coordinator on a network address without COORDINATOR_SECRET")
+    args = parser.parse_args()
+    if args.workers > 1 and (args.coordinator or args.worker):
+        parser.error("--workers cannot be combined with --coordinator or --worker "
+                     "(start several --worker instances instead)")
+    if args.coordinator and args.worker:
+        parser.error("--coordinator and --worker are separate processes")
+    if args.coordinator:
+        try:
+            host, _ = parse_address(args.coordinator)
+        except ValueError:
+            parser.error(f"invalid --coordinator address: {args.coordinator}")
+        # Leases carry plaintext tokens - anyone reaching the port could take them
+        if not COORDINATOR_SECRET and not is_loopback(host) and not args.insecure_coordinator:
+            parser.error(f"--coordinator on {host} would give Discord tokens to anyone who can reach it: "
+                         "set COORDINATOR_SECRET in .env (or pass --insecure-coordinator)")
+    return args
+
+
+# --- Profile queue ---
+def get_concurrency_controller():
+    """
+    AIMD controller shared by all dispatchers of this process, or None if
+    ADAPTIVE_CONCURRENCY is off. Kept across the leases of a remote worker,
+    so the limit it found is not lost between batches.
+    """
+    global CONCURRENCY_CONTROLLER
+    if ADAPTIVE_CONCURRENCY and CONCURRENCY_CONTROLLER is None:
+        CONCURRENCY_CONTROLLER = AIMDController(
+            initial=THREAD_COUNT,
+            floor=CONCURRENCY_MIN,
+            ceiling=CONCURRENCY_MAX,
+            interval=CONCURRENCY_INTERVAL,
+            latency_target=CONCURRENCY_LATENCY_TARGET,
+            max_throttle_rate=CONCURRENCY_MAX_429_RATE,
+            max_error_rate=CONCURRENCY_MAX_ERROR_RATE,
+            metrics=metrics,
+            logger=logger
+        )
+        observe_requests(CONCURRENCY_CONTROLLER.observe)
+    return CONCURRENCY_CONTROLLER
+
+
+def build_dispatcher(worker_processes: int = 1) -> ProfileDispatcher:
+    """
+    Profiles are pulled from a queue by THREAD_COUNT slots (or a number adjusted
+    by the adaptive concurrency controller); every slot keeps its own
+    ACCOUNT_DELAY spacing between the profiles it starts.
+
+    Args:
+        worker_processes: Number of processes sharing ACCOUNT_START_RATE
+    """
+    return ProfileDispatcher(
+        worker_count=THREAD_COUNT,
+        start_delay=ACCOUNT_DELAY,
+        start_rate=ACCOUNT_START_RATE / worker_processes,
+        start_burst=ACCOUNT_START_BURST,
+        report_interval=PROGRESS_REPORT_INTERVAL,
+        logger=logger,
+        concurrency=get_concurrency_controller()
+    )
+
+
+# --- Worker processes (--workers) ---
+async def run_shard(shard: list, settings: dict) -> dict:
+    """Process one shard of profiles inside a worker process"""
+    global RUN_VALIDATE_TOKENS, MODE, LEAVE_PLAN
+    RUN_VALIDATE_TOKENS = settings["validate"]
+    MODE = settings["mode"]
+    LEAVE_PLAN = settings["leave_plan"]
+
+    start_worker(settings["journal_mode"], settings["resumed_leaves"])
+    dispatcher = build_dispatcher(settings["worker_processes"])
+    try:
+        await dispatcher.run(shard, run_validate_token if RUN_VALIDATE_TOKENS else run_profile)
+    finally:
+        results = await finish_worker()
+    return results
+
+
+def worker_process(conn, shard: list, settings: dict):
+    """Entry point of a worker process: run the shard and send the results to the parent"""
+    try:
+        install_event_loop(FAST_MODE)
+        conn.send(asyncio.run(run_shard(shard, settings)))
+    finally:
+        conn.close()
+        # Worker processes end without atexit handlers; write queued log records now
+        stop_logging()
+
+
+async def run_workers(profiles: list, worker_count: int, settings: dict):
+    """
+    Split the profiles over worker processes and merge their results into this process.
+
+    Every worker has its own event loop, HTTP sessions and rate limiter. Results
+    (statistics, leave results, tokens, guilds, caches, metrics) are merged here,
+    so the output files and the final report are the same as for a single process.
+    """
+    shards = shard_by_proxy(profiles, worker_count)
+    if not shards:
+        return
+    logger.info(f"🧩 Starting {len(shards)} worker processes for {len(profiles)} profiles "
+                f"({', '.join(str(len(shard)) for shard in shards)} profiles each, grouped by proxy)")
+
+    context = multiprocessing.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    workers = []
+    for number, shard in enumerate(shards, 1):
+        receiver, sender = context.Pipe(duplex=False)
+        shard_settings = dict(settings, resumed_leaves={
+            profile.identifier: resumed_leaves[profile.identifier]
+            for profile in shard if profile.identifier in resumed_leaves
+        })
+        process = context.Process(target=worker_process, args=(sender, shard, shard_settings),
+                                  name=f"worker-{number}")
+        process.start()
+        sender.close()
+        workers.append((number, process, receiver))
+
+    async def collect(number, process, receiver):
+        try:
+            results = await loop.run_in_executor(None, receiver.recv)
+        except EOFError:
+            logger.error(f"❌ Worker {number} stopped without results (exit code {process.exitcode}); "
+                         f"its unfinished profiles can be continued with --resume")
+            return
+        finally:
+            await loop.run_in_executor(None, process.join)
+        merge_worker_results(results)
+        logger.info(f"🧩 Worker {number} finished")
+
+    await asyncio.gather(*(collect(*worker) for worker in workers))
+
+
+# --- Runs over several machines (--coordinator / --worker) ---
+async def run_coordinator(profiles: list, address: str, settings: dict):
+    """
+    Hand the profiles out to remote workers in leases and merge their results here.
+
+    A worker that stops sending heartbeats loses its lease after
+    COORDINATOR_LEASE_TTL seconds and its profiles go to the next worker.
+    Results of every finished lease are written to this machine's output
+    files right away, so the journal allows --resume after a crash.
+    """
+    host, port = parse_address(address)
+    queue = LeaseQueue(profiles, key=lambda profile: profile.identifier,
+                       lease_ttl=COORDINATOR_LEASE_TTL, batch_size=COORDINATOR_LEASE_SIZE)
+    if not queue.total:
+        return
+
+    def lease_payload(lease) -> dict:
+        return {
+            "profiles": [[p.identifier, p.token, p.user_agent, p.proxy] for p in lease.items],
+            "resumed_leaves": {
+                p.identifier: sorted(resumed_leaves[p.identifier]) for p in lease.items if p.identifier in resumed_leaves
+            },
+        }
+
+    def on_complete(lease, results: dict):
+        apply_lease_results(results, {profile.identifier for profile in lease.items})
+        logger.info(f"📥 Worker {lease.worker} finished {len(lease.items)} profiles "
+                    f"({queue.completed}/{queue.total} done)")
+
+    server = CoordinatorServer(queue, settings, lease_payload, on_complete, secret=COORDINATOR_SECRET, logger=logger)
+    await server.start(host, port)
+    logger.info(f"🛰️ Coordinator listening on http://{host}:{port}: {queue.total} profiles "
+                f"in leases of {queue.batch_size}")
+    logger.info(f"🛰️ Start workers with: python main.py --worker http://{host}:{port}")
+    if not is_loopback(host):
+        logger.warning("⚠️ Tokens are sent to the workers unencrypted - use a trusted network or an SSH tunnel")
+        if not COORDINATOR_SECRET:
+            logger.warning("⚠️ No COORDINATOR_SECRET (--insecure-coordinator): any client can take leases")
+
+    try:
+        while not queue.done:
+            await asyncio.sleep(1)
+            server.expire()
+        # Workers waiting for the last leases ask again within the poll interval - tell them the run is over
+        await asyncio.sleep(server.poll_interval + 1)
+    finally:
+        await server.stop()
+    logger.info(f"🛰️ Coordinator finished: {queue.stats['leased']} leases to {len(server.workers)} workers, "
+                f"{queue.stats['expired']} expired, {queue.stats['rejected']} results discarded")
+
+
+async def keep_lease(client: CoordinatorClient, lease_id: str, ttl: float):
+    """Renew a lease three times per TTL while its profiles run"""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            if not await client.heartbeat(lease_id):
+                logger.warning("⚠️ Lease was given up by the coordinator, the results will likely be discarded")
+                return
+        except CoordinatorError as e:
+            logger.warning(f"⚠️ Heartbeat failed: {e}")
+
+
+async def run_remote_worker(url: str):
+    """
+    Run profiles leased from a coordinator until it has none left (--worker).
+
+    The run settings (mode, leave plan) come from the coordinator; THREAD_COUNT,
+    delays and connection settings from this machine's .env.
+    """
+    global RUN_VALIDATE_TOKENS, MODE, LEAVE_PLAN
+
+    client = CoordinatorClient(url, secret=COORDINATOR_SECRET)
+    leases = profiles_done = 0
+    try:
+        config = await client.get_config()
+        RUN_VALIDATE_TOKENS = config["validate"]
+        MODE = config["mode"]
+        LEAVE_PLAN = config["leave_plan"]
+        start_remote_worker(config["state_db"])
+        handler = run_validate_token if RUN_VALIDATE_TOKENS else run_profile
+        logger.info(f"🛰️ Worker {client.worker_name} connected to {client.url} ({config['journal_mode']} run)")
+
+        while True:
+            lease = await client.lease()
+            if lease.get("done"):
+                break
+            if "lease_id" not in lease:
+                # All profiles are leased; wait in case a lease expires
+                await asyncio.sleep(lease.get("wait", 2))
+                continue
+
+            profiles = [Profile(*fields) for fields in lease["profiles"]]
+            resumed_leaves.clear()
+            resumed_leaves.update({identifier: set(guild_ids)
+                                   for identifier, guild_ids in lease["resumed_leaves"].items()})
+            heartbeat = asyncio.ensure_future(keep_lease(client, lease["lease_id"], lease["ttl"]))
+            try:
+                await build_dispatcher().run(profiles, handler)
+            finally:
+                heartbeat.cancel()
+
+            if await client.complete(lease["lease_id"], await take_lease_results()):
+                leases += 1
+                profiles_done += len(profiles)
+            else:
+                logger.warning(f"⚠️ Coordinator discarded the results of {len(profiles)} profiles "
+                               f"(the lease expired and went to another worker)")
+    except CoordinatorError as e:
+        logger.error(f"❌ Coordinator {client.url}: {e}")
+    finally:
+        await client.close()
+        await close_output_writer()
+        await close_sessions()
+        close_state_store()
+
+    logger.info(f"🛰️ Worker finished: {profiles_done} profiles in {leases} leases")
+    stop_logging()
+
+
 # --- Main function ---
 async def main():
-    global RUN_VALIDATE_TOKENS, RUN_SERVER_HANDLER, MODE
+    global RUN_VALIDATE_TOKENS, RUN_SERVER_HANDLER, MODE, LEAVE_PLAN
+
+    args = parse_args()
+
+    if args.worker:
+        # Profiles and run settings come from the coordinator
+        await run_remote_worker(args.worker)
+        return
 
     # Check if all required files exist
     if not check_required_files():
@@ -240,58 +606,37 @@ async def main():
 
     print("=" * 60 + "\n")
 
-    # Load data into dictionaries
-    data = {}
+    # Every data file needs at least one line in the selected range
     for key in REQUIRED_DATA_FILES:
-        # Load data from file
-        lines = await load_data(DATA_FILE_PATHS[key], START_LINE, END_LINE)
-        if not lines:
+        if next(iter_lines(DATA_FILE_PATHS[key], START_LINE, END_LINE), None) is None:
             logger.error(f"Required file {key} is empty or not found: {DATA_FILE_PATHS[key]}")
             return
-        # Convert list to dictionary: key - line number (starting from START_LINE), value - line from file
-        data[key] = {str(i + START_LINE): line for i, line in enumerate(lines)}
-        logger.info(f"Loaded {len(data[key])} lines from {key} ({DATA_FILE_PATHS[key]}).")
-
-    # Get profile identifiers from account_indexes
-    profile_identifiers = list(data["account_indexes"].keys())
-
-    # Apply filters
-    if ALLOW_PROFILE_NUMBERS:
-        profile_identifiers = [pid for pid in profile_identifiers if int(pid) in ALLOW_PROFILE_NUMBERS]
-    if SKIP_PROFILE_NUMBERS:
-        profile_identifiers = [pid for pid in profile_identifiers if int(pid) not in SKIP_PROFILE_NUMBERS]
 
-    # Shuffle if needed
+    # Profiles are streamed from the data files; a random order needs them all in memory
+    profiles = iter_profiles()
     if RANDOM_START:
-        random.shuffle(profile_identifiers)
-
-    # Build profiles dictionary
-    for pid in profile_identifiers:
-        profiles[pid] = {
-            "identifier": pid,
-            "ds_tokens": data["ds_tokens"].get(pid, ""),
-            "user_agent": data["user_agents"].get(pid, ""),
-            "proxies": data["proxies"].get(pid, ""),
-        }
+        profiles = list(profiles)
+        random.shuffle(profiles)
 
-    if not profiles:
+    first_profile = next(iter(profiles), None)
+    if first_profile is None:
         logger.error("No suitable profiles to run.")
         return
+    if RANDOM_START:
+        logger.info(f"Ready to process {len(profiles)} profiles")
+    else:
+        profiles = chain([first_profile], profiles)
+        logger.info(f"Ready to process profiles from line {START_LINE} to {END_LINE or 'end of file'}")
 
-    logger.info(f"Ready to process {len(profiles)} profiles")
+    # Seed the state database before anything reads or exports it
+    open_state_store()
 
-    tasks = []
+    handler = None
 
     # --- Token validation ---
     if RUN_VALIDATE_TOKENS:
         logger.info("Starting token validation...")
-        for idx, pid in enumerate(profiles):
-            task = asyncio.create_task(run_validate_token(profiles[pid]))
-            tasks.append(task)
-            if idx < len(profiles) - 1:
-                delay = random.randint(*ACCOUNT_DELAY)
-                logger.info(f"Waiting {delay} seconds before next account...")
-                await asyncio.sleep(delay)
+        handler = run_validate_token
 
     # --- Guild processing ---
     if RUN_SERVER_HANDLER:
@@ -305,17 +650,51 @@ async def main():
             logger.info("Please add guilds to leave and run again!")
             return
 
-        logger.info(f"Starting guild {MODE} mode...")
-        for idx, pid in enumerate(profiles):
-            task = asyncio.create_task(run_profile(profiles[pid]))
-            tasks.append(task)
-            if idx < len(profiles) - 1:
-                delay = random.randint(*ACCOUNT_DELAY)
-                logger.info(f"Waiting {delay} seconds before next account...")
-                await asyncio.sleep(delay)
+        if MODE == "leave":
+            # Parse the leave list and guild database once for all profiles
+            LEAVE_PLAN = load_leave_plan(DATA_FILE_PATHS["leave_list"])
+            if not LEAVE_PLAN:
+                return
 
-    # Wait for all tasks to complete
-    await asyncio.gather(*tasks)
+        logger.info(f"Starting guild {MODE} mode...")
+        handler = run_profile
+
+    # Finished work is journaled so an interrupted run can continue with --resume
+    journal_mode = "validate" if RUN_VALIDATE_TOKENS else MODE
+    finished = start_run_journal(journal_mode, resume=args.resume)
+    pending = skip_finished(profiles, finished) if finished else profiles
+
+    # Run all profiles, then release pooled connections
+    try:
+        if args.coordinator:
+            settings = {
+                "validate": RUN_VALIDATE_TOKENS,
+                "mode": MODE,
+                "leave_plan": LEAVE_PLAN,
+                "journal_mode": journal_mode,
+                "state_db": STATE_DB_ENABLED,
+            }
+            await run_coordinator(list(pending), args.coordinator, settings)
+        elif args.workers > 1:
+            settings = {
+                "validate": RUN_VALIDATE_TOKENS,
+                "mode": MODE,
+                "leave_plan": LEAVE_PLAN,
+                "journal_mode": journal_mode,
+                "worker_processes": args.workers,
+            }
+            await run_workers(list(pending), args.workers, settings)
+        else:
+            await build_dispatcher().run(pending, handler)
+    finally:
+        await close_output_writer()
+        close_run_journal()
+        flush_guilds_all()
+        await close_sessions()
+        export_metrics()
+        flush_proxy_cache()
+        flush_token_cache()
+        close_state_store()
 
     # Save results
     if RUN_VALIDATE_TOKENS:
@@ -333,7 +712,9 @@ async def main():
     logger.info("")
     logger.info("📁 Check the 'output' folder for results")
     logger.info("📝 Check the 'logs' folder for detailed logs")
+    stop_logging()
 
 
 if __name__ == "__main__":
+    install_event_loop(FAST_MODE)
     asyncio.run(main())
@@ -2,12 +2,61 @@
 Utils package for Discord Guild Manager
 """
 
-from .logger import setup_logger
-from .browser import load_data, load_data_sync, ensure_file_exists
+from .logger import setup_logger, get_account_logger, stop_logging
+from .browser import load_data, load_data_sync, ensure_file_exists, iter_lines, iter_records, build_line_index
+from .http_pool import SessionPool
+from .proxy_cache import ProxyHealthCache
+from .rate_limiter import RateLimiter
+from .dispatcher import ProfileDispatcher, TokenBucket
+from .guild_aggregator import GuildAggregator
+from .guild_index import GuildNameIndex, normalize_name
+from .token_cache import TokenStatusCache
+from .run_journal import RunJournal
+from .state_store import StateStore
+from .profile import Profile, ProfileSelector
+from .output_writer import OutputWriter, write_csv_atomic
+from .metrics import MetricsRegistry, Histogram
+from .fast_path import get_json_loads, install_event_loop, fast_path_status
+from .coordinator import LeaseQueue, CoordinatorServer, CoordinatorClient, CoordinatorError
+from .concurrency import AIMDController
+from .retry import RetryPolicy, RetryBudget, CircuitBreaker
 
 __all__ = [
     'setup_logger',
+    'get_account_logger',
+    'stop_logging',
     'load_data',
     'load_data_sync',
-    'ensure_file_exists'
+    'ensure_file_exists',
+    'iter_lines',
+    'iter_records',
+    'build_line_index',
+    'SessionPool',
+    'ProxyHealthCache',
+    'RateLimiter',
+    'ProfileDispatcher',
+    'TokenBucket',
+    'GuildAggregator',
+    'GuildNameIndex',
+    'normalize_name',
+    'TokenStatusCache',
+    'RunJournal',
+    'StateStore',
+    'Profile',
+    'ProfileSelector',
+    'OutputWriter',
+    'write_csv_atomic',
+    'MetricsRegistry',
+    'Histogram',
+    'get_json_loads',
+    'install_event_loop',
+    'fast_path_status',
+    'LeaseQueue',
+    'CoordinatorServer',
+    'CoordinatorClient',
+    'CoordinatorError',
+    'AIMDController',
+    'RetryPolicy',
+    'RetryBudget',
+    'CircuitBreaker'
 ]
\ No newline at end of file
@@ -3,77 +3,183 @@ Utility module for loading data from files
 """
 
 import os
-import asyncio
-from typing import List, Optional
+import json
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 
+# A byte offset is remembered for every LINE_INDEX_STEP-th line
+LINE_INDEX_STEP = 1000
 
-async def load_data(filepath: str, start_line: int = 1, end_line: int = 9999) -> List[str]:
+# In-memory line indexes: {abs_path: (size, mtime, offsets)}
+_line_indexes: Dict[str, Tuple[int, float, List[int]]] = {}
+
+
+def build_line_index(filepath: str, cache_path: str = None, step: int = LINE_INDEX_STEP) -> List[int]:
     """
-    Load lines from a text file within specified range.
+    Get byte offsets of lines 1, 1 + step, 1 + 2 * step, ... of a file.
+
+    The index is built with one pass over the file and reused while the file
+    size and modification time stay the same (in memory and, if cache_path is
+    given, in a JSON file between runs).
 
     Args:
         filepath: Path to the text file
-        start_line: First line number to read (1-indexed)
-        end_line: Last line number to read (inclusive)
+        cache_path: JSON file used to keep indexes between runs (optional)
+        step: Distance in lines between indexed offsets
 
     Returns:
-        List of strings (lines) from the file, excluding comments and empty lines
+        List of byte offsets, offsets[k] is the start of line k * step + 1
     """
-    if not os.path.exists(filepath):
-        return []
+    path = os.path.abspath(filepath)
+    st = os.stat(path)
+    cached = _line_indexes.get(path)
+    if cached and cached[:2] == (st.st_size, st.st_mtime):
+        return cached[2]
+
+    disk_cache = {}
+    if cache_path:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                disk_cache = json.load(f)
+            entry = disk_cache.get(path)
+            if entry and (entry["size"], entry["mtime"], entry["step"]) == (st.st_size, st.st_mtime, step):
+                _line_indexes[path] = (st.st_size, st.st_mtime, entry["offsets"])
+                return entry["offsets"]
+        except (OSError, ValueError, KeyError, TypeError):
+            disk_cache = {}
+
+    offsets = [0]
+    line_number = 0
+    position = 0
+    with open(path, "rb") as f:
+        for line in f:
+            line_number += 1
+            position += len(line)
+            if line_number % step == 0:
+                offsets.append(position)
+    if offsets[-1] >= st.st_size and len(offsets) > 1:
+        offsets.pop()  # file ends exactly at an indexed line
+
+    _line_indexes[path] = (st.st_size, st.st_mtime, offsets)
+    if cache_path:
+        disk_cache[path] = {"size": st.st_size, "mtime": st.st_mtime, "step": step, "offsets": offsets}
+        try:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(disk_cache, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return offsets
+
+
+def iter_lines(filepath: str, start_line: int = 1, end_line: Optional[int] = None,
+               index_cache: str = None) -> Iterator[str]:
+    """
+    Stream lines of a text file within the specified range.
 
-    lines = []
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
+    Seeks close to start_line using the line index instead of reading the
+    lines before it. Lines are read one by one, so memory use does not
+    depend on the file size.
+
+    Args:
+        filepath: Path to the text file
+        start_line: First line number to read (1-indexed)
+        end_line: Last line number to read (inclusive), None for the end of the file
+        index_cache: JSON file for line indexes between runs (optional)
 
-        # Process lines in the specified range
-        for i in range(start_line - 1, min(end_line, len(all_lines))):
-            line = all_lines[i].strip()
+    Yields:
+        Stripped lines, excluding comments and empty lines
+    """
+    if not os.path.exists(filepath):
+        return
+    start_line = max(1, start_line)
+    if end_line is not None and end_line < start_line:
+        return
+
+    offsets = build_line_index(filepath, index_cache) if start_line > LINE_INDEX_STEP else [0]
+    block = min((start_line - 1) // LINE_INDEX_STEP, len(offsets) - 1)
+
+    with open(filepath, "rb") as f:
+        f.seek(offsets[block])
+        line_number = block * LINE_INDEX_STEP
+        skip = start_line - 1 - line_number
+        lines = islice(f, skip, None)
+        line_number += skip
+        for raw in lines:
+            line_number += 1
+            if end_line is not None and line_number > end_line:
+                break
+            line = raw.decode("utf-8").strip()
             # Skip empty lines and comments
             if line and not line.startswith('#'):
-                lines.append(line)
+                yield line
 
-    except Exception as e:
-        print(f"Error loading data from {filepath}: {e}")
-        return []
 
-    return lines
+def iter_records(file_paths: Dict[str, str], primary: str, start_line: int = 1,
+                 end_line: Optional[int] = None, index_cache: str = None) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Zip several data files line by line into records.
+
+    The n-th data line of every file (comments and empty lines do not count)
+    belongs to the same record. Records are numbered from start_line and
+    produced until the primary file ends; shorter files give "".
+
+    Args:
+        file_paths: {key: path} of the files to zip
+        primary: Key of the file that defines how many records there are
+        start_line: First line number to read (1-indexed)
+        end_line: Last line number to read (inclusive), None for the end of the files
+        index_cache: JSON file for line indexes between runs (optional)
+
+    Yields:
+        Tuples (identifier, {key: line})
+    """
+    streams = {key: iter_lines(path, start_line, end_line, index_cache) for key, path in file_paths.items()}
+    primary_stream = streams.pop(primary)
+    for i, value in enumerate(primary_stream):
+        record = {primary: value}
+        for key, stream in streams.items():
+            record[key] = next(stream, "")
+        yield str(i + start_line), record
 
 
-def load_data_sync(filepath: str, start_line: int = 1, end_line: int = 9999) -> List[str]:
+async def load_data(filepath: str, start_line: int = 1, end_line: Optional[int] = None) -> List[str]:
     """
-    Synchronous version of load_data.
+    Load lines from a text file within specified range.
 
     Args:
         filepath: Path to the text file
         start_line: First line number to read (1-indexed)
-        end_line: Last line number to read (inclusive)
+        end_line: Last line number to read (inclusive), None for the end of the file
 
     Returns:
         List of strings (lines) from the file, excluding comments and empty lines
     """
-    if not os.path.exists(filepath):
-        return []
+    return load_data_sync(filepath, start_line, end_line)
 
-    lines = []
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
 
-        # Process lines in the specified range
-        for i in range(start_line - 1, min(end_line, len(all_lines))):
-            line = all_lines[i].strip()
-            # Skip empty lines and comments
-            if line and not line.startswith('#'):
-                lines.append(line)
+def load_data_sync(filepath: str, start_line: int = 1, end_line: Optional[int] = None) -> List[str]:
+    """
+    Synchronous version of load_data.
+
+    Args:
+        filepath: Path to the text file
+        start_line: First line number to read (1-indexed)
+        end_line: Last line number to read (inclusive), None for the end of the file
 
+    Returns:
+        List of strings (lines) from the file, excluding comments and empty lines
+    """
+    try:
+        return list(iter_lines(filepath, start_line, end_line))
     except Exception as e:
         print(f"Error loading data from {filepath}: {e}")
         return []
 
-    return lines
-
 
 def ensure_file_exists(filepath: str, default_content: str = "") -> bool:
     """
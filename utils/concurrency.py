@@ -0,0 +1,178 @@
+"""
+Adaptive limit on the number of profiles running at once (AIMD)
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from .metrics import Histogram
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease controller for the dispatcher's slot count.
+
+    Outcomes of Discord requests (status and latency) are collected per
+    window of `interval` seconds. A window closes once it has lasted
+    `interval` seconds and holds at least `min_samples` requests; then
+    the limit is
+
+      - multiplied by `decrease` if the share of 429 responses is above
+        `max_throttle_rate`, the share of 5xx / connection errors is above
+        `max_error_rate` or the p95 latency is above `latency_target`,
+      - otherwise raised by `increase` - but only if the profiles actually
+        used all slots during the window (no growth while the queue is short),
+
+    and always kept between `floor` and `ceiling`. Every change is logged
+    and counted in the metrics registry (concurrency_limit gauge,
+    concurrency_adjustments_total counter with direction and reason).
+    """
+
+    def __init__(self, initial: int, floor: int = 1, ceiling: int = 20, interval: float = 10,
+                 latency_target: float = 2.0, max_throttle_rate: float = 0.02, max_error_rate: float = 0.05,
+                 increase: int = 1, decrease: float = 0.7, min_samples: int = 20,
+                 metrics=None, logger=None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            initial: Starting limit (THREAD_COUNT)
+            floor: Lowest limit
+            ceiling: Highest limit
+            interval: Minimum seconds per measurement window
+            latency_target: Highest acceptable p95 request latency in seconds
+            max_throttle_rate: Highest acceptable share of 429 responses (0-1)
+            max_error_rate: Highest acceptable share of 5xx responses and connection errors (0-1)
+            increase: Slots added after a healthy, fully used window
+            decrease: Factor applied to the limit after an unhealthy window
+            min_samples: Requests needed before a window is judged
+            metrics: MetricsRegistry for the limit and the adjustments (optional)
+            logger: Logger for limit changes
+            clock: Monotonic time source
+        """
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = min(max(initial, self.floor), self.ceiling)
+        self.interval = interval
+        self.latency_target = latency_target
+        self.max_throttle_rate = max_throttle_rate
+        self.max_error_rate = max_error_rate
+        self.increase = max(1, increase)
+        self.decrease = min(max(decrease, 0.1), 0.95)
+        self.min_samples = max(1, min_samples)
+        self.metrics = metrics
+        self.logger = logger
+        self.clock = clock
+        self.stats = {"increases": 0, "decreases": 0, "windows": 0, "lowest": self.limit, "highest": self.limit}
+        self._changed: Optional[asyncio.Event] = None
+        self._started_at = clock()
+        self._limit_since = self._started_at
+        self._limit_time = 0.0  # sum of limit * seconds, for the average limit
+        self._busy = 0  # profiles running now, as last reported by the dispatcher
+        self._reset_window(self._started_at)
+        if metrics is not None:
+            metrics.describe("concurrency_limit", "gauge", "Profiles allowed to run at once (adaptive concurrency)")
+            metrics.describe("concurrency_adjustments_total", "counter",
+                             "Changes of the adaptive concurrency limit by direction and reason")
+            metrics.set("concurrency_limit", self.limit)
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._latency = Histogram()
+        self._requests = 0
+        self._throttled = 0
+        self._errors = 0
+        # Profiles still running count for the new window, even if none starts during it
+        self._peak_busy = self._busy
+
+    # --- Inputs ---
+
+    def observe(self, status: str, elapsed: float):
+        """
+        Record the outcome of one request.
+
+        Args:
+            status: HTTP status as string, "error" for connection errors or "cancelled"
+            elapsed: Seconds until the response headers arrived
+        """
+        if status == "cancelled":
+            return
+        self._requests += 1
+        if status == "429":
+            self._throttled += 1
+        elif status == "error" or status.startswith("5"):
+            self._errors += 1
+        if status != "error":
+            self._latency.observe(elapsed)
+        now = self.clock()
+        if self._requests >= self.min_samples and now - self._window_start >= self.interval:
+            self._evaluate(now)
+
+    def record_busy(self, busy: int):
+        """Record how many profiles are running (called by the dispatcher when a profile starts or ends)"""
+        self._busy = busy
+        if busy > self._peak_busy:
+            self._peak_busy = busy
+
+    # --- Decisions ---
+
+    def _evaluate(self, now: float):
+        throttle_rate = self._throttled / self._requests
+        error_rate = self._errors / self._requests
+        p95 = self._latency.quantile(0.95)
+        fully_used = self._peak_busy >= self.limit
+        self.stats["windows"] += 1
+        self._reset_window(now)
+
+        if throttle_rate > self.max_throttle_rate:
+            reason = f"429 rate {throttle_rate:.1%} > {self.max_throttle_rate:.1%}"
+            self._set_limit(int(self.limit * self.decrease), "decrease", "throttled", reason, now)
+        elif error_rate > self.max_error_rate:
+            reason = f"error rate {error_rate:.1%} > {self.max_error_rate:.1%}"
+            self._set_limit(int(self.limit * self.decrease), "decrease", "errors", reason, now)
+        elif p95 is not None and p95 > self.latency_target:
+            reason = f"p95 latency {p95:.2f}s > {self.latency_target:.2f}s"
+            self._set_limit(int(self.limit * self.decrease), "decrease", "latency", reason, now)
+        elif fully_used:
+            reason = f"healthy window (p95 {p95 or 0:.2f}s, 429 {throttle_rate:.1%}, errors {error_rate:.1%})"
+            self._set_limit(self.limit + self.increase, "increase", "healthy", reason, now)
+
+    def _set_limit(self, new_limit: int, direction: str, reason_label: str, reason: str, now: float):
+        new_limit = min(max(new_limit, self.floor), self.ceiling)
+        if new_limit == self.limit:
+            return
+        old_limit = self.limit
+        self._limit_time += old_limit * (now - self._limit_since)
+        self._limit_since = now
+        self.limit = new_limit
+        self.stats[direction + "s"] += 1
+        self.stats["lowest"] = min(self.stats["lowest"], new_limit)
+        self.stats["highest"] = max(self.stats["highest"], new_limit)
+        if self.metrics is not None:
+            self.metrics.set("concurrency_limit", new_limit)
+            self.metrics.inc("concurrency_adjustments_total", direction=direction, reason=reason_label)
+        if self.logger:
+            log = self.logger.warning if direction == "decrease" else self.logger.info
+            log(f"🎚️ Concurrency {old_limit} → {new_limit}: {reason}")
+        self.notify()
+
+    def average_limit(self) -> float:
+        """Time-weighted average limit since the controller was created"""
+        now = self.clock()
+        elapsed = now - self._started_at
+        if elapsed <= 0:
+            return float(self.limit)
+        return (self._limit_time + self.limit * (now - self._limit_since)) / elapsed
+
+    # --- Slot gate (used by the dispatcher) ---
+
+    async def changed(self):
+        """Wait until the limit changes or notify() is called"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        await self._changed.wait()
+
+    def notify(self):
+        """Wake all coroutines waiting in changed()"""
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
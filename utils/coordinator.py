@@ -0,0 +1,396 @@
+"""
+Work queue for runs spread over several machines: lease queue, coordinator server and worker client
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+# Default address of the coordinator (--coordinator without a value)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8780
+
+# Header carrying the shared secret (COORDINATOR_SECRET)
+SECRET_HEADER = "X-Coordinator-Secret"
+
+# Largest request body the coordinator accepts (lease results with guild lists)
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    Split "host:port", "host" or ":port" into (host, port) with defaults for missing parts.
+
+    Raises:
+        ValueError: If the port is not a number
+    """
+    host, separator, port = address.strip().rpartition(":")
+    if not separator:
+        host, port = port, ""
+    return host or DEFAULT_HOST, int(port) if port else DEFAULT_PORT
+
+
+def is_loopback(host: str) -> bool:
+    """True if `host` only accepts connections from this machine (localhost, 127.0.0.0/8, ::1)"""
+    host = host.strip("[]")
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Lease:
+    """Batch of work items handed to one worker until `expires_at`"""
+
+    __slots__ = ("lease_id", "worker", "items", "expires_at", "expired")
+
+    def __init__(self, lease_id: str, worker: str, items: list, expires_at: float):
+        self.lease_id = lease_id
+        self.worker = worker
+        self.items = items
+        self.expires_at = expires_at
+        self.expired = False
+
+
+class LeaseQueue:
+    """
+    Hands out batches of work items to workers for a limited time.
+
+    A worker has to renew its lease (heartbeat) before `lease_ttl` runs out.
+    An expired lease puts its items back at the front of the queue, so the
+    next worker asking for work picks them up. A worker that finishes an
+    expired lease may still complete it as long as none of its items was
+    leased again - otherwise the results are rejected, so no item is counted
+    twice.
+
+    Not thread-safe: meant to be used from the coordinator's event loop.
+    """
+
+    def __init__(self, items: Iterable, key: Callable = str, lease_ttl: float = 120, batch_size: int = 20,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            items: Work items in processing order
+            key: Function returning a unique, hashable key for an item
+            lease_ttl: Seconds a lease stays valid without a heartbeat
+            batch_size: Maximum items per lease
+            clock: Monotonic time source
+        """
+        self.key = key
+        self.lease_ttl = lease_ttl
+        self.batch_size = max(1, batch_size)
+        self.clock = clock
+        self._pending = deque(items)
+        self._waiting = {key(item) for item in self._pending}  # keys of items in _pending
+        self._leases: Dict[str, Lease] = {}
+        self.total = len(self._pending)
+        self.completed = 0
+        self.stats = {"leased": 0, "expired": 0, "completed": 0, "rejected": 0}
+
+    @property
+    def active_leases(self) -> List[Lease]:
+        return [lease for lease in self._leases.values() if not lease.expired]
+
+    @property
+    def pending(self) -> int:
+        """Items waiting for a worker"""
+        return len(self._pending)
+
+    @property
+    def done(self) -> bool:
+        """True when every item is completed"""
+        return not self._pending and not self.active_leases
+
+    def lease(self, worker: str) -> Optional[Lease]:
+        """
+        Take the next batch of items for a worker.
+
+        Returns:
+            New lease or None if no items are waiting
+        """
+        self.expire()
+        if not self._pending:
+            return None
+        items = []
+        while self._pending and len(items) < self.batch_size:
+            item = self._pending.popleft()
+            self._waiting.discard(self.key(item))
+            items.append(item)
+        lease = Lease(uuid.uuid4().hex, worker, items, self.clock() + self.lease_ttl)
+        self._leases[lease.lease_id] = lease
+        self.stats["leased"] += 1
+        return lease
+
+    def renew(self, lease_id: str) -> bool:
+        """
+        Extend a lease by `lease_ttl` (heartbeat).
+
+        Returns:
+            False if the lease is unknown or has already expired
+        """
+        self.expire()
+        lease = self._leases.get(lease_id)
+        if lease is None or lease.expired:
+            return False
+        lease.expires_at = self.clock() + self.lease_ttl
+        return True
+
+    def complete(self, lease_id: str) -> Optional[Lease]:
+        """
+        Mark the items of a lease as done.
+
+        Returns:
+            The lease, or None if its results must be discarded (unknown lease,
+            or expired with items leased to another worker since)
+        """
+        self.expire()
+        lease = self._leases.pop(lease_id, None)
+        if lease is None:
+            self.stats["rejected"] += 1
+            return None
+        if lease.expired:
+            keys = {self.key(item) for item in lease.items}
+            if not keys <= self._waiting:
+                self.stats["rejected"] += 1
+                return None
+            # Late but nobody else took the items yet - take them back out of the queue
+            self._pending = deque(item for item in self._pending if self.key(item) not in keys)
+            self._waiting -= keys
+        self.completed += len(lease.items)
+        self.stats["completed"] += 1
+        return lease
+
+    def expire(self) -> List[Lease]:
+        """
+        Return the items of leases past their deadline to the front of the queue.
+
+        Returns:
+            Leases that expired in this call
+        """
+        now = self.clock()
+        expired = [lease for lease in self._leases.values() if not lease.expired and lease.expires_at <= now]
+        for lease in expired:
+            lease.expired = True
+            self._pending.extendleft(reversed(lease.items))
+            self._waiting.update(self.key(item) for item in lease.items)
+            self.stats["expired"] += 1
+        # Expired leases whose items were leased again can never complete
+        for lease_id, lease in list(self._leases.items()):
+            if lease.expired and not {self.key(item) for item in lease.items} <= self._waiting:
+                del self._leases[lease_id]
+        return expired
+
+
+class CoordinatorServer:
+    """
+    HTTP front end of a LeaseQueue (JSON over plain HTTP).
+
+    Routes:
+        GET  /config      run settings for the workers
+        POST /lease       {"worker"} -> {"lease_id", "ttl", ...payload} | {"wait": seconds} | {"done": true}
+        POST /heartbeat   {"lease_id"} -> 200, or 409 if the lease is lost
+        POST /complete    {"lease_id", "results"} -> 200, or 409 if the results are discarded
+
+    If `secret` is set, every request must carry it in the X-Coordinator-Secret header.
+    """
+
+    def __init__(self, queue: LeaseQueue, config: dict, lease_payload: Callable[[Lease], dict],
+                 on_complete: Callable[[Lease, dict], None], secret: str = "", poll_interval: float = 2,
+                 logger=None):
+        """
+        Args:
+            queue: Queue of work items
+            config: JSON-serializable settings returned by GET /config
+            lease_payload: Builds the JSON body for a new lease (the items for the worker)
+            on_complete: Called with the lease and the worker's results of an accepted completion
+            secret: Shared secret expected from workers (empty = no check)
+            poll_interval: Seconds a worker waits before asking again while all items are leased
+            logger: Logger for lease events
+        """
+        self.queue = queue
+        self.config = config
+        self.lease_payload = lease_payload
+        self.on_complete = on_complete
+        self.secret = secret
+        self.poll_interval = poll_interval
+        self.logger = logger
+        self.workers = set()
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=MAX_REQUEST_SIZE)
+        app.router.add_get("/config", self._config)
+        app.router.add_post("/lease", self._lease)
+        app.router.add_post("/heartbeat", self._heartbeat)
+        app.router.add_post("/complete", self._complete)
+        return app
+
+    async def start(self, host: str, port: int):
+        """Start serving in the running event loop"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def expire(self):
+        """Requeue expired leases (call periodically, workers that died never ask again)"""
+        for lease in self.queue.expire():
+            if self.logger:
+                self.logger.warning(f"⏰ Lease of worker {lease.worker} expired, "
+                                    f"{len(lease.items)} profiles go back to the queue")
+
+    def _check_secret(self, request: web.Request):
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            raise web.HTTPForbidden(text="Wrong or missing coordinator secret")
+
+    async def _read_json(self, request: web.Request) -> dict:
+        self._check_secret(request)
+        try:
+            data = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body is not JSON")
+        if not isinstance(data, dict):
+            raise web.HTTPBadRequest(text="Request body must be a JSON object")
+        return data
+
+    async def _config(self, request: web.Request) -> web.Response:
+        self._check_secret(request)
+        return web.json_response(self.config)
+
+    async def _lease(self, request: web.Request) -> web.Response:
+        data = await self._read_json(request)
+        worker = str(data.get("worker") or request.remote)
+        self.workers.add(worker)
+        self.expire()
+        if self.queue.done:
+            return web.json_response({"done": True})
+        lease = self.queue.lease(worker)
+        if lease is None:
+            return web.json_response({"wait": self.poll_interval})
+        if self.logger:
+            self.logger.info(f"📤 Leased {len(lease.items)} profiles to worker {worker} "
+                             f"({self.queue.pending} still queued)")
+        body = dict(self.lease_payload(lease), lease_id=lease.lease_id, ttl=self.queue.lease_ttl)
+        return web.json_response(body)
+
+    async def _heartbeat(self, request: web.Request) -> web.Response:
+        data = await self._read_json(request)
+        if not self.queue.renew(str(data.get("lease_id"))):
+            return web.json_response({"ok": False}, status=409)
+        return web.json_response({"ok": True})
+
+    async def _complete(self, request: web.Request) -> web.Response:
+        data = await self._read_json(request)
+        lease = self.queue.complete(str(data.get("lease_id")))
+        if lease is None:
+            if self.logger:
+                self.logger.warning("⚠️ Discarded results of a lease that expired and was handed to another worker")
+            return web.json_response({"accepted": False}, status=409)
+        try:
+            self.on_complete(lease, data.get("results") or {})
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Failed to apply results of worker {lease.worker}: {e}")
+            return web.json_response({"accepted": False, "error": str(e)}, status=500)
+        return web.json_response({"accepted": True})
+
+
+class CoordinatorError(Exception):
+    """Coordinator cannot be reached or rejected the request"""
+
+
+class CoordinatorClient:
+    """
+    Worker side of the coordinator protocol (see CoordinatorServer).
+
+    Connection errors are retried with a growing pause, so a worker survives
+    a short network hiccup or a coordinator that is still starting up.
+    """
+
+    def __init__(self, url: str, secret: str = "", worker_name: str = None, retries: int = 5,
+                 timeout: float = 60):
+        """
+        Args:
+            url: Coordinator base URL, e.g. http://10.0.0.5:8780
+            secret: Shared secret (COORDINATOR_SECRET)
+            worker_name: Name shown in the coordinator log (default: host name and process ID)
+            retries: Attempts per request on connection errors
+            timeout: Seconds per request
+        """
+        if "://" not in url:
+            url = "http://" + url
+        self.url = url.rstrip("/")
+        self.worker_name = worker_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.retries = max(1, retries)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._headers = {SECRET_HEADER: secret} if secret else {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _request(self, method: str, path: str, payload: dict = None) -> Tuple[int, dict]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self.timeout, headers=self._headers)
+        error = None
+        for attempt in range(self.retries):
+            if attempt:
+                await asyncio.sleep(min(2 ** attempt, 30))
+            try:
+                async with self._session.request(method, self.url + path, json=payload) as resp:
+                    if resp.status == 403:
+                        raise CoordinatorError("coordinator rejected the secret (COORDINATOR_SECRET)")
+                    if resp.status in (502, 503, 504):
+                        # Reverse proxy or tunnel in front of the coordinator is not ready
+                        error = CoordinatorError(f"HTTP {resp.status}")
+                        continue
+                    try:
+                        data = await resp.json(content_type=None)
+                    except ValueError:
+                        data = {}
+                    return resp.status, data if isinstance(data, dict) else {}
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+        raise CoordinatorError(f"{method} {path} failed after {self.retries} attempts: {error}")
+
+    async def get_config(self) -> dict:
+        status, data = await self._request("GET", "/config")
+        if status != 200:
+            raise CoordinatorError(f"GET /config returned HTTP {status}")
+        return data
+
+    async def lease(self) -> dict:
+        """Ask for work: lease body, {"wait": seconds} or {"done": true}"""
+        status, data = await self._request("POST", "/lease", {"worker": self.worker_name})
+        if status != 200:
+            raise CoordinatorError(f"POST /lease returned HTTP {status}")
+        return data
+
+    async def heartbeat(self, lease_id: str) -> bool:
+        """Renew a lease; False if the coordinator has given it up"""
+        status, _ = await self._request("POST", "/heartbeat", {"lease_id": lease_id})
+        return status == 200
+
+    async def complete(self, lease_id: str, results: dict) -> bool:
+        """Send the results of a lease; False if the coordinator discarded them"""
+        status, data = await self._request("POST", "/complete", {"lease_id": lease_id, "results": results})
+        if status == 500:
+            raise CoordinatorError(f"coordinator failed to apply the results: {data.get('error')}")
+        return status == 200
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
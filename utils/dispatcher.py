@@ -0,0 +1,207 @@
+"""
+Bounded worker pool for running profiles
+"""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Iterable, Iterator, Optional, Sized, Tuple
+
+# Returned by next() when the item iterator is exhausted
+_NO_MORE_ITEMS = object()
+
+
+class TokenBucket:
+    """
+    Simple token bucket limiting how often new work may start.
+
+    `rate` tokens are added per second up to `burst`; every start takes one.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ProfileDispatcher:
+    """
+    Runs profiles on a fixed number of worker slots pulling from a shared iterator.
+
+    Items are taken from the iterator only when a slot is free, so profiles
+    can be produced lazily (e.g. streamed from the data files).
+
+    Each slot keeps its own start spacing: after starting a profile, the same
+    slot waits a random `start_delay` before starting the next one, while other
+    slots keep working. Optionally a shared TokenBucket caps the overall start
+    rate. Queue depth and slot utilization are logged every `report_interval`
+    seconds and summarized at the end.
+
+    With an AIMDController the number of slots follows its limit: there are
+    `ceiling` slots, and slot N only starts profiles while N < limit. When the
+    limit drops, running profiles finish and the slots above it pause.
+    """
+
+    def __init__(self, worker_count: int, start_delay: Tuple[float, float] = (0, 0),
+                 start_rate: float = 0, start_burst: int = 1, report_interval: float = 30, logger=None,
+                 concurrency=None):
+        """
+        Args:
+            worker_count: Number of profiles processed at the same time (ignored with `concurrency`)
+            start_delay: (min, max) seconds between two starts on the same slot
+            start_rate: Maximum profile starts per second across all slots (0 = unlimited)
+            start_burst: Starts allowed at once before start_rate applies
+            report_interval: Seconds between progress log lines (0 = only final summary)
+            logger: Logger for progress reports
+            concurrency: AIMDController adjusting the number of active slots (optional)
+        """
+        self.concurrency = concurrency
+        self.worker_count = concurrency.ceiling if concurrency is not None else max(1, worker_count)
+        self.start_delay = start_delay
+        self.start_bucket = TokenBucket(start_rate, start_burst)
+        self.report_interval = report_interval
+        self.logger = logger
+        self._items: Optional[Iterator] = None
+        self._total: Optional[int] = None
+        self.stats = {
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "busy_time": 0.0,
+            "wall_time": 0.0,
+        }
+        self._busy = 0
+        self._started_at = 0.0
+        self._exhausted = False
+
+    @property
+    def queue_depth(self) -> Optional[int]:
+        """Items not started yet (None if the number of items is not known in advance)"""
+        if self._total is None:
+            return None
+        return self._total - self.stats["started"]
+
+    @property
+    def busy_slots(self) -> int:
+        return self._busy
+
+    @property
+    def active_slots(self) -> int:
+        """Slots allowed to start profiles right now"""
+        return self.concurrency.limit if self.concurrency is not None else self.worker_count
+
+    def utilization(self) -> float:
+        """Percentage of slot time spent processing profiles (of the average limit if adaptive)"""
+        wall = self.stats["wall_time"] or (time.monotonic() - self._started_at if self._started_at else 0)
+        if wall <= 0:
+            return 0.0
+        slots = self.concurrency.average_limit() if self.concurrency is not None else self.worker_count
+        return self.stats["busy_time"] / (wall * slots) * 100
+
+    async def run(self, items: Iterable, handler: Callable[..., Awaitable]):
+        """
+        Process all items with the handler and wait until all of them are done.
+
+        Args:
+            items: Work items (profiles) in processing order; may be a lazy iterator
+            handler: Coroutine function called with one item
+        """
+        self._total = len(items) if isinstance(items, Sized) else None
+        self._items = iter(items)
+        self._started_at = time.monotonic()
+        self._exhausted = False
+
+        reporter = asyncio.ensure_future(self._report_loop()) if self.report_interval > 0 else None
+        workers = [asyncio.ensure_future(self._worker(slot, handler)) for slot in range(self.worker_count)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if reporter:
+                reporter.cancel()
+            self.stats["wall_time"] = time.monotonic() - self._started_at
+            self._log_summary()
+
+    async def _worker(self, slot: int, handler: Callable[..., Awaitable]):
+        # Stagger the first start of each slot so slots do not all fire at once
+        next_start = time.monotonic() + slot * self._random_delay()
+        while True:
+            # Slots above the adaptive limit pause until it grows or the items run out
+            while slot >= self.active_slots and not self._exhausted:
+                await self.concurrency.changed()
+            item = next(self._items, _NO_MORE_ITEMS)
+            if item is _NO_MORE_ITEMS:
+                self._exhausted = True
+                if self.concurrency is not None:
+                    self.concurrency.notify()
+                return
+
+            wait = next_start - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.start_bucket.take()
+
+            started = time.monotonic()
+            next_start = started + self._random_delay()
+            self._busy += 1
+            self.stats["started"] += 1
+            if self.concurrency is not None:
+                self.concurrency.record_busy(self._busy)
+            try:
+                await handler(item)
+                self.stats["completed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                if self.logger:
+                    self.logger.error(f"Dispatcher slot {slot}: unhandled error: {e}")
+            finally:
+                self._busy -= 1
+                self.stats["busy_time"] += time.monotonic() - started
+                if self.concurrency is not None:
+                    self.concurrency.record_busy(self._busy)
+
+    def _random_delay(self) -> float:
+        low, high = self.start_delay
+        return random.uniform(low, high) if high > 0 else 0.0
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            if self.logger:
+                waiting = self.queue_depth
+                waiting = f"{waiting} waiting" if waiting is not None else "streaming"
+                self.logger.info(f"📦 Queue: {waiting}, {self._busy}/{self.active_slots} slots busy, "
+                                 f"{self.stats['completed'] + self.stats['failed']} done, "
+                                 f"utilization {self.utilization():.0f}%")
+
+    def _log_summary(self):
+        if not self.logger:
+            return
+        self.logger.info(f"📦 Dispatcher finished: {self.stats['completed']} completed, {self.stats['failed']} failed "
+                         f"in {self.stats['wall_time']:.1f}s on {self._slots_summary()} slots "
+                         f"(utilization {self.utilization():.0f}%)")
+
+    def _slots_summary(self) -> str:
+        if self.concurrency is None:
+            return str(self.worker_count)
+        stats = self.concurrency.stats
+        return (f"{stats['lowest']}-{stats['highest']} (adaptive, average {self.concurrency.average_limit():.1f}, "
+                f"now {self.concurrency.limit})")
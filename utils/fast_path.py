@@ -0,0 +1,60 @@
+"""
+Optional fast path: uvloop event loop and orjson response decoding
+"""
+
+import asyncio
+import json
+from typing import Callable, List
+
+# Both packages are optional (pip install uvloop orjson); without them the
+# standard library is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # not installed, or Windows (uvloop does not support it)
+    uvloop = None
+
+
+def get_json_loads(enabled: bool) -> Callable:
+    """
+    Pick the JSON decoder for resp.json(loads=...).
+
+    Args:
+        enabled: Fast mode is on
+
+    Returns:
+        orjson.loads if fast mode is on and orjson is installed, json.loads otherwise
+    """
+    if enabled and orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+def install_event_loop(enabled: bool) -> bool:
+    """
+    Make asyncio.run() use uvloop (call before asyncio.run).
+
+    Args:
+        enabled: Fast mode is on
+
+    Returns:
+        True if uvloop was installed
+    """
+    if not enabled or uvloop is None:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def fast_path_status(enabled: bool) -> List[str]:
+    """Lines describing which fast path components are active (for the startup log)"""
+    if not enabled:
+        return ["off"]
+    return [
+        f"event loop: {'uvloop' if uvloop is not None else 'asyncio (uvloop not installed)'}",
+        f"JSON decoding: {'orjson' if orjson is not None else 'json (orjson not installed)'}",
+    ]
@@ -0,0 +1,157 @@
+"""
+In-memory aggregator for the combined guild list (guilds_all.csv)
+"""
+
+import csv
+import os
+import time
+from typing import Dict, Iterable
+
+
+class GuildAggregator:
+    """
+    Collects guilds from all profiles and writes the combined CSV.
+
+    Profiles only add guilds to memory; the file is rewritten once at the end
+    of the run and, as a checkpoint, at most every `checkpoint_interval`
+    seconds. Writes go to a temp file that is renamed over the target, so the
+    CSV is never left half-written. Rows already present in the file from
+    earlier runs are kept (deduplicated by Server ID).
+
+    Output format (Excel friendly):
+        #;Server Name;Server ID
+        1;Caldera;'1002684842196086876
+    """
+
+    def __init__(self, path: str, checkpoint_interval: float = 60):
+        """
+        Args:
+            path: Combined CSV file path
+            checkpoint_interval: Minimum seconds between checkpoint writes (0 = only final flush)
+        """
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._guilds: Dict[str, str] = {}  # {server_id: server_name}
+        self._loaded = False
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+    def __len__(self):
+        return len(self._guilds)
+
+    @staticmethod
+    def _read_csv(path: str) -> Dict[str, str]:
+        """Read {server_id: server_name} from a guild CSV (combined or per-profile)"""
+        guilds = {}
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=';')
+            for row in reader:
+                if "Server ID" in row and row["Server ID"]:
+                    # Remove apostrophe if present
+                    server_id = str(row["Server ID"]).strip().lstrip("'")
+                    server_name = str(row.get("Server Name", "")).strip()
+                    guilds[server_id] = server_name
+        return guilds
+
+    def _load_existing(self):
+        """Load guilds written by previous runs"""
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        self._guilds.update(self._read_csv(self.path))
+
+    def add(self, guilds: Iterable[dict]) -> int:
+        """
+        Add guilds from one profile.
+
+        Args:
+            guilds: Guild dictionaries with 'id' and 'name'
+
+        Returns:
+            Number of unique guilds collected so far
+        """
+        if not self._loaded:
+            self._load_existing()
+        for guild in guilds:
+            server_id = str(guild["id"]).strip()
+            server_name = str(guild["name"]).strip()
+            if server_id:
+                self._guilds[server_id] = server_name
+                self._dirty = True
+        return len(self._guilds)
+
+    def add_file(self, path: str) -> int:
+        """
+        Add guilds from a per-profile CSV written earlier (used when resuming a run).
+
+        Args:
+            path: Path to output/guilds_<id>.csv
+
+        Returns:
+            Number of guilds read from the file
+        """
+        guilds = self._read_csv(path)
+        self.add({"id": server_id, "name": server_name} for server_id, server_name in guilds.items())
+        return len(guilds)
+
+    def items(self) -> Dict[str, str]:
+        """Collected guilds as {server_id: server_name} (e.g. to send them to another process)"""
+        return dict(self._guilds)
+
+    def clear(self):
+        """Forget all collected guilds; guilds of previous runs are not loaded again"""
+        self._guilds.clear()
+        self._loaded = True
+        self._dirty = False
+
+    def checkpoint_due(self) -> bool:
+        """True if there are unsaved guilds and the checkpoint interval has passed"""
+        return (self._dirty and self.checkpoint_interval > 0
+                and time.monotonic() - self._last_write >= self.checkpoint_interval)
+
+    def rows(self):
+        """Yield CSV rows sorted by guild name (case-insensitive)"""
+        yield ["#", "Server Name", "Server ID"]
+        sorted_guilds = sorted(self._guilds.items(), key=lambda x: x[1].lower())
+        for i, (server_id, server_name) in enumerate(sorted_guilds, 1):
+            # Apostrophe before ID so Excel does not convert it to scientific notation
+            yield [i, server_name, f"'{server_id}"]
+
+    def mark_saved(self):
+        """Mark all collected guilds as saved (the caller writes the file)"""
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+    def snapshot(self) -> list:
+        """
+        Take the current CSV rows for writing elsewhere (e.g. on a writer thread).
+
+        Returns:
+            List of CSV rows; the guilds are marked as saved
+        """
+        rows = list(self.rows())
+        self.mark_saved()
+        return rows
+
+    def write(self, rows: Iterable = None) -> bool:
+        """
+        Write the combined CSV atomically (temp file + rename).
+
+        Args:
+            rows: CSV rows to write instead of the collected guilds (e.g. exported from the state database)
+
+        Returns:
+            True if the file was written, False if there was nothing new to save
+        """
+        if not self._dirty:
+            return False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerows(rows if rows is not None else self.rows())
+        os.replace(tmp_path, self.path)
+        self.mark_saved()
+        return True
@@ -0,0 +1,127 @@
+"""
+Guild name index for resolving leave list entries to guild IDs
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_NON_WORD = re.compile(r"[^\w\s]|_", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a guild name for loose matching.
+
+    Removes diacritics, emoji and punctuation, casefolds and collapses
+    whitespace: "  Café 🎉 Club! " -> "cafe club".
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    without_marks = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = _NON_WORD.sub(" ", without_marks).casefold()
+    return _SPACES.sub(" ", cleaned).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class GuildNameIndex:
+    """
+    Lookup structure for guild names, built once per run.
+
+    Levels, tried in order until one matches:
+        exact      - name as written
+        casefold   - case-insensitive
+        normalized - diacritics, emoji, punctuation and extra spaces ignored
+        fuzzy      - trigram similarity on normalized names (optional)
+
+    A name that maps to several different guild IDs on the matching level is
+    reported as ambiguous instead of picking one of them.
+    """
+
+    def __init__(self, guilds: Iterable[Tuple[str, str]], fuzzy: bool = False, fuzzy_threshold: float = 0.6):
+        """
+        Args:
+            guilds: Pairs (guild_name, guild_id)
+            fuzzy: Enable trigram fuzzy matching as the last level
+            fuzzy_threshold: Minimum similarity (0-1) for a fuzzy match
+        """
+        self.fuzzy = fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+        self._exact: Dict[str, Dict[str, str]] = defaultdict(dict)        # name -> {id: name}
+        self._casefold: Dict[str, Dict[str, str]] = defaultdict(dict)     # casefolded -> {id: name}
+        self._normalized: Dict[str, Dict[str, str]] = defaultdict(dict)   # normalized -> {id: name}
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)       # trigram -> normalized names
+        self._size = 0
+
+        for name, guild_id in guilds:
+            if not name or not guild_id:
+                continue
+            self._size += 1
+            self._exact[name][guild_id] = name
+            self._casefold[name.casefold()][guild_id] = name
+            normalized = normalize_name(name)
+            if normalized:
+                self._normalized[normalized][guild_id] = name
+                if fuzzy:
+                    for gram in _trigrams(normalized):
+                        self._trigram_index[gram].add(normalized)
+
+    def __len__(self):
+        return self._size
+
+    def lookup(self, query: str) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+        """
+        Find guilds matching a name.
+
+        Args:
+            query: Guild name from the leave list
+
+        Returns:
+            Tuple (match_level, [(name, id), ...]). match_level is None and the
+            list is empty if nothing matched. More than one pair means the name
+            is ambiguous.
+        """
+        levels = (
+            ("exact", self._exact, query),
+            ("case-insensitive", self._casefold, query.casefold()),
+            ("normalized", self._normalized, normalize_name(query)),
+        )
+        for level, table, key in levels:
+            matches = table.get(key)
+            if matches:
+                return level, [(name, guild_id) for guild_id, name in matches.items()]
+
+        if self.fuzzy:
+            candidates = self._fuzzy_match(normalize_name(query))
+            if candidates:
+                return "fuzzy", [(name, guild_id) for normalized in candidates
+                                 for guild_id, name in self._normalized[normalized].items()]
+
+        return None, []
+
+    def _fuzzy_match(self, normalized_query: str) -> List[str]:
+        """Return the best scoring normalized names above the threshold (several on a tie)"""
+        if not normalized_query:
+            return []
+        query_grams = _trigrams(normalized_query)
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                shared[candidate] += 1
+
+        scored = []
+        for candidate, common in shared.items():
+            union = len(query_grams) + len(_trigrams(candidate)) - common
+            scored.append((common / union, candidate))
+        scored.sort(reverse=True)
+
+        if not scored or scored[0][0] < self.fuzzy_threshold:
+            return []
+        best_score = scored[0][0]
+        return [candidate for score, candidate in scored if score == best_score]
@@ -0,0 +1,167 @@
+"""
+Shared HTTP session pool for Discord and proxy-check requests
+"""
+
+import asyncio
+import ssl
+import time
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+import certifi
+
+
+DEFAULT_USER_AGENT = "Mozilla/5.0"
+
+
+def proxy_label(proxy_url: str) -> str:
+    """Proxy as "host:port" for metrics (credentials removed), "direct" without proxy"""
+    if not proxy_url:
+        return "direct"
+    parts = urlsplit(proxy_url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else str(parts.hostname)
+
+
+class SessionPool:
+    """
+    Registry of pooled aiohttp sessions keyed by (proxy, user-agent).
+
+    Every session keeps its keep-alive connections open between requests, so
+    repeated calls through the same proxy skip the TCP connect, proxy CONNECT
+    and TLS handshake. All sessions share a single SSL context, which means the
+    CA bundle is read from disk only once per run.
+
+    Cookies are never stored (DummyCookieJar): sessions can be shared by several
+    accounts using the same proxy and user agent, and Discord cookies must not
+    leak between them.
+
+    With a metrics registry every request is timed (until the response
+    headers arrive) by route and by proxy. The route label is taken from
+    trace_request_ctx={"route": ...} and defaults to "METHOD host".
+
+    `observer(status, elapsed)` is called for every request labelled with a
+    route (the Discord API calls, not the proxy checks), e.g. to feed the
+    adaptive concurrency controller. It may be set after sessions exist.
+    """
+
+    def __init__(self, limit_per_host: int = 10, keepalive_timeout: float = 60.0, metrics=None):
+        """
+        Args:
+            limit_per_host: Maximum simultaneous connections per host in one session
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            metrics: MetricsRegistry for request latency and status metrics (optional)
+        """
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.metrics = metrics
+        self.observer: Optional[Callable[[str, float], None]] = None
+        self._sessions: Dict[Tuple[str, str], aiohttp.ClientSession] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self.stats = {
+            "sessions_created": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+        }
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """Shared SSL context, created on first use"""
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return self._ssl_context
+
+    def get(self, proxy_url: str = "", user_agent: str = None) -> aiohttp.ClientSession:
+        """
+        Get (or create) the session for a proxy / user-agent pair.
+
+        Args:
+            proxy_url: Formatted proxy URL or empty string for a direct connection
+            user_agent: User agent sent as the session default header
+
+        Returns:
+            Open aiohttp.ClientSession bound to the running event loop
+        """
+        user_agent = user_agent or DEFAULT_USER_AGENT
+        key = (proxy_url or "", user_agent)
+
+        session = self._sessions.get(key)
+        if session is not None and not session.closed:
+            return session
+
+        connector = aiohttp.TCPConnector(
+            ssl=self.ssl_context,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": user_agent},
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[self._trace_config(proxy_label(proxy_url))],
+        )
+        self._sessions[key] = session
+        self.stats["sessions_created"] += 1
+        return session
+
+    def _trace_config(self, proxy: str) -> aiohttp.TraceConfig:
+        """Build trace hooks that count new vs reused connections and time requests"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, context, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats["connections_reused"] += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+
+        async def on_request_start(session, context, params):
+            context.started = time.monotonic()
+
+        async def on_request_end(session, context, params):
+            self._record_request(context, params.method, params.url, proxy, str(params.response.status))
+
+        async def on_request_exception(session, context, params):
+            cancelled = isinstance(params.exception, asyncio.CancelledError)
+            self._record_request(context, params.method, params.url, proxy, "cancelled" if cancelled else "error")
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def _record_request(self, context, method: str, url, proxy: str, status: str):
+        elapsed = time.monotonic() - getattr(context, "started", time.monotonic())
+        request_ctx = context.trace_request_ctx
+        route = request_ctx.get("route") if isinstance(request_ctx, dict) else None
+        if route and self.observer is not None:
+            self.observer(status, elapsed)
+        if self.metrics is None:
+            return
+        route = route or f"{method} {url.host}"
+
+        self.metrics.inc("http_responses_total", route=route, status=status)
+        if status == "cancelled":
+            # Lost a probe race or hedge - says nothing about the proxy
+            return
+        self.metrics.inc("proxy_requests_total", proxy=proxy, result="error" if status == "error" else "ok")
+        if status != "error":
+            self.metrics.observe("http_request_duration_seconds", elapsed, route=route)
+            self.metrics.observe("proxy_request_duration_seconds", elapsed, proxy=proxy)
+
+    def reuse_rate(self) -> float:
+        """Percentage of requests served by an already open connection"""
+        total = self.stats["connections_created"] + self.stats["connections_reused"]
+        if total == 0:
+            return 0.0
+        return self.stats["connections_reused"] / total * 100
+
+    async def close(self):
+        """Close all pooled sessions and their connectors"""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
@@ -2,30 +2,64 @@
 Logger module for colored console output and file logging
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import colorlog
 import os
 from datetime import datetime
 
+DEFAULT_LOGGER_NAME = "DiscordGuildManager"
 
-def setup_logger(name="DiscordGuildManager", log_file=None):
+# Background listener writing queued records in async logging mode
+_listener = None
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that passes records on unformatted.
+
+    The message is %-formatted by the listener thread instead of the caller.
+    Records never leave the process, so they do not have to be made picklable.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logger(name=DEFAULT_LOGGER_NAME, log_file=None, async_logging=None, account_level=None):
     """
     Set up a logger with colored console output and automatic file logging.
 
+    In async mode the logger only puts records on a queue; a background
+    QueueListener formats them and does the console and file output, so
+    logging never waits for the terminal or the disk.
+
     Args:
         name: Logger name
         log_file: Optional log file path (auto-generated if None)
+        async_logging: Use the background listener (default: ASYNC_LOGGING env, False)
+        account_level: Level of per-account messages (default: ACCOUNT_LOG_LEVEL env, INFO)
 
     Returns:
         Configured logger instance
     """
+    global _listener
     logger = logging.getLogger(name)
 
     # Avoid duplicate handlers
     if logger.handlers:
         return logger
 
+    if async_logging is None:
+        async_logging = os.getenv('ASYNC_LOGGING', 'False').lower() == 'true'
+    if account_level is None:
+        account_level = os.getenv('ACCOUNT_LOG_LEVEL', 'INFO')
+
     logger.setLevel(logging.DEBUG)
+    level = logging.getLevelName(str(account_level).strip().upper())
+    get_account_logger(name).setLevel(level if isinstance(level, int) else logging.INFO)
 
     # Console handler with colors
     console_handler = colorlog.StreamHandler()
@@ -44,7 +78,6 @@ def setup_logger(name="DiscordGuildManager", log_file=None):
         }
     )
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
 
     # Auto-create log file with timestamp
     if log_file is None:
@@ -65,9 +98,38 @@ def setup_logger(name="DiscordGuildManager", log_file=None):
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+
+    if async_logging:
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        logger.addHandler(_LazyQueueHandler(log_queue))
+    else:
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
 
     # Log to file that logging started
     logger.info(f"📝 Logging to file: {os.path.abspath(log_file)}")
 
     return logger
+
+
+def get_account_logger(name=DEFAULT_LOGGER_NAME):
+    """
+    Get the logger for per-account messages.
+
+    It is a child of the main logger and uses its handlers; its own level
+    (ACCOUNT_LOG_LEVEL) filters per-account lines before any formatting,
+    e.g. WARNING keeps only problems of single accounts out of 1000.
+    """
+    return logging.getLogger(name).getChild("account")
+
+
+def stop_logging():
+    """Write all queued log records and stop the background listener (async mode)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,301 @@
+"""
+Run metrics: counters, gauges and latency histograms with JSON / Prometheus export
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 7.5, 10.0, 20.0, 30.0)
+
+# Quantiles shown in reports and written to metrics.json
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Bucketed distribution of observed values (Prometheus style).
+
+    Memory does not grow with the number of observations. Quantiles are
+    estimated by linear interpolation inside the bucket that holds them,
+    and clamped to the smallest / largest value actually observed.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        """Add the observations of another histogram with the same buckets"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def to_dict(self) -> dict:
+        """Raw state as JSON-serializable dict (see from_dict)"""
+        return {"bounds": list(self.bounds), "counts": self.counts, "count": self.count,
+                "sum": self.sum, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(tuple(data["bounds"]))
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q: Quantile between 0 and 1 (0.95 = p95)
+
+        Returns:
+            Estimated value or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                value = low + (high - low) * (rank - cumulative) / bucket_count
+                return min(max(value, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def cumulative_buckets(self) -> Iterator[Tuple[str, int]]:
+        """Yield (upper bound, count of values <= bound) including "+Inf" """
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += bucket_count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), cumulative
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra: Tuple[str, str] = None) -> str:
+    pairs = list(label_key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    In-memory store of named metrics, each split into series by labels.
+
+    Usage:
+        metrics.inc("discord_responses_total", route="GET /users/@me", status="200")
+        metrics.observe("http_request_duration_seconds", 0.42, route="GET /users/@me")
+        metrics.set("rate_limit_wait_seconds", 12.5)
+
+    Updates are plain dict operations and are meant to be made from the
+    event loop thread. The registry is written as JSON (with p50/p95/p99
+    per histogram series) or in the Prometheus text exposition format, at
+    the end of the run and at most every `export_interval` seconds during it.
+    """
+
+    def __init__(self, export_interval: float = 0):
+        """
+        Args:
+            export_interval: Minimum seconds between periodic exports (0 = only at the end)
+        """
+        self.export_interval = export_interval
+        self._types: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+        self._series: Dict[str, dict] = {}  # name -> {label_key: value or Histogram}
+        self._last_export = time.monotonic()
+
+    def describe(self, name: str, kind: str, help_text: str = ""):
+        """
+        Declare a metric (optional - undeclared metrics get their type from first use).
+
+        Args:
+            name: Metric name
+            kind: 'counter', 'gauge' or 'histogram'
+            help_text: Description written to the Prometheus # HELP line
+        """
+        self._types[name] = kind
+        if help_text:
+            self._help[name] = help_text
+
+    def _metric(self, name: str, kind: str) -> dict:
+        series = self._series.get(name)
+        if series is None:
+            self._types.setdefault(name, kind)
+            series = self._series[name] = {}
+        return series
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter"""
+        series = self._metric(name, "counter")
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        self._metric(name, "gauge")[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Add a value to a histogram"""
+        series = self._metric(name, "histogram")
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def merge(self, other: "MetricsRegistry"):
+        """
+        Add the metrics of another registry (e.g. from a worker process).
+
+        Counters and histograms are summed, gauges take the other registry's value.
+        """
+        for name, series in other._series.items():
+            kind = other._types.get(name, "gauge")
+            target = self._metric(name, kind)
+            for key, value in series.items():
+                if isinstance(value, Histogram):
+                    histogram = target.get(key)
+                    if histogram is None:
+                        histogram = target[key] = Histogram(value.bounds)
+                    histogram.merge(value)
+                elif kind == "counter":
+                    target[key] = target.get(key, 0) + value
+                else:
+                    target[key] = value
+
+    def clear(self):
+        """Drop all recorded values (declarations are kept)"""
+        self._series.clear()
+
+    def dump(self) -> dict:
+        """
+        Raw state as JSON-serializable dict, e.g. to send it over the network.
+
+        Unlike to_dict(), histograms keep their buckets, so load() + merge()
+        on the receiving side give the same result as merging the registry.
+        """
+        series = {}
+        for name, values in self._series.items():
+            series[name] = [
+                [list(map(list, key)), value.to_dict() if isinstance(value, Histogram) else value]
+                for key, value in values.items()
+            ]
+        return {"types": self._types, "help": self._help, "series": series}
+
+    @classmethod
+    def load(cls, data: dict) -> "MetricsRegistry":
+        """Registry from dump() output"""
+        registry = cls()
+        registry._types.update(data.get("types", {}))
+        registry._help.update(data.get("help", {}))
+        for name, values in data.get("series", {}).items():
+            series = registry._series[name] = {}
+            for key, value in values:
+                label_key = tuple(tuple(pair) for pair in key)
+                series[label_key] = Histogram.from_dict(value) if isinstance(value, dict) else value
+        return registry
+
+    def series(self, name: str) -> Iterator[Tuple[dict, object]]:
+        """Yield (labels, value or Histogram) for every series of a metric"""
+        for key, value in sorted(self._series.get(name, {}).items()):
+            yield dict(key), value
+
+    # --- Export ---
+
+    def export_due(self) -> bool:
+        """True if periodic export is enabled and the interval has passed"""
+        return self.export_interval > 0 and time.monotonic() - self._last_export >= self.export_interval
+
+    def mark_exported(self):
+        self._last_export = time.monotonic()
+
+    def to_dict(self) -> dict:
+        """Snapshot of all metrics as JSON-serializable dict"""
+        data = {"generated_at": time.time(), "counters": {}, "gauges": {}, "histograms": {}}
+        for name in sorted(self._series):
+            kind = self._types.get(name, "gauge")
+            entries = []
+            for labels, value in self.series(name):
+                if isinstance(value, Histogram):
+                    entry = {"labels": labels, "count": value.count, "sum": round(value.sum, 6),
+                             "min": value.min, "max": value.max}
+                    for q in QUANTILES:
+                        estimate = value.quantile(q)
+                        entry[f"p{int(q * 100)}"] = None if estimate is None else round(estimate, 6)
+                    entry["buckets"] = dict(value.cumulative_buckets())
+                else:
+                    entry = {"labels": labels, "value": value}
+                entries.append(entry)
+            data[kind + "s"][name] = entries
+        return data
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name in sorted(self._series):
+            kind = self._types.get(name, "gauge")
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(self._series[name].items()):
+                if isinstance(value, Histogram):
+                    for bound, cumulative in value.cumulative_buckets():
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value.sum!r}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write_file(path: str, content: str):
+        """Write an export atomically (temp file + rename)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def render(self, fmt: str) -> str:
+        """Render the registry as 'json' or 'prometheus' text"""
+        if fmt == "prometheus":
+            return self.to_prometheus()
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
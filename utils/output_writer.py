@@ -0,0 +1,223 @@
+"""
+Background writer thread for output files
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import csv
+import os
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+# Queued to stop the writer thread
+_STOP = object()
+
+# Jobs handled in one batch before open files are flushed
+BATCH_SIZE = 256
+
+
+def write_csv_atomic(path: str, rows: Iterable, encoding: str = "utf-8-sig"):
+    """Write a ';'-separated CSV to a temp file and rename it over the target"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding=encoding) as f:
+        csv.writer(f, delimiter=';').writerows(rows)
+    os.replace(tmp_path, path)
+
+
+class OutputWriter:
+    """
+    Runs file writes on one background thread so coroutines never wait for the disk.
+
+    Coroutines queue jobs (CSV rows or any blocking callable) and continue.
+    Jobs run in the order they were queued; the thread takes up to BATCH_SIZE
+    jobs at a time and flushes the files they touched once per batch.
+
+    Backpressure: at most `max_pending` jobs queued with submit() (bulk CSV
+    rows) wait at a time; when they are reached, submit() waits on an asyncio
+    semaphore that the writer thread releases through the event loop, so the
+    wait can be cancelled and holds no thread. submit_nowait() is for small control
+    jobs (journal lines, database updates, checkpoints) called from code that
+    cannot await - it never waits and does not count against the limit.
+
+    drain() waits until everything queued so far is on disk; close() drains,
+    stops the thread and closes the files. close() is also registered with
+    atexit, so queued output is written even if the run ends unexpectedly.
+    """
+
+    def __init__(self, max_pending: int = 1000, logger=None):
+        """
+        Args:
+            max_pending: Maximum number of queued submit() jobs before writers have to wait
+            logger: Logger for errors in jobs
+        """
+        self.max_pending = max(1, max_pending)
+        self.logger = logger
+        # One FIFO queue keeps all jobs in order; only submit() jobs hold a slot
+        self._queue: "queue.Queue" = queue.Queue()
+        self._slots: Optional[asyncio.Semaphore] = None  # created in the event loop by submit()
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+        self._lock = threading.Lock()
+        self._files: Dict[str, tuple] = {}  # path -> (file, csv writer), used only by the writer thread
+        self.stats = {
+            "jobs": 0,
+            "batches": 0,
+            "errors": 0,
+            "backpressure_waits": 0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+
+    def submit_nowait(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Queue a small blocking call without ever waiting (safe on the event loop thread).
+
+        Returns:
+            Future with the result of the call
+        """
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._queue.put((fn, args, kwargs, future, None))
+        return future
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Queue a blocking call; if the queue is full, wait without blocking the event loop.
+
+        Returns:
+            Future with the result of the call (await asyncio.wrap_future(...) for the result)
+        """
+        self._ensure_started()
+        loop = asyncio.get_event_loop()
+        if self._slots_loop is not loop:
+            # asyncio primitives belong to one loop (a new asyncio.run() starts with free slots)
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        slots = self._slots
+        if slots.locked():
+            self.stats["backpressure_waits"] += 1
+        await slots.acquire()
+        future = concurrent.futures.Future()
+        # Nothing is awaited between taking the slot and queueing, so a cancelled wait never loses a slot
+        self._queue.put((fn, args, kwargs, future, (loop, slots)))
+        return future
+
+    async def write_rows(self, path: str, rows: list, header: list = None, new_file: bool = False):
+        """
+        Queue CSV rows for a file. The file stays open until close_file() or close().
+
+        Args:
+            path: CSV file path
+            rows: Rows to write (must not be changed after queueing)
+            header: Header row written when the file is created
+            new_file: Create (truncate) the file instead of appending
+        """
+        await self.submit(self._write_rows, path, rows, header, new_file)
+
+    async def close_file(self, path: str):
+        """Queue closing a file opened by write_rows()"""
+        await self.submit(self._close_file, path)
+
+    async def drain(self):
+        """Wait until all jobs queued so far are done and their files flushed"""
+        if self._thread is None:
+            return
+        future = await self.submit(self._flush_files)
+        await asyncio.wrap_future(future)
+
+    def close(self):
+        """Write everything still queued, stop the thread and close all files"""
+        thread = self._thread
+        if thread is None:
+            return
+        if thread.is_alive():
+            self._queue.put((_STOP, (), {}, None, None))
+            thread.join()
+        with self._lock:
+            self._thread = None
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for fn, args, kwargs, future, slot in batch:
+                if fn is _STOP:
+                    stop = True
+                    continue
+                self._run_job(fn, args, kwargs, future)
+                if slot:
+                    self._release_slot(*slot)
+            self.stats["batches"] += 1
+            self._flush_files()
+            if stop:
+                self._close_all()
+                return
+
+    @staticmethod
+    def _release_slot(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore):
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:
+            pass  # Event loop already closed (close() at exit) - nobody waits for the slot
+
+    def _run_job(self, fn, args, kwargs, future):
+        self.stats["jobs"] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self.logger:
+                self.logger.error(f"Output writer: {getattr(fn, '__name__', 'job')} failed: {e}")
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _write_rows(self, path: str, rows: list, header: list, new_file: bool):
+        entry = self._files.get(path)
+        if entry is None or new_file:
+            if entry is not None:
+                entry[0].close()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = open(path, "w" if new_file else "a", newline="", encoding="utf-8-sig")
+            entry = (f, csv.writer(f, delimiter=';'))
+            self._files[path] = entry
+            if header and new_file:
+                entry[1].writerow(header)
+        entry[1].writerows(rows)
+
+    def _close_file(self, path: str):
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            entry[0].close()
+
+    def _flush_files(self):
+        for f, _ in self._files.values():
+            f.flush()
+
+    def _close_all(self):
+        for path in list(self._files):
+            self._close_file(path)
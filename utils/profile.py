@@ -0,0 +1,146 @@
+"""
+Profile record and profile number selector
+"""
+
+import heapq
+import sys
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+
+class Profile:
+    """
+    One account: identifier plus the matching lines of the data files.
+
+    Uses __slots__, so a profile takes a fraction of the memory of a dict.
+    """
+
+    __slots__ = ("identifier", "token", "user_agent", "proxy")
+
+    def __init__(self, identifier: str, token: str = "", user_agent: str = "", proxy: str = ""):
+        """
+        Args:
+            identifier: Profile number as string ("1", "2", ...)
+            token: Discord token
+            user_agent: Browser user agent (interned - many profiles share the same string)
+            proxy: Proxy in format ip:port:user:pass, empty for direct connection
+        """
+        self.identifier = identifier
+        self.token = token
+        self.user_agent = sys.intern(user_agent) if user_agent else user_agent
+        self.proxy = proxy
+
+    def __repr__(self):
+        return f"Profile({self.identifier})"
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort intervals and merge overlapping or adjacent ones"""
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def _contains(intervals: List[Tuple[int, int]], starts: List[int], number: int) -> bool:
+    pos = bisect_right(starts, number) - 1
+    return pos >= 0 and number <= intervals[pos][1]
+
+
+class ProfileSelector:
+    """
+    Decides which profile numbers to process.
+
+    Built from a spec like "1-500,!17,!200-210": numbers and ranges select
+    profiles, entries starting with "!" exclude them. Without any selecting
+    entry all profiles are selected. Stored as sorted, merged intervals, so
+    a check is a binary search no matter how many numbers the spec covers.
+    """
+
+    def __init__(self, include: List[Tuple[int, int]] = None, exclude: List[Tuple[int, int]] = None):
+        self._include = _merge(include or [])
+        self._exclude = _merge(exclude or [])
+        self._include_starts = [low for low, _ in self._include]
+        self._exclude_starts = [low for low, _ in self._exclude]
+
+    @classmethod
+    def parse(cls, spec: str, skip_spec: str = "", on_error=None) -> "ProfileSelector":
+        """
+        Compile a selector from comma-separated entries.
+
+        Args:
+            spec: Entries to select ("5", "1-500") or exclude ("!17", "!200-210")
+            skip_spec: Additional entries to exclude, without "!"
+            on_error: Called with every entry that could not be parsed
+
+        Returns:
+            ProfileSelector
+        """
+        include, exclude = [], []
+        entries = [(entry, False) for entry in spec.split(",")]
+        entries += [(entry, True) for entry in skip_spec.split(",")]
+        for entry, excluded in entries:
+            entry = entry.strip()
+            # Skip empty strings and comments
+            if not entry or entry.startswith("#"):
+                continue
+            if entry.startswith("!"):
+                excluded = True
+                entry = entry[1:].strip()
+            try:
+                if "-" in entry:
+                    low, high = (int(part) for part in entry.split("-", 1))
+                else:
+                    low = high = int(entry)
+            except ValueError:
+                if on_error:
+                    on_error(entry)
+                continue
+            if low > high:
+                low, high = high, low
+            (exclude if excluded else include).append((low, high))
+        return cls(include, exclude)
+
+    def __contains__(self, number: int) -> bool:
+        if self._include and not _contains(self._include, self._include_starts, number):
+            return False
+        return not (self._exclude and _contains(self._exclude, self._exclude_starts, number))
+
+    @property
+    def max_number(self) -> Optional[int]:
+        """Highest profile number that can be selected (None if unbounded)"""
+        return self._include[-1][1] if self._include else None
+
+
+def shard_by_proxy(profiles: Iterable[Profile], count: int) -> List[List[Profile]]:
+    """
+    Split profiles into at most `count` shards of similar size.
+
+    Profiles sharing a proxy always land in the same shard, so their
+    connections and proxy check stay in one process. Proxy groups are placed
+    largest first into the currently smallest shard. Profiles without a proxy
+    are placed one by one. Every shard keeps the original profile order.
+
+    Args:
+        profiles: Profiles in processing order
+        count: Number of shards wanted
+
+    Returns:
+        Non-empty shards
+    """
+    groups = {}
+    for position, profile in enumerate(profiles):
+        key = profile.proxy or ("", position)  # no proxy: nothing to keep together
+        groups.setdefault(key, []).append((position, profile))
+
+    shards = [[] for _ in range(max(1, count))]
+    sizes = [(0, index) for index in range(len(shards))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        size, index = heapq.heappop(sizes)
+        shards[index].extend(group)
+        heapq.heappush(sizes, (size + len(group), index))
+
+    return [[profile for _, profile in sorted(shard, key=lambda item: item[0])] for shard in shards if shard]
@@ -0,0 +1,152 @@
+"""
+On-disk proxy health cache shared between runs
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+class ProxyHealthCache:
+    """
+    Remembers the result of recent proxy checks.
+
+    Entries are keyed by a hash of the proxy URL, so proxy credentials are
+    never written to the cache file. A working proxy is trusted for `ttl`
+    seconds, a dead proxy is rejected for `dead_ttl` seconds. Expired entries
+    are dropped on load and save; if more than `max_entries` remain, the
+    least recently checked ones are evicted.
+
+    Entry format:
+        {
+            "status": "ok" | "dead",
+            "last_checked": 1700000000.0,   # unix time of the last probe
+            "last_good": 1700000000.0,      # unix time of the last successful probe
+            "ip": "1.2.3.4",                # exit IP reported by the test service
+            "latency": 0.84,                # probe latency in seconds
+            "service": "https://httpbin.org/ip"
+        }
+    """
+
+    def __init__(self, path: str, ttl: float = 600, dead_ttl: float = 120, max_entries: int = 5000):
+        """
+        Args:
+            path: JSON file used to persist the cache
+            ttl: Seconds a working proxy is trusted without a new probe
+            dead_ttl: Seconds a dead proxy is rejected without a new probe
+            max_entries: Maximum number of entries kept in the file
+        """
+        self.path = path
+        self.ttl = ttl
+        self.dead_ttl = dead_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(proxy_url: str) -> str:
+        """Hash proxy URL so credentials never end up in the cache file"""
+        return hashlib.sha256(proxy_url.encode("utf-8")).hexdigest()
+
+    def _is_fresh(self, entry: dict, now: float) -> bool:
+        max_age = self.ttl if entry.get("status") == "ok" else self.dead_ttl
+        return now - entry.get("last_checked", 0) < max_age
+
+    def load(self):
+        """Load cache from disk, ignoring a missing or corrupted file"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            self._entries = {}
+        self._evict()
+
+    def get(self, proxy_url: str) -> Optional[dict]:
+        """
+        Get fresh cache entry for a proxy.
+
+        Args:
+            proxy_url: Formatted proxy URL
+
+        Returns:
+            Entry dict if a fresh entry exists, None otherwise
+        """
+        entry = self._entries.get(self._key(proxy_url))
+        if entry and self._is_fresh(entry, time.time()):
+            return entry
+        return None
+
+    def record(self, proxy_url: str, result: Optional[dict]):
+        """
+        Store the result of a proxy probe.
+
+        Args:
+            proxy_url: Formatted proxy URL
+            result: Probe result {"service", "ip", "latency"} or None if the proxy is dead
+        """
+        now = time.time()
+        key = self._key(proxy_url)
+        entry = dict(self._entries.get(key, {}))
+        entry["last_checked"] = now
+        if result:
+            entry.update({
+                "status": "ok",
+                "last_good": now,
+                "ip": result.get("ip"),
+                "latency": round(result.get("latency", 0), 3),
+                "service": result.get("service"),
+            })
+        else:
+            entry["status"] = "dead"
+        self._entries[key] = entry
+        self._dirty = True
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        """All entries keyed by proxy hash (e.g. to send them to another process)"""
+        return self._entries
+
+    def entries_since(self, timestamp: float) -> Dict[str, dict]:
+        """Entries checked at or after `timestamp` (time.time())"""
+        return {key: entry for key, entry in self._entries.items() if entry.get("last_checked", 0) >= timestamp}
+
+    def merge(self, entries: Dict[str, dict]):
+        """Add entries from another cache (a worker process), keeping the newer check for every proxy"""
+        for key, entry in entries.items():
+            current = self._entries.get(key)
+            if current is None or entry.get("last_checked", 0) > current.get("last_checked", 0):
+                self._entries[key] = entry
+                self._dirty = True
+
+    def _evict(self):
+        """Drop expired entries and keep at most max_entries most recent ones"""
+        now = time.time()
+        entries = {k: v for k, v in self._entries.items() if isinstance(v, dict) and self._is_fresh(v, now)}
+        if len(entries) > self.max_entries:
+            newest = sorted(entries.items(), key=lambda item: item[1].get("last_checked", 0), reverse=True)
+            entries = dict(newest[:self.max_entries])
+        if len(entries) != len(self._entries):
+            self._dirty = True
+        self._entries = entries
+
+    def save(self):
+        """Write cache to disk atomically (temp file + rename)"""
+        self._evict()
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
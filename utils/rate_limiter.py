@@ -0,0 +1,157 @@
+"""
+Discord rate limit tracking based on X-RateLimit-* response headers
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+
+
+class RateLimiter:
+    """
+    Schedules Discord requests using the rate limit headers Discord returns.
+
+    Discord groups routes into buckets (X-RateLimit-Bucket). For every bucket
+    it reports how many requests are left (X-RateLimit-Remaining) and when the
+    window resets (X-RateLimit-Reset-After). A 429 with X-RateLimit-Global
+    blocks every route for that token. Limits apply per account, so buckets
+    are tracked per token (by hash, the raw token is never stored).
+
+    Usage:
+        await limiter.acquire(token, "DELETE /users/@me/guilds/{guild_id}")
+        ... send request ...
+        limiter.update(token, route, resp.status, resp.headers)
+
+    acquire() waits only when the bucket is known to be exhausted or a global
+    limit is active, instead of sleeping a fixed time before every request.
+    """
+
+    def __init__(self, clock=time.monotonic, metrics=None):
+        """
+        Args:
+            clock: Monotonic time source (replaceable for testing)
+            metrics: MetricsRegistry receiving wait time per route (optional)
+        """
+        self._clock = clock
+        self.metrics = metrics
+        # (token_key, route) -> bucket hash reported by Discord
+        self._route_buckets: Dict[Tuple[str, str], str] = {}
+        # (token_key, bucket hash or route) -> {"remaining": int, "reset_at": float}
+        self._buckets: Dict[Tuple[str, str], dict] = {}
+        # token_key -> time until which the global limit is active
+        self._global_until: Dict[str, float] = {}
+        self.stats = {
+            "requests": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "rate_limited": 0,
+            "global_limited": 0,
+        }
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+    def _bucket_key(self, token_key: str, route: str) -> Tuple[str, str]:
+        bucket = self._route_buckets.get((token_key, route), route)
+        return token_key, bucket
+
+    def delay_for(self, token: str, route: str) -> float:
+        """
+        Seconds to wait before a request on this route is allowed.
+
+        Args:
+            token: Discord token
+            route: Route template, e.g. "GET /users/@me/guilds"
+
+        Returns:
+            Delay in seconds (0 if the request can be sent now)
+        """
+        token_key = self._token_key(token)
+        now = self._clock()
+        delay = max(0.0, self._global_until.get(token_key, 0) - now)
+
+        bucket = self._buckets.get(self._bucket_key(token_key, route))
+        if bucket and bucket["remaining"] <= 0:
+            delay = max(delay, bucket["reset_at"] - now)
+        return delay
+
+    async def acquire(self, token: str, route: str):
+        """
+        Wait until a request on the route is allowed and reserve one slot.
+
+        Args:
+            token: Discord token
+            route: Route template, e.g. "DELETE /users/@me/guilds/{guild_id}"
+        """
+        token_key = self._token_key(token)
+        while True:
+            delay = self.delay_for(token, route)
+            if delay <= 0:
+                break
+            self.stats["waits"] += 1
+            self.stats["wait_time"] += delay
+            if self.metrics is not None:
+                self.metrics.inc("rate_limit_waits_total", route=route)
+                self.metrics.inc("rate_limit_wait_seconds_total", delay, route=route)
+            await asyncio.sleep(delay)
+
+        bucket = self._buckets.get(self._bucket_key(token_key, route))
+        if bucket:
+            if bucket["reset_at"] <= self._clock():
+                # Window has passed; the next response will report the new state
+                del self._buckets[self._bucket_key(token_key, route)]
+            else:
+                bucket["remaining"] -= 1
+        self.stats["requests"] += 1
+
+    def update(self, token: str, route: str, status: int, headers) -> Optional[float]:
+        """
+        Update bucket state from a Discord response.
+
+        Args:
+            token: Discord token used for the request
+            route: Route template used in acquire()
+            status: HTTP status code
+            headers: Response headers (case-insensitive mapping)
+
+        Returns:
+            Retry delay in seconds for a 429 response, None otherwise
+        """
+        token_key = self._token_key(token)
+        now = self._clock()
+
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash:
+            self._route_buckets[(token_key, route)] = bucket_hash
+        bucket_key = self._bucket_key(token_key, route)
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None:
+            try:
+                self._buckets[bucket_key] = {
+                    "remaining": int(remaining),
+                    "reset_at": now + float(reset_after),
+                }
+            except ValueError:
+                pass
+
+        if status != 429:
+            return None
+
+        self.stats["rate_limited"] += 1
+        try:
+            retry_after = float(headers.get("Retry-After") or reset_after or 5)
+        except ValueError:
+            retry_after = 5.0
+
+        is_global = (str(headers.get("X-RateLimit-Global", "")).lower() == "true"
+                     or headers.get("X-RateLimit-Scope") == "global")
+        if is_global:
+            self.stats["global_limited"] += 1
+            self._global_until[token_key] = max(self._global_until.get(token_key, 0), now + retry_after)
+        else:
+            self._buckets[bucket_key] = {"remaining": 0, "reset_at": now + retry_after}
+        return retry_after
@@ -0,0 +1,241 @@
+"""
+Retry policy for Discord requests: error classification, backoff, retry budget and per-proxy circuit breaker
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+# Outcome classes of one attempt
+OK = "ok"                      # response the caller handles (2xx and final 4xx)
+RATE_LIMITED = "rate_limited"  # 429 - retry after the rate limiter's wait, no backoff
+RETRY = "retry"                # transient server or network problem - back off and retry
+FATAL = "fatal"                # retrying cannot help
+
+# Statuses worth another attempt after a backoff
+RETRYABLE_STATUSES = {408, 500, 502, 503, 504}
+
+# Network errors worth another attempt (and counted against the proxy)
+RETRYABLE_EXCEPTIONS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+def classify_status(status: int) -> str:
+    """Outcome class of an HTTP response"""
+    if status == 429:
+        return RATE_LIMITED
+    if status in RETRYABLE_STATUSES:
+        return RETRY
+    return OK
+
+
+def classify_exception(error: BaseException) -> str:
+    """Outcome class of a request that raised instead of returning a response"""
+    return RETRY if isinstance(error, RETRYABLE_EXCEPTIONS) else FATAL
+
+
+class RetryBudget:
+    """
+    Caps retries for the whole run to a share of the requests sent.
+
+    At most `min_retries` + `ratio` * requests retries are allowed, so a
+    widespread outage turns into fast failures instead of a retry storm
+    that multiplies the load on Discord and the proxies.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 50, metrics=None):
+        """
+        Args:
+            ratio: Retries allowed per request sent (0.2 = one retry per five requests)
+            min_retries: Retries always allowed, for small runs
+            metrics: MetricsRegistry for refused retries (optional)
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.metrics = metrics
+        self.stats = {"requests": 0, "retries": 0, "exhausted": 0}
+        if metrics is not None:
+            metrics.describe("retry_budget_exhausted_total", "counter",
+                             "Retries refused because the retry budget was used up")
+
+    def record_request(self):
+        self.stats["requests"] += 1
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False if it is used up"""
+        if self.stats["retries"] >= self.min_retries + self.ratio * self.stats["requests"]:
+            self.stats["exhausted"] += 1
+            if self.metrics is not None:
+                self.metrics.inc("retry_budget_exhausted_total")
+            return False
+        self.stats["retries"] += 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Per-proxy circuit breaker.
+
+    After `failure_threshold` network failures in a row through one proxy the
+    circuit opens: requests through it fail at once for `reset_timeout`
+    seconds instead of waiting for timeouts again. Then one trial request is
+    let through (half-open); success closes the circuit, failure opens it for
+    another `reset_timeout`. Any HTTP response counts as success - it proves
+    the proxy forwards traffic, whatever Discord answered.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60,
+                 on_state_change: Callable[[str, str], None] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit (0 = breaker disabled)
+            reset_timeout: Seconds the circuit stays open before a trial request
+            on_state_change: Called with (key, new state) on every transition
+            clock: Monotonic time source
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self.clock = clock
+        self._circuits: Dict[str, dict] = {}  # key -> {"state", "failures", "opened_at", "trial"}
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def state(self, key: str) -> str:
+        circuit = self._circuits.get(key)
+        return circuit["state"] if circuit else self.CLOSED
+
+    def is_open(self, key: str) -> bool:
+        """True while requests through `key` are refused (open and not yet due for a trial)"""
+        circuit = self._circuits.get(key)
+        return (circuit is not None and circuit["state"] == self.OPEN
+                and self.clock() - circuit["opened_at"] < self.reset_timeout)
+
+    def allow(self, key: str) -> bool:
+        """
+        Ask whether a request may be sent through `key`.
+
+        Returns:
+            False if the circuit is open (or half-open with a trial request already running)
+        """
+        if self.failure_threshold <= 0:
+            return True
+        circuit = self._circuits.get(key)
+        if circuit is None or circuit["state"] == self.CLOSED:
+            return True
+        now = self.clock()
+        if circuit["state"] == self.OPEN and now - circuit["opened_at"] >= self.reset_timeout:
+            circuit["opened_at"] = now
+            self._transition(key, circuit, self.HALF_OPEN)
+        # A trial that never reported back (cancelled profile) is replaced after reset_timeout
+        trial_due = not circuit["trial"] or now - circuit["opened_at"] >= self.reset_timeout
+        if circuit["state"] == self.HALF_OPEN and trial_due:
+            circuit["opened_at"] = now
+            circuit["trial"] = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self, key: str):
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            return
+        circuit["failures"] = 0
+        circuit["trial"] = False
+        if circuit["state"] != self.CLOSED:
+            self._transition(key, circuit, self.CLOSED)
+
+    def record_failure(self, key: str):
+        if self.failure_threshold <= 0:
+            return
+        circuit = self._circuits.setdefault(key, {"state": self.CLOSED, "failures": 0, "opened_at": 0.0,
+                                                  "trial": False})
+        circuit["failures"] += 1
+        circuit["trial"] = False
+        if circuit["state"] == self.HALF_OPEN or circuit["failures"] >= self.failure_threshold:
+            circuit["opened_at"] = self.clock()
+            if circuit["state"] != self.OPEN:
+                self.stats["opened"] += 1
+                self._transition(key, circuit, self.OPEN)
+
+    def open_circuits(self) -> list:
+        """Keys whose circuit is not closed"""
+        return [key for key, circuit in self._circuits.items() if circuit["state"] != self.CLOSED]
+
+    def _transition(self, key: str, circuit: dict, state: str):
+        circuit["state"] = state
+        if self.on_state_change:
+            self.on_state_change(key, state)
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before the next attempt of a request.
+
+    Backoff grows exponentially from `base_delay` up to `max_delay` with
+    "equal jitter" (half fixed, half random), so accounts failing together
+    do not retry in lockstep. A request gives up when its attempts run
+    out, its `deadline` would pass during the next wait, or the run's
+    retry budget is used up.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: float = 120.0, budget: Optional[RetryBudget] = None, rng: Callable[[], float] = None):
+        """
+        Args:
+            max_attempts: Attempts per request (first try included)
+            base_delay: Backoff before the second attempt in seconds
+            max_delay: Upper limit of a single backoff
+            deadline: Seconds from the first attempt after which a request is not retried
+            budget: Run-wide retry budget (optional)
+            rng: Random source returning values in [0, 1) (for tests)
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget
+        self.rng = rng or random.random
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait after failed attempt number `attempt` (1-based)"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling / 2 + self.rng() * ceiling / 2
+
+    def next_delay(self, attempt: int, started: float, outcome: str, max_attempts: int = None,
+                   now: float = None) -> Tuple[Optional[float], str]:
+        """
+        Decide about another attempt after a failed one.
+
+        Args:
+            attempt: Number of the attempt that just failed (1-based)
+            started: time.monotonic() of the first attempt
+            outcome: RETRY or RATE_LIMITED (rate limit waits are left to the rate limiter)
+            max_attempts: Override of the policy's attempts for this request
+            now: Current time.monotonic() (for tests)
+
+        Returns:
+            (seconds to wait, "") for another attempt, or (None, reason) to give up
+            (attempts used, deadline reached or retry budget used up)
+        """
+        max_attempts = max_attempts or self.max_attempts
+        if attempt >= max_attempts:
+            return None, f"failed after {max_attempts} attempts"
+        delay = 0.0 if outcome == RATE_LIMITED else self.backoff(attempt)
+        now = time.monotonic() if now is None else now
+        if now - started + delay >= self.deadline:
+            return None, f"deadline of {self.deadline:.0f}s reached"
+        # 429 retries are pacing, not failures - they do not use the budget
+        if outcome != RATE_LIMITED and self.budget is not None and not self.budget.try_spend():
+            return None, "retry budget of the run used up"
+        return delay, ""
+
+    def remaining(self, started: float, now: float = None) -> float:
+        """Seconds left until the deadline of a request started at `started`"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.deadline - (now - started))
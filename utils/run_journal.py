@@ -0,0 +1,125 @@
+"""
+Append-only run journal for resuming interrupted runs
+"""
+
+import json
+import os
+import time
+from typing import List
+
+
+class RunJournal:
+    """
+    Records finished work as JSON lines so a crashed run can be resumed.
+
+    Every line is written and flushed (optionally fsynced) as soon as the
+    work it describes is done, so after a crash the file holds everything
+    that completed. A line torn by the crash is ignored when reading.
+
+    Line format:
+        {"event": "run", "mode": "leave", "started_at": 1700000000.0}
+        {"event": "token", "profile": "12", "valid": true}
+        {"event": "leave", "profile": "12", "guild_id": "1002684842196086876",
+         "guild_name": "Caldera", "ok": true, "error": null}
+        {"event": "profile", "profile": "12"}
+
+    Tokens are never written; on resume they are taken from the data files.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        """
+        Args:
+            path: JSONL file path
+            fsync: Force every line to disk (survives power loss, slightly slower)
+        """
+        self.path = path
+        self.fsync = fsync
+        self.mode = None
+        self.events: List[dict] = []  # events loaded from a previous run
+        self._file = None
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def _read(self) -> List[dict]:
+        events = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn line from a crash
+                    if isinstance(event, dict):
+                        events.append(event)
+        except OSError:
+            pass
+        return events
+
+    def open(self, mode: str, resume: bool = False) -> bool:
+        """
+        Start journaling a run.
+
+        Args:
+            mode: Run mode ('validate', 'collect' or 'leave')
+            resume: Continue the existing journal if it was written for the same mode
+
+        Returns:
+            True if a previous journal was loaded for resuming, False if a new one was started
+        """
+        self.mode = mode
+        self.events = []
+        resumed = False
+        if resume:
+            events = self._read()
+            if events and events[0].get("event") == "run" and events[0].get("mode") == mode:
+                self.events = events[1:]
+                resumed = True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a" if resumed else "w", encoding="utf-8")
+        if resumed and self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Terminate the torn last line so new events start on a fresh line
+                    self._file.write("\n")
+        if not resumed:
+            self.append("run", mode=mode, started_at=time.time())
+        return resumed
+
+    def attach(self, mode: str):
+        """
+        Append to a journal opened by another process (worker processes of one run).
+
+        Lines are short and written with a single write each, so lines of
+        several processes appending to the same file do not mix.
+
+        Args:
+            mode: Run mode of the journal
+        """
+        self.mode = mode
+        self.events = []
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event: str, **fields):
+        """Write one event line (no-op if the journal is not open)"""
+        if self._file is None:
+            return
+        fields["event"] = event
+        self._file.write(json.dumps(fields, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def completed_profiles(self) -> set:
+        """Identifiers of profiles finished in the loaded journal"""
+        return {e.get("profile") for e in self.events if e.get("event") == "profile"}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
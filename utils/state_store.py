@@ -0,0 +1,207 @@
+"""
+Optional SQLite store for accounts, guilds, memberships and leave outcomes
+"""
+
+import csv
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id  TEXT PRIMARY KEY,
+    token_hash  TEXT,
+    valid       INTEGER,
+    user_id     TEXT,
+    checked_at  REAL
+);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id       TEXT PRIMARY KEY,
+    name           TEXT NOT NULL,
+    name_casefold  TEXT NOT NULL,
+    updated_at     REAL
+);
+CREATE INDEX IF NOT EXISTS idx_guilds_name_casefold ON guilds (name_casefold);
+CREATE TABLE IF NOT EXISTS memberships (
+    account_id  TEXT NOT NULL,
+    guild_id    TEXT NOT NULL,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL,
+    PRIMARY KEY (account_id, guild_id)
+);
+CREATE INDEX IF NOT EXISTS idx_memberships_guild ON memberships (guild_id);
+CREATE TABLE IF NOT EXISTS leave_outcomes (
+    account_id  TEXT NOT NULL,
+    guild_id    TEXT NOT NULL,
+    ok          INTEGER NOT NULL,
+    error       TEXT,
+    left_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leave_outcomes_guild ON leave_outcomes (guild_id);
+"""
+
+
+class StateStore:
+    """
+    SQLite database with the state of all accounts and guilds.
+
+    Unlike guilds_all.csv it keeps which account is in which guild (with the
+    first and last time it was seen), the last token check of every account
+    and every leave result. Updates are incremental upserts; the CSV files
+    are exported from it. Tokens are stored only as SHA-256 hashes.
+
+    The database file is created on first use.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file path
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Updates run on the output writer thread, reads before and after it;
+            # worker processes of one run share the file, so wait for their locks
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def record_account(self, account_id: str, token: str, valid: bool, user_id: str = None):
+        """Store the result of a token check"""
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO accounts (account_id, token_hash, valid, user_id, checked_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(account_id) DO UPDATE SET token_hash = excluded.token_hash, valid = excluded.valid, "
+                "user_id = COALESCE(excluded.user_id, accounts.user_id), checked_at = excluded.checked_at",
+                (account_id, token_hash, int(valid), user_id, time.time())
+            )
+
+    def record_guilds(self, account_id: str, guilds: Iterable[dict]) -> int:
+        """
+        Store guilds seen in an account's guild list.
+
+        Args:
+            account_id: Profile identifier
+            guilds: Guild dictionaries with 'id' and 'name'
+
+        Returns:
+            Number of guilds stored
+        """
+        now = time.time()
+        rows = [(str(g["id"]).strip(), str(g["name"]).strip()) for g in guilds if str(g["id"]).strip()]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO guilds (guild_id, name, name_casefold, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(guild_id) DO UPDATE SET name = excluded.name, "
+                "name_casefold = excluded.name_casefold, updated_at = excluded.updated_at",
+                [(guild_id, name, name.casefold(), now) for guild_id, name in rows]
+            )
+            self.conn.executemany(
+                "INSERT INTO memberships (account_id, guild_id, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(account_id, guild_id) DO UPDATE SET last_seen = excluded.last_seen",
+                [(account_id, guild_id, now, now) for guild_id, _ in rows]
+            )
+        return len(rows)
+
+    def prune_memberships(self, account_id: str, seen_before: float) -> int:
+        """
+        Drop memberships not seen since `seen_before` (call after a complete guild list).
+
+        Returns:
+            Number of memberships removed
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM memberships WHERE account_id = ? AND last_seen < ?", (account_id, seen_before)
+            )
+        return cursor.rowcount
+
+    def record_leave(self, account_id: str, guild_id: str, ok: bool, error: str = None):
+        """Store a leave result; a successful leave also ends the membership"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO leave_outcomes (account_id, guild_id, ok, error, left_at) VALUES (?, ?, ?, ?, ?)",
+                (account_id, guild_id, int(ok), error, time.time())
+            )
+            if ok:
+                self.conn.execute(
+                    "DELETE FROM memberships WHERE account_id = ? AND guild_id = ?", (account_id, guild_id)
+                )
+
+    def guild_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM guilds").fetchone()[0]
+
+    def guild_pairs(self) -> Iterator[Tuple[str, str]]:
+        """Yield (guild_name, guild_id) for all known guilds"""
+        yield from self.conn.execute("SELECT name, guild_id FROM guilds")
+
+    def import_guilds_csv(self, path: str) -> int:
+        """
+        Import guilds from an existing guilds_all.csv (first run with the database).
+
+        Returns:
+            Number of guilds imported
+        """
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=';')
+            rows = [(str(row.get("Server ID", "")).strip().lstrip("'"), str(row.get("Server Name", "")).strip())
+                    for row in reader]
+        now = time.time()
+        rows = [(guild_id, name, name.casefold(), now) for guild_id, name in rows if guild_id]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO guilds (guild_id, name, name_casefold, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def guild_rows(self):
+        """Yield guilds_all.csv rows sorted by guild name (case-insensitive)"""
+        yield ["#", "Server Name", "Server ID"]
+        guilds = sorted(self.conn.execute("SELECT guild_id, name FROM guilds"), key=lambda x: x[1].lower())
+        for i, (guild_id, name) in enumerate(guilds, 1):
+            # Apostrophe before ID so Excel does not convert it to scientific notation
+            yield [i, name, f"'{guild_id}"]
+
+    def export_memberships_csv(self, path: str) -> int:
+        """
+        Write which account is in which guild (atomically, temp file + rename).
+
+        Returns:
+            Number of memberships written
+        """
+        rows = self.conn.execute(
+            "SELECT m.account_id, g.name, m.guild_id, m.first_seen, m.last_seen FROM memberships m "
+            "LEFT JOIN guilds g ON g.guild_id = m.guild_id "
+            "ORDER BY CAST(m.account_id AS INTEGER), m.account_id, g.name_casefold"
+        ).fetchall()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(["Account", "Server Name", "Server ID", "First Seen", "Last Seen"])
+            for account_id, name, guild_id, first_seen, last_seen in rows:
+                writer.writerow([
+                    account_id,
+                    name or "",
+                    f"'{guild_id}",
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first_seen)),
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_seen)),
+                ])
+        os.replace(tmp_path, path)
+        return len(rows)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,127 @@
+"""
+On-disk token status cache shared between runs
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+class TokenStatusCache:
+    """
+    Remembers the last verdict of every token check.
+
+    Entries are keyed by a SHA-256 hash of the token; the raw token is never
+    written to disk. A token confirmed valid within `ttl` seconds can skip the
+    /users/@me check. Any later 401 invalidates the entry immediately.
+
+    Entry format:
+        {
+            "valid": true,
+            "checked_at": 1700000000.0,   # unix time of the verdict
+            "user_id": "123456789012345678"
+        }
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, max_entries: int = 100000):
+        """
+        Args:
+            path: JSON file used to persist the cache
+            ttl: Seconds a valid verdict is trusted without a new check
+            max_entries: Maximum number of entries kept in the file
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def load(self):
+        """Load cache from disk, ignoring a missing or corrupted file"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get_fresh_valid(self, token: str) -> Optional[dict]:
+        """
+        Get the cache entry if the token was confirmed valid recently.
+
+        Args:
+            token: Discord token
+
+        Returns:
+            Entry dict or None if there is no fresh valid verdict
+        """
+        entry = self._entries.get(self._key(token))
+        if entry and entry.get("valid") and time.time() - entry.get("checked_at", 0) < self.ttl:
+            return entry
+        return None
+
+    def record(self, token: str, valid: bool, user_id: str = None):
+        """
+        Store a token verdict.
+
+        Args:
+            token: Discord token
+            valid: Verdict of the check
+            user_id: Discord user ID (kept from an earlier entry if not given)
+        """
+        key = self._key(token)
+        entry = self._entries.get(key, {})
+        self._entries[key] = {
+            "valid": valid,
+            "checked_at": time.time(),
+            "user_id": user_id or entry.get("user_id"),
+        }
+        self._dirty = True
+
+    def invalidate(self, token: str):
+        """Mark token as invalid (called on any 401 response)"""
+        self.record(token, False)
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        """All entries keyed by token hash (e.g. to send them to another process)"""
+        return self._entries
+
+    def entries_since(self, timestamp: float) -> Dict[str, dict]:
+        """Entries checked at or after `timestamp` (time.time())"""
+        return {key: entry for key, entry in self._entries.items() if entry.get("checked_at", 0) >= timestamp}
+
+    def merge(self, entries: Dict[str, dict]):
+        """Add entries from another cache (a worker process), keeping the newer verdict for every token"""
+        for key, entry in entries.items():
+            current = self._entries.get(key)
+            if current is None or entry.get("checked_at", 0) > current.get("checked_at", 0):
+                self._entries[key] = entry
+                self._dirty = True
+
+    def save(self):
+        """Write cache to disk atomically (temp file + rename), dropping the oldest entries over the limit"""
+        if not self._dirty:
+            return
+        if len(self._entries) > self.max_entries:
+            newest = sorted(self._entries.items(), key=lambda item: item[1].get("checked_at", 0), reverse=True)
+            self._entries = dict(newest[:self.max_entries])
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)